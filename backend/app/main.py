@@ -1,12 +1,50 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from app.routers import doctor_routes, patient_routes,hospital_routes,auth_routes,adherence_routes
+from app.services.auth import key_store, claims_cache, cognito_executor
+from app.services import aws
+from app.services.queue_events import queue_broadcaster
+from app.services.patient_search import patient_index
+from app.services.batch_writer import adherence_log_writer
+from app.services.gemini import gemini
+from app.services.consultation_jobs import consultation_pipeline
+from app.services.plan_cache import plan_cache
+from app.repository import ProfileCachingRepository, get_repository
 load_dotenv()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: load the Cognito keys off the request path and keep them rotating
+    key_store.start()
+    # Open pooled DynamoDB connections before the first request (off the event loop)
+    await asyncio.to_thread(aws.prewarm)
+    # Build the receptionist name-search index in the background (and refresh it periodically)
+    patient_index.start(get_repository())
+    # Coalesce task-log writes into BatchWriteItem calls
+    adherence_log_writer.start(get_repository().batch_put_adherence_logs)
+    # One Gemini client for every consultation
+    gemini.start()
+    # Background consultations (generate -> save -> notify), resuming any a restart interrupted
+    await consultation_pipeline.start(get_repository())
+    yield
+    # Shutdown (flush buffered writes before the repository's threads go away)
+    await consultation_pipeline.stop()
+    await adherence_log_writer.stop()
+    await gemini.close()
+    patient_index.stop()
+    queue_broadcaster.close()
+    key_store.stop()
+    cognito_executor.shutdown()
+    get_repository().close()
+
 # This is your main FastAPI Gateway
-app = FastAPI(title="Dr. Decide API Gateway")
+app = FastAPI(title="Dr. Decide API Gateway", lifespan=lifespan)
 
 # 1. Grab the comma-separated string from .env, with a safe fallback
 origins_str = os.getenv("FRONTEND_CORS_ORIGINS", "http://localhost:3000")
@@ -35,4 +73,21 @@ app.include_router(hospital_routes.router)
 def health_check():
     return {"status": "Dr. Decide API is running securely!"}
 
+@app.get("/metrics")
+def cache_metrics():
+    """
+    Hit/miss counters for the in-process caches.
+    """
+    repo = get_repository()
+    return {
+        "auth_claims_cache": claims_cache.stats(),
+        "profile_cache": repo.stats() if isinstance(repo, ProfileCachingRepository) else None,
+        "queue_broadcaster": queue_broadcaster.stats(),
+        "patient_name_index": patient_index.stats(),
+        "adherence_log_writer": adherence_log_writer.stats(),
+        "gemini": gemini.stats(),
+        "consultation_pipeline": consultation_pipeline.stats(),
+        "plan_cache": plan_cache.stats()
+    }
+
 # Run with: uvicorn app.main:app --reload
\ No newline at end of file
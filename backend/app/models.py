@@ -40,6 +40,8 @@ class QueueToken(BaseModel):
     appointment_id: str
     token_number: int
     status: AppointmentStatus # Uses the exact same Enum to stay perfectly synced!
+    clinic_id: Optional[str] = None     # Tokens are numbered per clinic...
+    service_date: Optional[str] = None  # ...per day (YYYY-MM-DD, IST)
 
 # --- Consultation Models ---
 class ConsultationDetails(BaseModel):
@@ -75,6 +77,16 @@ class UserLogin(BaseModel):
 class TaskUpdate(BaseModel):
     task_id: str
     status: str
+    appointment_id: Optional[str] = None  # Defaults to the plan shown on /my-plan
+    task_title: Optional[str] = None
+class TaskCompletion(BaseModel):
+    appointment_id: str
+    task_id: str
+    task_title: Optional[str] = None
+    completed_at: str  # ISO timestamp from the device; UTC unless it carries an offset
+class TaskSyncRequest(BaseModel):
+    completions: List[TaskCompletion] = []
+    version: Optional[str] = None  # From the previous sync; omit for a full refresh
 class DoctorProfileSetup(BaseModel):
     doctor_name: str
     specialty: str
@@ -103,6 +115,8 @@ class PatientProfileSetup(BaseModel):
 class UserConfirm(BaseModel):
     email: str
     code: str
+class AppointmentLookupRequest(BaseModel):
+    appointment_ids: List[str]
 class CapacityUpdateRequest(BaseModel):
     daily_limit: int
 class ChangePasswordRequest(BaseModel):
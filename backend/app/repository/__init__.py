@@ -0,0 +1,49 @@
+import os
+from typing import Optional
+
+from app.repository.base import Item, Repository
+from app.repository.loader import ProfileLoader
+from app.repository.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidPageToken, Page
+from app.repository.profile_cache import ProfileCachingRepository
+
+_repository: Optional[Repository] = None
+
+
+def get_repository() -> Repository:
+    """
+    Returns the process-wide repository. DATA_BACKEND=memory selects the
+    in-memory stand-in (optionally seeded from MEMORY_SEED_FILE); anything
+    else uses DynamoDB. Profile reads go through a TTL cache unless
+    PROFILE_CACHE_TTL_SECONDS is 0.
+    """
+    global _repository
+    if _repository is None:
+        backend = os.getenv("DATA_BACKEND", "dynamodb").lower()
+        if backend == "memory":
+            from app.repository.memory import InMemoryRepository
+            _repository = InMemoryRepository(seed_file=os.getenv("MEMORY_SEED_FILE") or None)
+        else:
+            from app.repository.dynamo import DynamoRepository
+            _repository = DynamoRepository()
+
+        ttl_seconds = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "300"))
+        if ttl_seconds > 0:
+            _repository = ProfileCachingRepository(
+                _repository,
+                max_entries=int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000")),
+                ttl_seconds=ttl_seconds
+            )
+    return _repository
+
+
+__all__ = [
+    "DEFAULT_PAGE_SIZE",
+    "MAX_PAGE_SIZE",
+    "InvalidPageToken",
+    "Item",
+    "Page",
+    "ProfileCachingRepository",
+    "ProfileLoader",
+    "Repository",
+    "get_repository",
+]
@@ -0,0 +1,287 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from app.repository.pagination import Page
+
+# A single DynamoDB item as returned to the routers
+Item = Dict[str, Any]
+
+# Sort keys in the care plan table: one per plan, plus the patient's LATEST pointer
+CARE_PLAN_PREFIX = "PLAN#"
+LATEST_CARE_PLAN = "LATEST"
+DOCTOR_CARE_PLAN_PREFIX = "DOCTOR#"
+
+
+def care_plan_sort_key(created: str, appointment_id: str) -> str:
+    """Orders a patient's plans by creation time (ISO, UTC); the appointment id keeps same-instant keys unique."""
+    return f"{CARE_PLAN_PREFIX}{created}#{appointment_id}"
+
+
+def doctor_care_plan_key(doctor_id: str) -> str:
+    """Sort key of the pointer to the newest plan a doctor wrote for the patient."""
+    return f"{DOCTOR_CARE_PLAN_PREFIX}{doctor_id}"
+
+
+def new_care_plan_sort_key(item: Item) -> str:
+    return care_plan_sort_key(datetime.utcnow().isoformat(timespec="milliseconds"), item.get("appointment_id", ""))
+
+
+class Repository(ABC):
+    """
+    Async data-access layer used by every router.
+
+    Handlers await these methods instead of calling boto3 tables directly, so
+    database latency never blocks the event loop. `DynamoRepository` is the
+    production backend; `InMemoryRepository` is a local stand-in for offline
+    development and load tests.
+    """
+
+    # --- APPOINTMENTS ---
+
+    @abstractmethod
+    async def get_appointment(self, appointment_id: str) -> Optional[Item]:
+        ...
+
+    @abstractmethod
+    async def batch_get_appointments(self, appointment_ids: Sequence[str]) -> Dict[str, Item]:
+        """Key-based read of many appointments at once, keyed by appointment_id."""
+
+    @abstractmethod
+    async def put_appointment(self, item: Item) -> None:
+        ...
+
+    @abstractmethod
+    async def update_appointment_status(self, appointment_id: str, status: str) -> Optional[Item]:
+        """Sets the status and returns the appointment as it was before (None if it didn't exist)."""
+
+    @abstractmethod
+    async def query_appointments_for_doctor(self, doctor_id: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Item]:
+        """
+        Returns the doctor's appointments with start <= appointment_date <= end,
+        sorted by date. Bounds come from utils.appointment_date_window; None is open-ended.
+        """
+
+    @abstractmethod
+    async def query_appointments_for_patient(self, patient_id: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Item]:
+        """Same as query_appointments_for_doctor, keyed by the patient."""
+
+    # --- CARE PLANS ---
+
+    # Care plans are stored per patient under a time-ordered sort key
+    # (plan_sk = "PLAN#<created UTC>#<appointment_id>"), next to a LATEST
+    # pointer item holding a copy of the newest plan, and one "DOCTOR#<id>"
+    # pointer per doctor holding the newest plan that doctor wrote.
+
+    @abstractmethod
+    async def put_care_plan(self, item: Item) -> None:
+        """Stores a new plan (assigning plan_sk if missing) and moves the LATEST and DOCTOR# pointers to it."""
+
+    @abstractmethod
+    async def query_care_plans_for_patient(self, patient_id: str) -> List[Item]:
+        """The patient's whole plan history, oldest first."""
+
+    @abstractmethod
+    async def get_latest_care_plan(self, patient_id: str) -> Optional[Item]:
+        """The patient's newest plan in one read, however many visits they've had."""
+
+    @abstractmethod
+    async def get_care_plan_for_appointment(self, appointment_id: str, attributes: Optional[Sequence[str]] = None) -> Optional[Item]:
+        """Direct lookup through appointment_id-index."""
+
+    @abstractmethod
+    async def get_care_plans_for_appointments(
+        self, appointment_ids: Sequence[str], attributes: Optional[Sequence[str]] = None
+    ) -> Dict[str, Item]:
+        """Plans for many appointments at once, keyed by appointment_id. Missing plans are absent."""
+
+    @abstractmethod
+    async def list_care_plans_for_doctor(self, doctor_id: str, doctor_email: Optional[str] = None) -> List[Item]:
+        ...
+
+    @abstractmethod
+    async def page_latest_care_plans_for_doctor(
+        self, doctor_id: str, limit: Optional[int] = None, next_token: Optional[str] = None
+    ) -> Page:
+        """
+        One page of the doctor's patients, one item per patient: the newest plan
+        this doctor wrote for them, ordered by patient_id. Pass the returned
+        next_token to continue.
+        """
+
+    @abstractmethod
+    async def count_patients_for_doctor(self, doctor_id: str) -> int:
+        """How many distinct patients the doctor has written a care plan for."""
+
+    # --- PROFILES ---
+
+    @abstractmethod
+    async def get_doctor(self, doctor_id: str) -> Optional[Item]:
+        ...
+
+    @abstractmethod
+    async def find_doctor_by_email(self, email: str) -> Optional[Item]:
+        ...
+
+    @abstractmethod
+    async def batch_get_doctors(self, doctor_ids: Sequence[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        """
+        Fetches many doctor profiles at once, keyed by doctor_id. Missing ids are
+        simply absent from the result. Prefer ProfileLoader over calling this directly.
+        """
+
+    @abstractmethod
+    async def put_doctor(self, item: Item) -> None:
+        ...
+
+    @abstractmethod
+    async def update_doctor_daily_limit(self, doctor_id: str, daily_limit: int) -> None:
+        ...
+
+    @abstractmethod
+    async def list_doctors(self) -> List[Item]:
+        ...
+
+    @abstractmethod
+    async def get_patient(self, patient_id: str, attributes: Optional[Sequence[str]] = None) -> Optional[Item]:
+        ...
+
+    @abstractmethod
+    async def batch_get_patients(self, patient_ids: Sequence[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        """Same as batch_get_doctors, keyed by patient_id."""
+
+    @abstractmethod
+    async def put_patient(self, item: Item) -> None:
+        ...
+
+    @abstractmethod
+    async def search_patients_by_name(self, name_fragment: str) -> List[Item]:
+        ...
+
+    @abstractmethod
+    def iter_patients(self, attributes: Optional[Sequence[str]] = None) -> AsyncIterator[List[Item]]:
+        """Streams the whole patient directory page by page (used to build the name index)."""
+
+    @abstractmethod
+    async def get_receptionist(self, receptionist_id: str) -> Optional[Item]:
+        ...
+
+    @abstractmethod
+    async def put_receptionist(self, item: Item) -> None:
+        ...
+
+    # --- QUEUE ---
+
+    # Queue tokens are partitioned by clinic and service date (YYYY-MM-DD, IST);
+    # every read is bounded to one clinic's day.
+
+    @abstractmethod
+    async def list_clinic_queue(self, clinic_id: str, service_date: str) -> List[Item]:
+        """One clinic's tokens for one day, ordered by token_number."""
+
+    @abstractmethod
+    async def page_clinic_queue(
+        self, clinic_id: str, service_date: str, limit: Optional[int] = None, next_token: Optional[str] = None
+    ) -> Page:
+        ...
+
+    @abstractmethod
+    async def put_queue_token(self, item: Item) -> None:
+        """`item` must carry clinic_id, service_date and token_number."""
+
+    @abstractmethod
+    async def next_queue_token(self, clinic_id: str, service_date: str) -> int:
+        """
+        Atomically allocates the next token number for a clinic's day, starting
+        at 1. Safe under concurrent check-ins; a new day starts a new counter.
+        """
+
+    # --- ADHERENCE ---
+
+    @abstractmethod
+    async def put_adherence_log(self, item: Item) -> None:
+        ...
+
+    @abstractmethod
+    async def batch_put_adherence_logs(self, items: Sequence[Item]) -> None:
+        """Writes up to 25 logs in one request; raises if some could not be written."""
+
+    @abstractmethod
+    async def query_logs_for_appointment(self, appointment_id: str) -> List[Item]:
+        ...
+
+    @abstractmethod
+    def iter_logs_for_doctor(self, doctor_id: str) -> AsyncIterator[List[Item]]:
+        """Streams the doctor's task logs page by page instead of loading them all at once."""
+
+    @abstractmethod
+    async def add_to_adherence_summary(self, log: Item, recent_limit: int) -> bool:
+        """
+        Atomically folds one task log into its appointment's summary item
+        (creating it if needed): bumps the total and the day's count, adds the
+        task id to the day's set, moves last_active forward (never back, so
+        a late offline log can't) and keeps at least the `recent_limit`
+        newest entries in recent_logs; read them through newest_recent_logs.
+
+        Returns False, changing nothing, when the task is already in the day's
+        set, so a repeated tap or client retry is counted once.
+        """
+
+    @abstractmethod
+    async def get_adherence_summary(self, appointment_id: str) -> Optional[Item]:
+        ...
+
+    @abstractmethod
+    async def batch_get_adherence_summaries(self, appointment_ids: Sequence[str]) -> Dict[str, Item]:
+        """Key-based read of many summaries at once, keyed by appointment_id."""
+
+    @abstractmethod
+    async def create_adherence_summary(self, item: Item) -> bool:
+        """Stores a rebuilt summary unless one already exists; returns False if it did."""
+
+    @abstractmethod
+    def iter_adherence_summaries_for_doctor(self, doctor_id: str) -> AsyncIterator[List[Item]]:
+        """Streams the summaries of every appointment the doctor's patients have logged against."""
+
+    # --- NOTIFICATIONS ---
+
+    @abstractmethod
+    async def put_notification(self, item: Item) -> None:
+        ...
+
+    @abstractmethod
+    async def page_notifications_for_patient(self, patient_id: str, limit: Optional[int] = None, next_token: Optional[str] = None) -> Page:
+        """One page of the patient's notifications, newest first."""
+
+    @abstractmethod
+    async def count_unread_notifications(self, patient_id: str) -> int:
+        ...
+
+    # --- DOCTOR STATS ---
+
+    @abstractmethod
+    async def increment_doctor_stats(self, doctor_id: str, stat_key: str, counters: Dict[str, int]) -> None:
+        """
+        Atomically adds each counter delta (negative to subtract) on one stats
+        item, creating it if needed.
+        """
+
+    @abstractmethod
+    async def add_doctor_patient(self, doctor_id: str, patient_id: str) -> bool:
+        """
+        Records that the doctor has seen the patient (one small marker item per
+        pair). Returns True only the first time, so callers can count patients.
+        """
+
+    @abstractmethod
+    async def set_doctor_stat(self, doctor_id: str, stat_key: str, name: str, value) -> None:
+        ...
+
+    @abstractmethod
+    async def get_doctor_stats(self, doctor_id: str, stat_keys: Sequence[str]) -> Dict[str, Item]:
+        """Reads several stats items in one round trip, keyed by stat_key."""
+
+    # --- LIFECYCLE ---
+
+    def close(self) -> None:
+        """Releases any worker threads or connections held by the backend."""
@@ -0,0 +1,649 @@
+import asyncio
+import os
+import random
+from datetime import date, datetime, time as day_time, timedelta
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from app.repository.base import CARE_PLAN_PREFIX, LATEST_CARE_PLAN, Item, Repository, doctor_care_plan_key, new_care_plan_sort_key
+from app.repository.pagination import Page, clamp_page_size, decode_page_token, encode_page_token
+from app.services.aws import (
+    get_dynamodb,
+    get_table,
+    ADHERENCE_LOGS_TABLE,
+    ADHERENCE_SUMMARIES_TABLE,
+    APPOINTMENTS_TABLE,
+    CARE_PLAN_HISTORY_TABLE,
+    DOCTORS_TABLE,
+    NOTIFICATIONS_TABLE,
+    PATIENTS_TABLE,
+    CLINIC_QUEUE_TABLE,
+    DOCTOR_STATS_TABLE,
+    QUEUE_COUNTERS_TABLE,
+    RECEPTIONISTS_TABLE,
+)
+from app.services.adherence_summary import day_count_attribute, day_tasks_attribute, newest_recent_logs, recent_entry
+from app.services.doctor_stats import patient_marker_key
+from app.services.concurrency import BoundedExecutor
+from app.services.utils import IST
+
+# Access paths: partition by owner, sort by date (created by migrate_appointment_indexes.py)
+DOCTOR_APPOINTMENTS_INDEX = "doctor_id-appointment_date-index"
+PATIENT_APPOINTMENTS_INDEX = "patient_id-appointment_date-index"
+PATIENT_NOTIFICATIONS_INDEX = "patient_id-timestamp-index"
+DOCTOR_EMAIL_INDEX = "email-index"
+DOCTOR_SUMMARIES_INDEX = "doctor_id-index"
+CARE_PLAN_APPOINTMENT_INDEX = "appointment_id-index"
+# Sparse, keys-only: only the DOCTOR# pointers carry care_doctor_id (created by migrate_care_plans.py)
+CARE_PLAN_DOCTOR_INDEX = "care_doctor_id-patient_id-index"
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_SIZE = 100
+BATCH_GET_MAX_ATTEMPTS = int(os.getenv("DYNAMODB_BATCH_MAX_ATTEMPTS", "6"))
+
+# Raw queue tokens live for the service day plus a grace period (long enough for
+# compact_queue_days.py to summarise the day), then DynamoDB TTL deletes them.
+QUEUE_RETENTION_DAYS = int(os.getenv("QUEUE_RETENTION_DAYS", "2"))
+# Counters outlive the tokens by a day so compaction can still find finished days
+QUEUE_COUNTER_TTL_SECONDS = (QUEUE_RETENTION_DAYS + 2) * 24 * 3600
+
+
+def queue_key(clinic_id: str, service_date: str) -> str:
+    """Partition key of one clinic's queue for one day."""
+    return f"{clinic_id}#{service_date}"
+
+
+def queue_expiry(service_date: str) -> int:
+    """Epoch seconds at which a day's raw tokens may be deleted."""
+    day_end = datetime.combine(date.fromisoformat(service_date) + timedelta(days=1), day_time.min, IST)
+    return int((day_end + timedelta(days=QUEUE_RETENTION_DAYS)).timestamp())
+
+
+def _public_token(item: Item) -> Item:
+    # Storage-only attributes stay out of API responses
+    return {k: v for k, v in item.items() if k not in ("queue_key", "expires_at")}
+
+
+def _date_range_condition(partition_key: str, value: str, start: Optional[str], end: Optional[str]):
+    condition = Key(partition_key).eq(value)
+    if start and end:
+        condition = condition & Key("appointment_date").between(start, end)
+    elif start:
+        condition = condition & Key("appointment_date").gte(start)
+    elif end:
+        condition = condition & Key("appointment_date").lte(end)
+    return condition
+
+
+class DynamoRepository(Repository):
+    """
+    DynamoDB backend. boto3 is synchronous, so every call runs on a bounded
+    executor sized to the client's connection pool and is awaited by the handler.
+    """
+
+    def __init__(self):
+        self.executor = BoundedExecutor(
+            name="dynamodb",
+            max_workers=int(os.getenv("DYNAMODB_MAX_CONCURRENCY", os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))),
+            default_timeout=float(os.getenv("DYNAMODB_CALL_TIMEOUT_SECONDS", "15"))
+        )
+        self.dynamodb = get_dynamodb()
+        self.appointments = get_table(APPOINTMENTS_TABLE)
+        self.care_plans = get_table(CARE_PLAN_HISTORY_TABLE)
+        self.notifications = get_table(NOTIFICATIONS_TABLE)
+        self.doctors = get_table(DOCTORS_TABLE)
+        self.patients = get_table(PATIENTS_TABLE)
+        self.receptionists = get_table(RECEPTIONISTS_TABLE)
+        self.queue = get_table(CLINIC_QUEUE_TABLE)
+        self.queue_counters = get_table(QUEUE_COUNTERS_TABLE)
+        self.adherence_logs = get_table(ADHERENCE_LOGS_TABLE)
+        self.adherence_summaries = get_table(ADHERENCE_SUMMARIES_TABLE)
+        self.doctor_stats = get_table(DOCTOR_STATS_TABLE)
+
+    async def _run(self, fn, **kwargs):
+        return await self.executor.run(fn, **kwargs)
+
+    async def _iter_pages(self, fn, **kwargs) -> AsyncIterator[List[Item]]:
+        """
+        Yields the items of a query/scan one DynamoDB page (<= 1 MB) at a time,
+        following LastEvaluatedKey so results are never silently truncated.
+        """
+        while True:
+            response = await self._run(fn, **kwargs)
+            yield response.get("Items", [])
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return
+            kwargs["ExclusiveStartKey"] = last_key
+
+    async def _collect(self, fn, **kwargs) -> List[Item]:
+        items = []
+        async for page in self._iter_pages(fn, **kwargs):
+            items.extend(page)
+        return items
+
+    async def _page(self, fn, limit: Optional[int], next_token: Optional[str], **kwargs) -> Page:
+        """
+        Reads up to `limit` items starting at the cursor. Each request asks only
+        for the items still missing, so a page never over-reads and the cursor
+        is always the exact resume point.
+        """
+        limit = clamp_page_size(limit)
+        start_key = decode_page_token(next_token)
+        items: List[Item] = []
+        while True:
+            params = dict(kwargs, Limit=limit - len(items))
+            if start_key:
+                params["ExclusiveStartKey"] = start_key
+            response = await self._run(fn, **params)
+            items.extend(response.get("Items", []))
+            start_key = response.get("LastEvaluatedKey")
+            if not start_key or len(items) >= limit:
+                return Page(items=items, next_token=encode_page_token(start_key))
+
+    async def _get(self, table, key: dict, attributes: Optional[Sequence[str]] = None) -> Optional[Item]:
+        response = await self._run(table.get_item, Key=key, **self._projection(attributes))
+        return response.get("Item")
+
+    @staticmethod
+    def _projection(attributes: Optional[Sequence[str]]) -> dict:
+        if not attributes:
+            return {}
+        return {
+            "ProjectionExpression": ", ".join(f"#p{i}" for i in range(len(attributes))),
+            "ExpressionAttributeNames": {f"#p{i}": name for i, name in enumerate(attributes)}
+        }
+
+    async def _batch_get_chunk(self, table_name: str, keys: List[dict], projection: dict) -> List[Item]:
+        """
+        One BatchGetItem call for up to 100 keys. Throttled keys come back as
+        UnprocessedKeys and are retried with jittered exponential backoff.
+        """
+        request = {table_name: dict(projection, Keys=keys)}
+        items: List[Item] = []
+        for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+            response = await self._run(self.dynamodb.batch_get_item, RequestItems=request)
+            items.extend(response.get("Responses", {}).get(table_name, []))
+            request = response.get("UnprocessedKeys") or {}
+            if not request:
+                return items
+            await asyncio.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+        print(f"BatchGetItem gave up on {len(request[table_name]['Keys'])} keys in {table_name}")
+        return items
+
+    async def _batch_get(self, table_name: str, key_name: str, ids: Sequence[str], attributes: Optional[Sequence[str]]) -> Dict[str, Item]:
+        unique_ids = list(dict.fromkeys(i for i in ids if i))
+        if not unique_ids:
+            return {}
+        # The key has to be projected too, otherwise results can't be matched back to ids
+        projection = self._projection(list(dict.fromkeys([key_name, *attributes])) if attributes else None)
+        chunks = [unique_ids[i:i + BATCH_GET_SIZE] for i in range(0, len(unique_ids), BATCH_GET_SIZE)]
+        results = await asyncio.gather(*(
+            self._batch_get_chunk(table_name, [{key_name: i} for i in chunk], projection) for chunk in chunks
+        ))
+        return {item[key_name]: item for chunk_items in results for item in chunk_items}
+
+    # --- APPOINTMENTS ---
+
+    async def get_appointment(self, appointment_id: str) -> Optional[Item]:
+        return await self._get(self.appointments, {"appointment_id": appointment_id})
+
+    async def batch_get_appointments(self, appointment_ids: Sequence[str]) -> Dict[str, Item]:
+        return await self._batch_get(APPOINTMENTS_TABLE, "appointment_id", appointment_ids, None)
+
+    async def put_appointment(self, item: Item) -> None:
+        await self._run(self.appointments.put_item, Item=item)
+
+    async def update_appointment_status(self, appointment_id: str, status: str) -> Optional[Item]:
+        # ALL_OLD hands back the pre-update item in the same round trip
+        response = await self._run(
+            self.appointments.update_item,
+            Key={"appointment_id": appointment_id},
+            UpdateExpression="SET #s = :status",
+            ExpressionAttributeNames={"#s": "status"},
+            ExpressionAttributeValues={":status": status},
+            ReturnValues="ALL_OLD"
+        )
+        return response.get("Attributes")
+
+    async def query_appointments_for_doctor(self, doctor_id: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Item]:
+        return await self._collect(
+            self.appointments.query,
+            IndexName=DOCTOR_APPOINTMENTS_INDEX,
+            KeyConditionExpression=_date_range_condition("doctor_id", doctor_id, start, end)
+        )
+
+    async def query_appointments_for_patient(self, patient_id: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Item]:
+        return await self._collect(
+            self.appointments.query,
+            IndexName=PATIENT_APPOINTMENTS_INDEX,
+            KeyConditionExpression=_date_range_condition("patient_id", patient_id, start, end)
+        )
+
+    # --- CARE PLANS ---
+
+    async def put_care_plan(self, item: Item) -> None:
+        item = dict(item, plan_sk=item.get("plan_sk") or new_care_plan_sort_key(item))
+        await self._run(self.care_plans.put_item, Item=item)
+        pointers = [self._move_care_plan_pointer(item, LATEST_CARE_PLAN)]
+        if item.get("doctor_id"):
+            pointers.append(self._move_care_plan_pointer(
+                item, doctor_care_plan_key(item["doctor_id"]), care_doctor_id=item["doctor_id"]
+            ))
+        await asyncio.gather(*pointers)
+
+    async def _move_care_plan_pointer(self, item: Item, pointer_sk: str, **attributes) -> None:
+        # The pointer holds the plan as a nested map, so it stays out of appointment_id-index.
+        # The condition keeps a slower, older write from moving it backwards.
+        try:
+            await self._run(
+                self.care_plans.put_item,
+                Item={
+                    "patient_id": item["patient_id"], "plan_sk": pointer_sk,
+                    "latest_plan_sk": item["plan_sk"], "plan": item, **attributes
+                },
+                ConditionExpression="attribute_not_exists(latest_plan_sk) OR latest_plan_sk < :sk",
+                ExpressionAttributeValues={":sk": item["plan_sk"]}
+            )
+        except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+    async def query_care_plans_for_patient(self, patient_id: str) -> List[Item]:
+        return await self._collect(
+            self.care_plans.query,
+            KeyConditionExpression=Key("patient_id").eq(patient_id) & Key("plan_sk").begins_with(CARE_PLAN_PREFIX)
+        )
+
+    async def get_latest_care_plan(self, patient_id: str) -> Optional[Item]:
+        pointer = await self._get(self.care_plans, {"patient_id": patient_id, "plan_sk": LATEST_CARE_PLAN})
+        if pointer:
+            return pointer["plan"]
+        # No pointer yet (e.g. history migrated without one): newest plan straight off the sort key
+        response = await self._run(
+            self.care_plans.query,
+            KeyConditionExpression=Key("patient_id").eq(patient_id) & Key("plan_sk").begins_with(CARE_PLAN_PREFIX),
+            ScanIndexForward=False,
+            Limit=1
+        )
+        items = response.get("Items", [])
+        return items[0] if items else None
+
+    async def get_care_plan_for_appointment(self, appointment_id: str, attributes: Optional[Sequence[str]] = None) -> Optional[Item]:
+        response = await self._run(
+            self.care_plans.query,
+            IndexName=CARE_PLAN_APPOINTMENT_INDEX,
+            KeyConditionExpression=Key("appointment_id").eq(appointment_id),
+            Limit=1,
+            **self._projection(attributes)
+        )
+        items = response.get("Items", [])
+        return items[0] if items else None
+
+    async def get_care_plans_for_appointments(
+        self, appointment_ids: Sequence[str], attributes: Optional[Sequence[str]] = None
+    ) -> Dict[str, Item]:
+        # GSIs don't support BatchGetItem, so these are Limit=1 index queries run
+        # concurrently (the executor bounds how many are in flight)
+        unique_ids = list(dict.fromkeys(i for i in appointment_ids if i))
+        projected = list(dict.fromkeys(["appointment_id", *attributes])) if attributes else None
+        plans = await asyncio.gather(*(self.get_care_plan_for_appointment(i, projected) for i in unique_ids))
+        return {appointment_id: plan for appointment_id, plan in zip(unique_ids, plans) if plan}
+
+    @staticmethod
+    def _doctor_filter(doctor_id: str, doctor_email: Optional[str]):
+        condition = Attr("doctor_id").eq(doctor_id)
+        if doctor_email:
+            condition = condition | Attr("doctor_email").eq(doctor_email)
+        return condition
+
+    async def list_care_plans_for_doctor(self, doctor_id: str, doctor_email: Optional[str] = None) -> List[Item]:
+        return await self._collect(self.care_plans.scan, FilterExpression=self._doctor_filter(doctor_id, doctor_email))
+
+    async def page_latest_care_plans_for_doctor(
+        self, doctor_id: str, limit: Optional[int] = None, next_token: Optional[str] = None
+    ) -> Page:
+        # One unfiltered query over the doctor's pointers (so Limit is exact),
+        # then one BatchGetItem for the plans they hold
+        page = await self._page(
+            self.care_plans.query, limit, next_token,
+            IndexName=CARE_PLAN_DOCTOR_INDEX,
+            KeyConditionExpression=Key("care_doctor_id").eq(doctor_id)
+        )
+        if not page.items:
+            return page
+        keys = [{"patient_id": i["patient_id"], "plan_sk": i["plan_sk"]} for i in page.items]
+        chunks = await asyncio.gather(*(
+            self._batch_get_chunk(CARE_PLAN_HISTORY_TABLE, keys[i:i + BATCH_GET_SIZE], {})
+            for i in range(0, len(keys), BATCH_GET_SIZE)
+        ))
+        plans = {p["patient_id"]: p["plan"] for chunk in chunks for p in chunk}
+        return Page(items=[plans[k["patient_id"]] for k in keys if k["patient_id"] in plans], next_token=page.next_token)
+
+    async def count_patients_for_doctor(self, doctor_id: str) -> int:
+        params = dict(
+            IndexName=CARE_PLAN_DOCTOR_INDEX,
+            KeyConditionExpression=Key("care_doctor_id").eq(doctor_id),
+            Select="COUNT"
+        )
+        total = 0
+        while True:
+            response = await self._run(self.care_plans.query, **params)
+            total += response.get("Count", 0)
+            if not response.get("LastEvaluatedKey"):
+                return total
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    # --- PROFILES ---
+
+    async def get_doctor(self, doctor_id: str) -> Optional[Item]:
+        return await self._get(self.doctors, {"doctor_id": doctor_id})
+
+    async def find_doctor_by_email(self, email: str) -> Optional[Item]:
+        response = await self._run(
+            self.doctors.query,
+            IndexName=DOCTOR_EMAIL_INDEX,
+            KeyConditionExpression=Key("email").eq(email),
+            Limit=1
+        )
+        items = response.get("Items", [])
+        return items[0] if items else None
+
+    async def batch_get_doctors(self, doctor_ids: Sequence[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        return await self._batch_get(DOCTORS_TABLE, "doctor_id", doctor_ids, attributes)
+
+    async def put_doctor(self, item: Item) -> None:
+        await self._run(self.doctors.put_item, Item=item)
+
+    async def update_doctor_daily_limit(self, doctor_id: str, daily_limit: int) -> None:
+        await self._run(
+            self.doctors.update_item,
+            Key={"doctor_id": doctor_id},
+            UpdateExpression="SET daily_limit = :limit",
+            ExpressionAttributeValues={":limit": daily_limit}
+        )
+
+    async def list_doctors(self) -> List[Item]:
+        return await self._collect(self.doctors.scan)
+
+    async def get_patient(self, patient_id: str, attributes: Optional[Sequence[str]] = None) -> Optional[Item]:
+        return await self._get(self.patients, {"patient_id": patient_id}, attributes)
+
+    async def batch_get_patients(self, patient_ids: Sequence[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        return await self._batch_get(PATIENTS_TABLE, "patient_id", patient_ids, attributes)
+
+    async def put_patient(self, item: Item) -> None:
+        await self._run(self.patients.put_item, Item=item)
+
+    async def search_patients_by_name(self, name_fragment: str) -> List[Item]:
+        return await self._collect(
+            self.patients.scan,
+            FilterExpression="contains(#fn, :full_name)",
+            ExpressionAttributeNames={"#fn": "full_name"},
+            ExpressionAttributeValues={":full_name": name_fragment}
+        )
+
+    def iter_patients(self, attributes: Optional[Sequence[str]] = None) -> AsyncIterator[List[Item]]:
+        return self._iter_pages(self.patients.scan, **self._projection(attributes))
+
+    async def get_receptionist(self, receptionist_id: str) -> Optional[Item]:
+        return await self._get(self.receptionists, {"receptionist_id": receptionist_id})
+
+    async def put_receptionist(self, item: Item) -> None:
+        await self._run(self.receptionists.put_item, Item=item)
+
+    # --- QUEUE ---
+
+    async def list_clinic_queue(self, clinic_id: str, service_date: str) -> List[Item]:
+        # token_number is the sort key, so the partition comes back in queue order
+        tokens = await self._collect(
+            self.queue.query,
+            KeyConditionExpression=Key("queue_key").eq(queue_key(clinic_id, service_date))
+        )
+        return [_public_token(t) for t in tokens]
+
+    async def page_clinic_queue(
+        self, clinic_id: str, service_date: str, limit: Optional[int] = None, next_token: Optional[str] = None
+    ) -> Page:
+        page = await self._page(
+            self.queue.query, limit, next_token,
+            KeyConditionExpression=Key("queue_key").eq(queue_key(clinic_id, service_date))
+        )
+        page.items = [_public_token(t) for t in page.items]
+        return page
+
+    async def put_queue_token(self, item: Item) -> None:
+        await self._run(
+            self.queue.put_item,
+            Item=dict(
+                item,
+                queue_key=queue_key(item["clinic_id"], item["service_date"]),
+                expires_at=queue_expiry(item["service_date"])
+            )
+        )
+
+    async def next_queue_token(self, clinic_id: str, service_date: str) -> int:
+        # ADD is applied atomically server-side (and creates the item at 0 first),
+        # so concurrent check-ins each get a distinct number in one round trip.
+        # The condition pins the item to its day in case counter ids ever get reused.
+        response = await self._run(
+            self.queue_counters.update_item,
+            Key={"counter_id": queue_key(clinic_id, service_date)},
+            UpdateExpression=(
+                "ADD last_token :one "
+                "SET clinic_id = :clinic, service_date = :day, expires_at = if_not_exists(expires_at, :expires)"
+            ),
+            ConditionExpression="attribute_not_exists(counter_id) OR service_date = :day",
+            ExpressionAttributeValues={
+                ":one": 1,
+                ":clinic": clinic_id,
+                ":day": service_date,
+                ":expires": int(time.time()) + QUEUE_COUNTER_TTL_SECONDS
+            },
+            ReturnValues="UPDATED_NEW"
+        )
+        return int(response["Attributes"]["last_token"])
+
+    # --- ADHERENCE ---
+
+    async def put_adherence_log(self, item: Item) -> None:
+        await self._run(self.adherence_logs.put_item, Item=item)
+
+    async def batch_put_adherence_logs(self, items: Sequence[Item]) -> None:
+        # Unprocessed (throttled) puts are retried with the same backoff as batch reads
+        request = {ADHERENCE_LOGS_TABLE: [{"PutRequest": {"Item": item}} for item in items]}
+        for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+            response = await self._run(self.dynamodb.batch_write_item, RequestItems=request)
+            request = response.get("UnprocessedItems") or {}
+            if not request:
+                return
+            await asyncio.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+        raise RuntimeError(f"BatchWriteItem gave up on {len(request[ADHERENCE_LOGS_TABLE])} logs")
+
+    async def query_logs_for_appointment(self, appointment_id: str) -> List[Item]:
+        return await self._collect(
+            self.adherence_logs.query,
+            IndexName="appointment_id-index",
+            KeyConditionExpression=Key("appointment_id").eq(appointment_id)
+        )
+
+    def iter_logs_for_doctor(self, doctor_id: str) -> AsyncIterator[List[Item]]:
+        return self._iter_pages(
+            self.adherence_logs.query,
+            IndexName="doctor_id-index",
+            KeyConditionExpression=Key("doctor_id").eq(doctor_id)
+        )
+
+    async def add_to_adherence_summary(self, log: Item, recent_limit: int) -> bool:
+        # One UpdateItem: ADD and list_append are applied server-side, so
+        # concurrent logs for the same appointment never overwrite each other,
+        # and the condition makes a repeat of the same task that day a no-op.
+        # last_active is only seeded here; moving it forward is conditional (below).
+        sets = [
+            "last_active = if_not_exists(last_active, :ts)",
+            "recent_logs = list_append(:recent, if_not_exists(recent_logs, :empty))",
+        ]
+        values = {
+            ":one": 1,
+            ":ts": log["timestamp"],
+            ":recent": [recent_entry(log)],
+            ":empty": [],
+        }
+        for key in ("patient_id", "doctor_id"):
+            # doctor_id is a GSI key, which must never be written as an empty string
+            if log.get(key):
+                sets.append(f"{key} = if_not_exists({key}, :{key})")
+                values[f":{key}"] = log[key]
+        adds = ["total_completed :one", "#day :one"]
+        names = {"#day": day_count_attribute(log["date_logged"])}
+        condition = {}
+        if log.get("task_id"):
+            adds.append("#tasks :task")
+            names["#tasks"] = day_tasks_attribute(log["date_logged"])
+            values[":task"] = {log["task_id"]}
+            values[":task_id"] = log["task_id"]
+            condition["ConditionExpression"] = "NOT contains(#tasks, :task_id)"
+
+        try:
+            response = await self._run(
+                self.adherence_summaries.update_item,
+                Key={"appointment_id": log["appointment_id"]},
+                UpdateExpression="SET " + ", ".join(sets) + " ADD " + ", ".join(adds),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues="UPDATED_NEW",
+                **condition
+            )
+        except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+        attributes = response.get("Attributes", {})
+        if attributes.get("last_active", "") < log["timestamp"]:
+            # Conditional, so a late offline log (or a racing older one) never moves it back
+            try:
+                await self._run(
+                    self.adherence_summaries.update_item,
+                    Key={"appointment_id": log["appointment_id"]},
+                    UpdateExpression="SET last_active = :ts",
+                    ConditionExpression="last_active < :ts",
+                    ExpressionAttributeValues={":ts": log["timestamp"]}
+                )
+            except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+                pass
+
+        # Trimming needs a second write, so let the list run to twice the limit
+        # and then cut it back; only about one log in `recent_limit` pays for it.
+        # Late offline logs are prepended out of order, so keep the newest by
+        # logged_at rather than the first by position; the size condition skips
+        # the trim if another log changed the list meanwhile (the next one trims).
+        recent = attributes.get("recent_logs", [])
+        if len(recent) > 2 * recent_limit:
+            keep = {id(e) for e in newest_recent_logs(recent, recent_limit)}
+            try:
+                await self._run(
+                    self.adherence_summaries.update_item,
+                    Key={"appointment_id": log["appointment_id"]},
+                    UpdateExpression="REMOVE " + ", ".join(
+                        f"recent_logs[{i}]" for i, e in enumerate(recent) if id(e) not in keep
+                    ),
+                    ConditionExpression="size(recent_logs) = :length",
+                    ExpressionAttributeValues={":length": len(recent)}
+                )
+            except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+                pass
+        return True
+
+    async def get_adherence_summary(self, appointment_id: str) -> Optional[Item]:
+        return await self._get(self.adherence_summaries, {"appointment_id": appointment_id})
+
+    async def batch_get_adherence_summaries(self, appointment_ids: Sequence[str]) -> Dict[str, Item]:
+        return await self._batch_get(ADHERENCE_SUMMARIES_TABLE, "appointment_id", appointment_ids, None)
+
+    async def create_adherence_summary(self, item: Item) -> bool:
+        try:
+            await self._run(
+                self.adherence_summaries.put_item,
+                Item=item,
+                ConditionExpression="attribute_not_exists(appointment_id)"
+            )
+            return True
+        except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def iter_adherence_summaries_for_doctor(self, doctor_id: str) -> AsyncIterator[List[Item]]:
+        return self._iter_pages(
+            self.adherence_summaries.query,
+            IndexName=DOCTOR_SUMMARIES_INDEX,
+            KeyConditionExpression=Key("doctor_id").eq(doctor_id)
+        )
+
+    # --- DOCTOR STATS ---
+
+    async def increment_doctor_stats(self, doctor_id: str, stat_key: str, counters: Dict[str, int]) -> None:
+        await self._run(
+            self.doctor_stats.update_item,
+            Key={"doctor_id": doctor_id, "stat_key": stat_key},
+            UpdateExpression="ADD " + ", ".join(f"#c{i} :c{i}" for i in range(len(counters))),
+            ExpressionAttributeNames={f"#c{i}": name for i, name in enumerate(counters)},
+            ExpressionAttributeValues={f":c{i}": delta for i, delta in enumerate(counters.values())}
+        )
+
+    async def add_doctor_patient(self, doctor_id: str, patient_id: str) -> bool:
+        # Conditional put: a repeat visit fails the condition instead of growing anything
+        try:
+            await self._run(
+                self.doctor_stats.put_item,
+                Item={"doctor_id": doctor_id, "stat_key": patient_marker_key(patient_id)},
+                ConditionExpression="attribute_not_exists(stat_key)"
+            )
+            return True
+        except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    async def set_doctor_stat(self, doctor_id: str, stat_key: str, name: str, value) -> None:
+        await self._run(
+            self.doctor_stats.update_item,
+            Key={"doctor_id": doctor_id, "stat_key": stat_key},
+            UpdateExpression="SET #n = :v",
+            ExpressionAttributeNames={"#n": name},
+            ExpressionAttributeValues={":v": value}
+        )
+
+    async def get_doctor_stats(self, doctor_id: str, stat_keys: Sequence[str]) -> Dict[str, Item]:
+        keys = [{"doctor_id": doctor_id, "stat_key": k} for k in dict.fromkeys(stat_keys)]
+        items = await self._batch_get_chunk(DOCTOR_STATS_TABLE, keys, {})
+        return {item["stat_key"]: item for item in items}
+
+    # --- NOTIFICATIONS ---
+
+    async def put_notification(self, item: Item) -> None:
+        await self._run(self.notifications.put_item, Item=item)
+
+    async def page_notifications_for_patient(self, patient_id: str, limit: Optional[int] = None, next_token: Optional[str] = None) -> Page:
+        return await self._page(
+            self.notifications.query, limit, next_token,
+            IndexName=PATIENT_NOTIFICATIONS_INDEX,
+            KeyConditionExpression=Key("patient_id").eq(patient_id),
+            ScanIndexForward=False
+        )
+
+    async def count_unread_notifications(self, patient_id: str) -> int:
+        total = 0
+        params = dict(
+            IndexName=PATIENT_NOTIFICATIONS_INDEX,
+            KeyConditionExpression=Key("patient_id").eq(patient_id),
+            FilterExpression=Attr("status").eq("Unread"),
+            Select="COUNT"
+        )
+        while True:
+            response = await self._run(self.notifications.query, **params)
+            total += response.get("Count", 0)
+            if "LastEvaluatedKey" not in response:
+                return total
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    # --- LIFECYCLE ---
+
+    def close(self) -> None:
+        self.executor.shutdown()
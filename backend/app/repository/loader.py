@@ -0,0 +1,61 @@
+import asyncio
+from typing import Dict, Iterable, Optional, Sequence
+
+from app.repository.base import Item, Repository
+
+
+class ProfileLoader:
+    """
+    Request-scoped batch loader for doctor and patient profiles.
+
+    Handlers collect every id they need to enrich a result list, then ask for
+    them in one go: ids are de-duplicated, fetched with BatchGetItem (100 keys
+    per round trip) and memoised for the rest of the request. Create one per
+    request; it holds no state worth sharing between users.
+
+        loader = ProfileLoader(repo)
+        names = await loader.patients(ids, attributes=["full_name"])
+    """
+
+    def __init__(self, repo: Repository):
+        self.repo = repo
+        # Memo per projection, so a narrow read never answers a wider one
+        self._doctors: Dict[tuple, Dict[str, Optional[Item]]] = {}
+        self._patients: Dict[tuple, Dict[str, Optional[Item]]] = {}
+
+    @staticmethod
+    def _memo(store: Dict[tuple, Dict[str, Optional[Item]]], attributes: Optional[Sequence[str]]) -> Dict[str, Optional[Item]]:
+        return store.setdefault(tuple(sorted(attributes or ())), {})
+
+    @staticmethod
+    def _missing(memo: Dict[str, Optional[Item]], ids: Iterable[str]) -> list:
+        return list(dict.fromkeys(i for i in ids if i and i not in memo))
+
+    async def patients(self, patient_ids: Iterable[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        """Returns {patient_id: profile} for the ids that exist."""
+        patient_ids = list(patient_ids)
+        memo = self._memo(self._patients, attributes)
+        missing = self._missing(memo, patient_ids)
+        if missing:
+            found = await self.repo.batch_get_patients(missing, attributes)
+            for pid in missing:
+                memo[pid] = found.get(pid)
+        return {pid: memo[pid] for pid in patient_ids if memo.get(pid)}
+
+    async def doctors(self, doctor_refs: Iterable[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        """
+        Returns {ref: profile}. A ref is normally a doctor_id, but historical
+        rows stored the doctor's email there; those are resolved through the
+        email index (one query per distinct email) instead of a table scan.
+        """
+        doctor_refs = list(doctor_refs)
+        memo = self._memo(self._doctors, attributes)
+        missing = self._missing(memo, doctor_refs)
+        if missing:
+            found = await self.repo.batch_get_doctors(missing, attributes)
+            emails = [ref for ref in missing if ref not in found and "@" in ref]
+            by_email = await asyncio.gather(*(self.repo.find_doctor_by_email(email) for email in emails))
+            found.update({email: profile for email, profile in zip(emails, by_email) if profile})
+            for ref in missing:
+                memo[ref] = found.get(ref)
+        return {ref: memo[ref] for ref in doctor_refs if memo.get(ref)}
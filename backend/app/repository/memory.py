@@ -0,0 +1,338 @@
+import copy
+import json
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from app.repository.base import Item, Repository, care_plan_sort_key, new_care_plan_sort_key
+from app.repository.pagination import Page, clamp_page_size, decode_page_token, encode_page_token
+from app.services.adherence_summary import (
+    day_count_attribute, day_tasks_attribute, newest_recent_logs, recent_entry, summary_from_logs
+)
+from app.services.doctor_stats import patient_marker_key
+
+# Page size used when streaming, roughly what a 1 MB DynamoDB page holds for small items
+STREAM_PAGE_SIZE = 500
+
+
+class InMemoryRepository(Repository):
+    """
+    Process-local stand-in for DynamoDB, used for offline development and load
+    tests (DATA_BACKEND=memory). Items are copied on the way in and out so
+    handlers see the same value semantics they would get from the real tables.
+    """
+
+    def __init__(self, seed_file: Optional[str] = None):
+        self.appointments: Dict[str, Item] = {}
+        self.care_plans: Dict[tuple, Item] = {}
+        self.notifications: Dict[str, Item] = {}
+        self.doctors: Dict[str, Item] = {}
+        self.patients: Dict[str, Item] = {}
+        self.receptionists: Dict[str, Item] = {}
+        self.queue: Dict[tuple, Item] = {}
+        self.queue_counters: Dict[str, int] = {}
+        self.adherence_logs: Dict[str, Item] = {}
+        self.adherence_summaries: Dict[str, Item] = {}
+        self.doctor_stats: Dict[tuple, Item] = {}
+        if seed_file:
+            self.load_seed(seed_file)
+
+    def load_seed(self, path: str) -> None:
+        """
+        Loads a JSON document shaped like {"doctors": [...], "patients": [...], ...}.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            seed = json.load(f)
+        for item in seed.get("appointments", []):
+            self.appointments[item["appointment_id"]] = item
+        for item in seed.get("care_plans", []):
+            created = str(item.get("created_at") or item.get("created_date") or "")
+            item.setdefault("plan_sk", care_plan_sort_key(created, item.get("appointment_id", "")))
+            self.care_plans[(item["patient_id"], item["plan_sk"])] = item
+        for item in seed.get("notifications", []):
+            self.notifications[item["notification_id"]] = item
+        for item in seed.get("doctors", []):
+            self.doctors[item["doctor_id"]] = item
+        for item in seed.get("patients", []):
+            self.patients[item["patient_id"]] = item
+        for item in seed.get("receptionists", []):
+            self.receptionists[item["receptionist_id"]] = item
+        for item in seed.get("queue", []):
+            self.queue[(item["clinic_id"], item["service_date"], int(item["token_number"]))] = item
+        for item in seed.get("adherence_logs", []):
+            self.adherence_logs[item["log_id"]] = item
+        # Seeded logs never went through /log, so derive their summaries up front
+        by_appointment: Dict[str, List[Item]] = {}
+        for log in self.adherence_logs.values():
+            by_appointment.setdefault(log.get("appointment_id"), []).append(log)
+        for appointment_id, logs in by_appointment.items():
+            if appointment_id:
+                self.adherence_summaries[appointment_id] = summary_from_logs(appointment_id, logs)
+
+    @staticmethod
+    def _copy(item: Optional[Item]) -> Optional[Item]:
+        return copy.deepcopy(item) if item is not None else None
+
+    @staticmethod
+    def _copy_all(items) -> List[Item]:
+        return [copy.deepcopy(item) for item in items]
+
+    @staticmethod
+    def _project(item: Optional[Item], attributes: Optional[Sequence[str]]) -> Optional[Item]:
+        if item is not None and attributes:
+            item = {k: v for k, v in item.items() if k in attributes}
+        return copy.deepcopy(item) if item is not None else None
+
+    def _batch_get(self, store: Dict[str, Item], key_name: str, ids: Sequence[str], attributes: Optional[Sequence[str]]) -> Dict[str, Item]:
+        if attributes:
+            attributes = set(attributes) | {key_name}
+        return {i: self._project(store[i], attributes) for i in set(ids) if i in store}
+
+    def _page(self, items: List[Item], limit: Optional[int], next_token: Optional[str]) -> Page:
+        # The cursor is just an offset into the (stably ordered) result list
+        limit = clamp_page_size(limit)
+        offset = int((decode_page_token(next_token) or {}).get("offset", 0))
+        chunk = items[offset:offset + limit]
+        more = offset + limit < len(items)
+        return Page(
+            items=self._copy_all(chunk),
+            next_token=encode_page_token({"offset": offset + limit}) if more else None
+        )
+
+    # --- APPOINTMENTS ---
+
+    async def get_appointment(self, appointment_id: str) -> Optional[Item]:
+        return self._copy(self.appointments.get(appointment_id))
+
+    async def batch_get_appointments(self, appointment_ids: Sequence[str]) -> Dict[str, Item]:
+        return self._batch_get(self.appointments, "appointment_id", appointment_ids, None)
+
+    async def put_appointment(self, item: Item) -> None:
+        self.appointments[item["appointment_id"]] = self._copy(item)
+
+    async def update_appointment_status(self, appointment_id: str, status: str) -> Optional[Item]:
+        previous = self._copy(self.appointments.get(appointment_id))
+        # DynamoDB's update_item upserts, so a missing appointment gets created here too
+        self.appointments.setdefault(appointment_id, {"appointment_id": appointment_id})["status"] = status
+        return previous
+
+    def _appointments_in_range(self, owner_key: str, owner: str, start: Optional[str], end: Optional[str]) -> List[Item]:
+        # Mirrors the GSI: sparse on appointment_date, sorted ascending by it
+        matches = [
+            a for a in self.appointments.values()
+            if a.get(owner_key) == owner and a.get("appointment_date")
+            and (start is None or a["appointment_date"] >= start)
+            and (end is None or a["appointment_date"] <= end)
+        ]
+        matches.sort(key=lambda a: a["appointment_date"])
+        return self._copy_all(matches)
+
+    async def query_appointments_for_doctor(self, doctor_id: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Item]:
+        return self._appointments_in_range("doctor_id", doctor_id, start, end)
+
+    async def query_appointments_for_patient(self, patient_id: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Item]:
+        return self._appointments_in_range("patient_id", patient_id, start, end)
+
+    # --- CARE PLANS ---
+
+    async def put_care_plan(self, item: Item) -> None:
+        item = dict(item, plan_sk=item.get("plan_sk") or new_care_plan_sort_key(item))
+        self.care_plans[(item["patient_id"], item["plan_sk"])] = self._copy(item)
+
+    async def query_care_plans_for_patient(self, patient_id: str) -> List[Item]:
+        return self._copy_all(self.care_plans[key] for key in sorted(k for k in self.care_plans if k[0] == patient_id))
+
+    async def get_latest_care_plan(self, patient_id: str) -> Optional[Item]:
+        keys = [k for k in self.care_plans if k[0] == patient_id]
+        return self._copy(self.care_plans[max(keys)]) if keys else None
+
+    async def get_care_plan_for_appointment(self, appointment_id: str, attributes: Optional[Sequence[str]] = None) -> Optional[Item]:
+        plan = next((p for p in self.care_plans.values() if p.get("appointment_id") == appointment_id), None)
+        return self._project(plan, attributes)
+
+    async def get_care_plans_for_appointments(
+        self, appointment_ids: Sequence[str], attributes: Optional[Sequence[str]] = None
+    ) -> Dict[str, Item]:
+        if attributes:
+            attributes = set(attributes) | {"appointment_id"}
+        wanted = set(appointment_ids)
+        return {
+            p["appointment_id"]: self._project(p, attributes)
+            for p in self.care_plans.values() if p.get("appointment_id") in wanted
+        }
+
+    async def list_care_plans_for_doctor(self, doctor_id: str, doctor_email: Optional[str] = None) -> List[Item]:
+        return self._copy_all(
+            p for p in self.care_plans.values()
+            if p.get("doctor_id") == doctor_id or (doctor_email and p.get("doctor_email") == doctor_email)
+        )
+
+    def _latest_plans_by_doctor(self, doctor_id: str) -> Dict[str, Item]:
+        # Plans are kept in plan_sk order per patient, so the last one seen is the newest
+        latest: Dict[str, Item] = {}
+        for key in sorted(self.care_plans):
+            plan = self.care_plans[key]
+            if plan.get("doctor_id") == doctor_id:
+                latest[key[0]] = plan
+        return latest
+
+    async def page_latest_care_plans_for_doctor(
+        self, doctor_id: str, limit: Optional[int] = None, next_token: Optional[str] = None
+    ) -> Page:
+        latest = self._latest_plans_by_doctor(doctor_id)
+        return self._page([latest[pid] for pid in sorted(latest)], limit, next_token)
+
+    async def count_patients_for_doctor(self, doctor_id: str) -> int:
+        return len(self._latest_plans_by_doctor(doctor_id))
+
+    # --- PROFILES ---
+
+    async def get_doctor(self, doctor_id: str) -> Optional[Item]:
+        return self._copy(self.doctors.get(doctor_id))
+
+    async def find_doctor_by_email(self, email: str) -> Optional[Item]:
+        return self._copy(next((d for d in self.doctors.values() if d.get("email") == email), None))
+
+    async def batch_get_doctors(self, doctor_ids: Sequence[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        return self._batch_get(self.doctors, "doctor_id", doctor_ids, attributes)
+
+    async def put_doctor(self, item: Item) -> None:
+        self.doctors[item["doctor_id"]] = self._copy(item)
+
+    async def update_doctor_daily_limit(self, doctor_id: str, daily_limit: int) -> None:
+        self.doctors.setdefault(doctor_id, {"doctor_id": doctor_id})["daily_limit"] = daily_limit
+
+    async def list_doctors(self) -> List[Item]:
+        return self._copy_all(self.doctors.values())
+
+    async def get_patient(self, patient_id: str, attributes: Optional[Sequence[str]] = None) -> Optional[Item]:
+        return self._project(self.patients.get(patient_id), attributes)
+
+    async def batch_get_patients(self, patient_ids: Sequence[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        return self._batch_get(self.patients, "patient_id", patient_ids, attributes)
+
+    async def put_patient(self, item: Item) -> None:
+        self.patients[item["patient_id"]] = self._copy(item)
+
+    async def search_patients_by_name(self, name_fragment: str) -> List[Item]:
+        return self._copy_all(p for p in self.patients.values() if name_fragment in p.get("full_name", ""))
+
+    async def iter_patients(self, attributes: Optional[Sequence[str]] = None) -> AsyncIterator[List[Item]]:
+        patients = list(self.patients.values())
+        for start in range(0, len(patients), STREAM_PAGE_SIZE):
+            yield [self._project(p, attributes) for p in patients[start:start + STREAM_PAGE_SIZE]]
+
+    async def get_receptionist(self, receptionist_id: str) -> Optional[Item]:
+        return self._copy(self.receptionists.get(receptionist_id))
+
+    async def put_receptionist(self, item: Item) -> None:
+        self.receptionists[item["receptionist_id"]] = self._copy(item)
+
+    # --- QUEUE ---
+
+    def _clinic_queue(self, clinic_id: str, service_date: str) -> List[Item]:
+        return [t for (c, d, _), t in sorted(self.queue.items()) if c == clinic_id and d == service_date]
+
+    async def list_clinic_queue(self, clinic_id: str, service_date: str) -> List[Item]:
+        return self._copy_all(self._clinic_queue(clinic_id, service_date))
+
+    async def page_clinic_queue(
+        self, clinic_id: str, service_date: str, limit: Optional[int] = None, next_token: Optional[str] = None
+    ) -> Page:
+        return self._page(self._clinic_queue(clinic_id, service_date), limit, next_token)
+
+    async def put_queue_token(self, item: Item) -> None:
+        self.queue[(item["clinic_id"], item["service_date"], int(item["token_number"]))] = self._copy(item)
+
+    async def next_queue_token(self, clinic_id: str, service_date: str) -> int:
+        # No await between read and write, so this is atomic on the event loop
+        key = f"{clinic_id}#{service_date}"
+        self.queue_counters[key] = self.queue_counters.get(key, 0) + 1
+        return self.queue_counters[key]
+
+    # --- ADHERENCE ---
+
+    async def put_adherence_log(self, item: Item) -> None:
+        self.adherence_logs[item["log_id"]] = self._copy(item)
+
+    async def batch_put_adherence_logs(self, items: Sequence[Item]) -> None:
+        for item in items:
+            self.adherence_logs[item["log_id"]] = self._copy(item)
+
+    async def query_logs_for_appointment(self, appointment_id: str) -> List[Item]:
+        return self._copy_all(l for l in self.adherence_logs.values() if l.get("appointment_id") == appointment_id)
+
+    async def iter_logs_for_doctor(self, doctor_id: str) -> AsyncIterator[List[Item]]:
+        logs = [l for l in self.adherence_logs.values() if l.get("doctor_id") == doctor_id]
+        for start in range(0, len(logs), STREAM_PAGE_SIZE):
+            yield self._copy_all(logs[start:start + STREAM_PAGE_SIZE])
+
+    async def add_to_adherence_summary(self, log: Item, recent_limit: int) -> bool:
+        # No await inside, so the read-modify-write is atomic on the event loop
+        item = self.adherence_summaries.setdefault(log["appointment_id"], {"appointment_id": log["appointment_id"]})
+        if log.get("task_id") and log["task_id"] in item.get(day_tasks_attribute(log["date_logged"]), ()):
+            return False
+        for key in ("patient_id", "doctor_id"):
+            if log.get(key):
+                item.setdefault(key, log[key])
+        item["total_completed"] = item.get("total_completed", 0) + 1
+        # A late offline log must not move last_active back or push newer entries out
+        if item.get("last_active", "") < log["timestamp"]:
+            item["last_active"] = log["timestamp"]
+        item["recent_logs"] = newest_recent_logs([recent_entry(log)] + item.get("recent_logs", []), recent_limit)
+        day = day_count_attribute(log["date_logged"])
+        item[day] = item.get(day, 0) + 1
+        if log.get("task_id"):
+            item.setdefault(day_tasks_attribute(log["date_logged"]), set()).add(log["task_id"])
+        return True
+
+    async def get_adherence_summary(self, appointment_id: str) -> Optional[Item]:
+        return self._copy(self.adherence_summaries.get(appointment_id))
+
+    async def batch_get_adherence_summaries(self, appointment_ids: Sequence[str]) -> Dict[str, Item]:
+        return self._batch_get(self.adherence_summaries, "appointment_id", appointment_ids, None)
+
+    async def create_adherence_summary(self, item: Item) -> bool:
+        if item["appointment_id"] in self.adherence_summaries:
+            return False
+        self.adherence_summaries[item["appointment_id"]] = self._copy(item)
+        return True
+
+    async def iter_adherence_summaries_for_doctor(self, doctor_id: str) -> AsyncIterator[List[Item]]:
+        summaries = [s for s in self.adherence_summaries.values() if s.get("doctor_id") == doctor_id]
+        for start in range(0, len(summaries), STREAM_PAGE_SIZE):
+            yield self._copy_all(summaries[start:start + STREAM_PAGE_SIZE])
+
+    # --- DOCTOR STATS ---
+
+    def _stats_item(self, doctor_id: str, stat_key: str) -> Item:
+        return self.doctor_stats.setdefault((doctor_id, stat_key), {"doctor_id": doctor_id, "stat_key": stat_key})
+
+    async def increment_doctor_stats(self, doctor_id: str, stat_key: str, counters: Dict[str, int]) -> None:
+        item = self._stats_item(doctor_id, stat_key)
+        for name, delta in counters.items():
+            item[name] = item.get(name, 0) + delta
+
+    async def add_doctor_patient(self, doctor_id: str, patient_id: str) -> bool:
+        key = (doctor_id, patient_marker_key(patient_id))
+        if key in self.doctor_stats:
+            return False
+        self._stats_item(*key)
+        return True
+
+    async def set_doctor_stat(self, doctor_id: str, stat_key: str, name: str, value) -> None:
+        self._stats_item(doctor_id, stat_key)[name] = value
+
+    async def get_doctor_stats(self, doctor_id: str, stat_keys: Sequence[str]) -> Dict[str, Item]:
+        return {k: self._copy(self.doctor_stats[(doctor_id, k)]) for k in stat_keys if (doctor_id, k) in self.doctor_stats}
+
+    # --- NOTIFICATIONS ---
+
+    async def put_notification(self, item: Item) -> None:
+        self.notifications[item["notification_id"]] = self._copy(item)
+
+    async def page_notifications_for_patient(self, patient_id: str, limit: Optional[int] = None, next_token: Optional[str] = None) -> Page:
+        mine = [n for n in self.notifications.values() if n.get("patient_id") == patient_id]
+        mine.sort(key=lambda n: n.get("timestamp", ""), reverse=True)
+        return self._page(mine, limit, next_token)
+
+    async def count_unread_notifications(self, patient_id: str) -> int:
+        return sum(1 for n in self.notifications.values() if n.get("patient_id") == patient_id and n.get("status") == "Unread")
@@ -0,0 +1,54 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+@dataclass
+class Page:
+    """One page of a list endpoint plus the opaque cursor for the next one."""
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    next_token: Optional[str] = None
+
+
+class InvalidPageToken(ValueError):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Unserializable key value: {value!r}")
+
+
+def encode_page_token(last_evaluated_key: Optional[dict]) -> Optional[str]:
+    """Turns a DynamoDB LastEvaluatedKey (or any small dict) into a URL-safe cursor."""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_page_token(token: Optional[str]) -> Optional[dict]:
+    """Inverse of encode_page_token. Raises InvalidPageToken on tampered input."""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        # boto3 rejects floats, so numbers in key attributes come back as Decimal
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")), parse_float=Decimal)
+    except (ValueError, TypeError) as e:
+        raise InvalidPageToken("Invalid next_token.") from e
+    if not isinstance(key, dict):
+        raise InvalidPageToken("Invalid next_token.")
+    return key
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
@@ -0,0 +1,182 @@
+import copy
+import threading
+from typing import Dict, Optional, Sequence
+
+from cachetools import TTLCache
+
+from app.repository.base import Item, Repository
+
+# Cached "this profile does not exist", so unknown ids don't hit DynamoDB every time either
+_MISSING = object()
+
+
+def _project(item: Optional[Item], attributes: Optional[Sequence[str]]) -> Optional[Item]:
+    if item is None:
+        return None
+    if attributes:
+        item = {k: v for k, v in item.items() if k in attributes}
+    return copy.deepcopy(item)
+
+
+class ProfileCachingRepository:
+    """
+    Read-through TTL cache for doctor and patient profiles, wrapped around the
+    real repository. Everything that isn't a profile read or write is passed
+    straight through to the backend.
+
+    Profiles only change through the /setup-profile endpoints (and the doctor's
+    capacity update), which write through this wrapper and drop the cached copy
+    immediately. The TTL only bounds how long other worker processes can serve
+    a stale name. Full items are cached and projected on the way out, so a
+    narrow read (attributes=[...]) never poisons a wider one.
+
+    A doctor is cached under both their id and their email; the email each
+    cached doctor was seen with is remembered so a write drops both entries.
+    Every write also bumps a generation counter, and a read-through fill that
+    started before a write doesn't store what it fetched, since it may
+    predate the write.
+    """
+
+    def __init__(self, backend: Repository, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        # /metrics runs on the threadpool, so guard the cache even though handlers share one loop
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._doctor_emails: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_fills = 0
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    # --- cache plumbing ---
+
+    def _lookup(self, key: tuple):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def _generation_now(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def _store(self, key: tuple, item: Optional[Item], generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                # A write landed while this was being fetched
+                self.stale_fills += 1
+                return
+            self._cache[key] = copy.deepcopy(item) if item is not None else _MISSING
+            if item is not None and item.get("doctor_id") and item.get("email") and key[0] in ("doctor", "doctor_email"):
+                self._doctor_emails[item["doctor_id"]] = item["email"]
+
+    def invalidate(self, *keys: tuple) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._cache.pop(key, None)
+
+    def _invalidate_doctor(self, doctor_id: str, *emails: Optional[str]) -> None:
+        with self._lock:
+            known = self._doctor_emails.pop(doctor_id, None)
+        self.invalidate(("doctor", doctor_id), *(("doctor_email", e) for e in {known, *emails} if e))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+            self._doctor_emails.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stale_fills": self.stale_fills,
+            }
+
+    async def _get_one(self, kind: str, item_id: str, fetch, attributes: Optional[Sequence[str]]) -> Optional[Item]:
+        cached = self._lookup((kind, item_id))
+        if cached is None:
+            generation = self._generation_now()
+            item = await fetch(item_id)
+            self._store((kind, item_id), item, generation)
+            return _project(item, attributes)
+        return None if cached is _MISSING else _project(cached, attributes)
+
+    async def _get_many(self, kind: str, ids: Sequence[str], fetch, attributes: Optional[Sequence[str]]) -> Dict[str, Item]:
+        found: Dict[str, Item] = {}
+        missing = []
+        for item_id in dict.fromkeys(ids):
+            cached = self._lookup((kind, item_id))
+            if cached is None:
+                missing.append(item_id)
+            elif cached is not _MISSING:
+                found[item_id] = _project(cached, attributes)
+        if missing:
+            generation = self._generation_now()
+            fetched = await fetch(missing)
+            for item_id in missing:
+                item = fetched.get(item_id)
+                self._store((kind, item_id), item, generation)
+                if item is not None:
+                    found[item_id] = _project(item, attributes)
+        return found
+
+    # --- DOCTORS ---
+
+    async def get_doctor(self, doctor_id: str) -> Optional[Item]:
+        return await self._get_one("doctor", doctor_id, self.backend.get_doctor, None)
+
+    async def find_doctor_by_email(self, email: str) -> Optional[Item]:
+        return await self._get_one("doctor_email", email, self.backend.find_doctor_by_email, None)
+
+    async def batch_get_doctors(self, doctor_ids: Sequence[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        return await self._get_many("doctor", doctor_ids, self.backend.batch_get_doctors, attributes)
+
+    async def put_doctor(self, item: Item) -> None:
+        await self.backend.put_doctor(item)
+        # The old email too, in case the profile changed it
+        self._invalidate_doctor(item["doctor_id"], item.get("email"))
+
+    async def update_doctor_daily_limit(self, doctor_id: str, daily_limit: int) -> None:
+        await self.backend.update_doctor_daily_limit(doctor_id, daily_limit)
+        self._invalidate_doctor(doctor_id)
+
+    # --- PATIENTS ---
+
+    async def get_patient(self, patient_id: str, attributes: Optional[Sequence[str]] = None) -> Optional[Item]:
+        return await self._get_one("patient", patient_id, self.backend.get_patient, attributes)
+
+    async def batch_get_patients(self, patient_ids: Sequence[str], attributes: Optional[Sequence[str]] = None) -> Dict[str, Item]:
+        return await self._get_many("patient", patient_ids, self.backend.batch_get_patients, attributes)
+
+    async def put_patient(self, item: Item) -> None:
+        await self.backend.put_patient(item)
+        self.invalidate(("patient", item["patient_id"]))
+
+    # --- RECEPTIONISTS ---
+
+    async def get_receptionist(self, receptionist_id: str) -> Optional[Item]:
+        return await self._get_one("receptionist", receptionist_id, self.backend.get_receptionist, None)
+
+    async def put_receptionist(self, item: Item) -> None:
+        await self.backend.put_receptionist(item)
+        self.invalidate(("receptionist", item["receptionist_id"]))
+
+
+# Duck-typed wrapper: register it so isinstance(repo, Repository) still holds
+Repository.register(ProfileCachingRepository)
@@ -1,11 +1,11 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
 from app.services.auth import require_role
+from app.repository import ProfileLoader, get_repository
+from app.services import adherence_engine, adherence_summary, doctor_stats
+from app.services.utils import clinic_today
 from pydantic import BaseModel
-from datetime import datetime, date, timedelta,timezone
-import uuid
-import os
-import boto3
-from boto3.dynamodb.conditions import Key
+from datetime import datetime
 
 router = APIRouter(prefix="/api/adherence", tags=["Adherence & Recovery"])
 
@@ -15,35 +15,47 @@ class TaskLogRequest(BaseModel):
     patient_id: str
     task_id: str      # e.g., "Morning"
     task_title: str   # e.g., "Take Paracetamol"
-dynamodb = boto3.resource('dynamodb', region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
-adherence_logs_table = dynamodb.Table('DrDecideAdherenceLogs')
-appointments_table = dynamodb.Table('DrDecideAppointments')
-care_plans_table = dynamodb.Table('DrDecideCarePlans')
-patient_table = dynamodb.Table('DrDecidePatients')
+repo = get_repository()
+
+# Care plan fields the adherence engine reads (keeps the batched fetch small)
+PLAN_SCORING_ATTRIBUTES = ['created_date', 'created_at', 'follow_up_date', 'daily_task_count']
+
+
+async def load_care_plans(keys, attributes=None):
+    """
+    Care plans for (patient_id, appointment_id) pairs, keyed by appointment_id,
+    looked up directly through appointment_id-index. A plan saved without its
+    appointment_id falls back to the patient's latest plan.
+    """
+    plans = await repo.get_care_plans_for_appointments([appt_id for _, appt_id in keys], attributes=attributes)
+    missing = [(p_id, appt_id) for p_id, appt_id in keys if appt_id not in plans and p_id and p_id != "Unknown"]
+    if missing:
+        patient_ids = list({p_id for p_id, _ in missing})
+        results = await asyncio.gather(*(repo.get_latest_care_plan(p_id) for p_id in patient_ids))
+        latest_plans = {p_id: plan for p_id, plan in zip(patient_ids, results) if plan}
+        for p_id, appt_id in missing:
+            if p_id in latest_plans:
+                plans[appt_id] = latest_plans[p_id]
+    return plans
 
 
 @router.post("/log")
 async def log_task_completion(request: TaskLogRequest):
     """Patient clicks 'Mark Done' on a daily task."""
     try:
-        now = datetime.utcnow()
-        today_str = date.today().isoformat()
-        log_id = f"LOG-{uuid.uuid4().hex[:8].upper()}"
-        
-        log_item = {
-            'log_id': log_id, # Primary Key
-            'appointment_id': request.appointment_id, # Global Secondary Index for fast querying
-            'patient_id': request.patient_id,
-            'doctor_id': request.doctor_id,
-            'task_id': request.task_id,
-            'task_title': request.task_title,
-            'timestamp': now.isoformat(),
-            'date_logged': today_str # Storing the date makes fetching "Today's tasks" very fast
-        }
-        
-        adherence_logs_table.put_item(Item=log_item)
+        # Counted on the clinic (IST) day, the same calendar the stats endpoints use for "today"
+        log_item = adherence_summary.build_log(
+            request.appointment_id, request.patient_id, request.doctor_id,
+            request.task_id, request.task_title, datetime.utcnow(), clinic_today()
+        )
+
+        # Folds it into the running totals (catching double taps), then queues the raw log
+        # for the next coalesced BatchWriteItem
+        results = await adherence_summary.record_completions(repo, [log_item])
+        if not results[log_item['log_id']]:
+            return {"message": "Task already logged today", "log_id": log_item['log_id']}
         
-        return {"message": "Task logged successfully", "log_id": log_id}
+        return {"message": "Task logged successfully", "log_id": log_item['log_id']}
         
     except Exception as e:
         print(f"Error logging task: {e}")
@@ -55,22 +67,14 @@ async def log_task_completion(request: TaskLogRequest):
 @router.get("/stats/{appointment_id}")
 async def get_patient_recovery_status(appointment_id: str):
     try:
-        # 1. Fetch all completed task logs
-        response = adherence_logs_table.query(
-            IndexName='appointment_id-index',
-            KeyConditionExpression=Key('appointment_id').eq(appointment_id)
-        )
-        logs = response.get('Items', [])
-        logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        # 1. Read the running totals (one small item, however long the plan has run)
+        summary = await adherence_summary.load_summary(repo, appointment_id) or {}
         
-        # 2. FIND THE PATIENT ID FIRST (From logs or appointments table)
-        patient_id = "Unknown"
-        if logs:
-            patient_id = logs[0].get('patient_id')
+        # 2. FIND THE PATIENT ID FIRST (From the summary or appointments table)
+        patient_id = summary.get('patient_id') or "Unknown"
         
         if not patient_id or patient_id == "Unknown":
-            appt_response = appointments_table.get_item(Key={'appointment_id': appointment_id})
-            appt_item = appt_response.get('Item')
+            appt_item = await repo.get_appointment(appointment_id)
             if appt_item:
                 patient_id = appt_item.get('patient_id', 'Unknown')
                 
@@ -79,17 +83,7 @@ async def get_patient_recovery_status(appointment_id: str):
 
         # 3. FETCH THE CARE PLAN (Using the correct partition key!)
         try:
-            # We use query instead of get_item just in case you also have a Sort Key
-            plan_response = care_plans_table.query(
-                KeyConditionExpression=Key('patient_id').eq(patient_id)
-            )
-            # Find the specific plan for this appointment, or default to the most recent one
-            all_plans = plan_response.get('Items', [])
-            plan_item = next((p for p in all_plans if p.get('appointment_id') == appointment_id), None)
-         
-            if not plan_item and all_plans:
-                plan_item = all_plans[0] # Fallback if appointment_id wasn't saved perfectly
-                
+            plan_item = (await load_care_plans([(patient_id, appointment_id)])).get(appointment_id)
         except Exception as e:
             print(f"AWS Error fetching Care Plan: {e}")
             raise HTTPException(status_code=500, detail="Care Plan table schema mismatch.")
@@ -100,90 +94,33 @@ async def get_patient_recovery_status(appointment_id: str):
         # 4. FETCH PATIENT NAME
         patient_name = "Unknown Patient"
         try:
-            p_item = patient_table.get_item(
-                Key={'patient_id': patient_id},
-                ProjectionExpression='full_name' # Your actual column name
-            ).get('Item', {})
+            p_item = await repo.get_patient(patient_id, attributes=['full_name']) or {} # Your actual column name
             patient_name = p_item.get('full_name', 'Unknown Patient')
         except Exception as e:
             print(f"Error fetching patient name: {e}")
 
-        # ==========================================
-        # 5. CALCULATE STATS (EXPECTED TASK LOGIC)
-        # ==========================================
-        IST = timezone(timedelta(hours=5, minutes=30))
-        today = datetime.now(IST).date()
-        total_completed = len(logs)
-        
-        # Extract dates safely
-        created_str = str(plan_item.get('created_date') or plan_item.get('created_at', today.isoformat()))[:10]
-        
-        follow_up_str = str(plan_item.get('follow_up_date', today.isoformat()))[:10]
-        
-        
-        # Safely extract tasks_per_day
-        try:
-            tasks_per_day = int(plan_item.get('daily_task_count', 4))
-        except (TypeError, ValueError):
-            tasks_per_day = 4
-        
-        consultation_date = datetime.strptime(created_str, "%Y-%m-%d").date()
-        follow_up_date = datetime.strptime(follow_up_str, "%Y-%m-%d").date()
-        
-        # Tracking starts the day AFTER the consultation
-        start_date = consultation_date + timedelta(days=1)
-        # Stop expecting new tasks if the follow-up date has passed
-        calc_end_date = min(today, follow_up_date)
-        
-        if today < start_date:
-            # Day 0: Plan was made today. No penalties yet.
-            days_elapsed = 0
-            expected_tasks = 0
-            adherence_percentage = 0 
-            status_text = "Starts Tomorrow"
-        else:
-            # Calculate exactly how many tasks they SHOULD have done by today
-            days_elapsed = (calc_end_date - start_date).days + 1
-            expected_tasks = days_elapsed * tasks_per_day
-            
-            # The actual percentage math
-            if expected_tasks > 0:
-                adherence_percentage = min(int((total_completed / expected_tasks) * 100), 100)
-            else:
-                adherence_percentage = 0
-                
-            if adherence_percentage >= 75:
-                status_text = "On Track"
-            elif adherence_percentage >= 50:
-                status_text = "Needs Attention"
-            else:
-                status_text = "Critical"
+        # 5. CALCULATE STATS (shared engine, so this always agrees with /all-stats)
+        today = clinic_today()
+        total_completed = int(summary.get('total_completed', 0))
+        scores = adherence_engine.score_one(total_completed, plan_item, today)
 
         # 6. FORMAT OUTPUTS FOR NEXT.JS
-        today_str = today.isoformat()
-        todays_logs = [log['task_id'] for log in logs if log.get('date_logged') == today_str]
-        last_active = logs[0].get('timestamp') if logs else None
-        
-        recent_logs_formatted = [
-            {
-                "id": log.get("log_id"),
-                "task_title": log.get("task_title", "Unknown Task"),
-                "logged_at": log.get("timestamp")
-            }
-            for log in logs[:10]
-        ]
+        todays_logs = adherence_summary.tasks_done_on(summary, today)
+        last_active = summary.get('last_active')
+        recent_logs_formatted = adherence_summary.newest_recent_logs(summary.get('recent_logs', []))
 
         return {
             "appointment_id": appointment_id,
             "patient_id": patient_id,
             "patient_name": patient_name,
             "total_completed": total_completed,
-            "expected_tasks": expected_tasks, 
-            "adherence_percentage": adherence_percentage,
-            "status": status_text,
+            "expected_tasks": scores["expected_tasks"],
+            "adherence_percentage": scores["adherence_percentage"],
+            "status": scores["status"],
             "last_active": last_active,
             "recent_logs": recent_logs_formatted,
             "todays_completed_tasks": todays_logs,
+            "daily_completed": adherence_summary.daily_counts(summary),
             "simplified_plan": plan_item.get('simplified_plan', '{}') # Ensure the doctor can see the checklist!
         }
     except Exception as e:
@@ -196,209 +133,70 @@ async def get_all_patients_summary(current_user: dict = Depends(require_role("Do
     try:
         doctor_id = current_user['sub'] 
         
-        # 1. Fetch all logs for this doctor
-        response = adherence_logs_table.query(
-            IndexName='doctor_id-index',
-            KeyConditionExpression=Key('doctor_id').eq(doctor_id)
-        )
-        all_logs = response.get('Items', [])
-        
-        if not all_logs:
-            return []
-
-        # 2. Group logs by appointment_id and collect unique patient_ids
+        # 1 & 2. One pre-aggregated summary per appointment instead of every raw log
         grouped_data = {}
         patient_ids_to_fetch = set()
 
-        for log in all_logs:
-            appt_id = log.get('appointment_id')
-            p_id = log.get('patient_id', 'Unknown')
-            
-            if appt_id not in grouped_data:
+        async for page in repo.iter_adherence_summaries_for_doctor(doctor_id):
+            for summary in page:
+                appt_id = summary['appointment_id']
+                p_id = summary.get('patient_id', 'Unknown')
                 patient_ids_to_fetch.add(p_id)
                 grouped_data[appt_id] = {
                     "appointment_id": appt_id,
                     "patient_id": p_id,
-                    "total_completed": 0,
-                    "last_active": log.get('timestamp')
+                    "total_completed": int(summary.get('total_completed', 0)),
+                    "last_active": summary.get('last_active')
                 }
-            
-            grouped_data[appt_id]["total_completed"] += 1
-            
-            # Update last active if this log is newer
-            if log.get('timestamp') > grouped_data[appt_id]["last_active"]:
-                grouped_data[appt_id]["last_active"] = log.get('timestamp')
+
+        if not grouped_data:
+            return []
 
         # 3. Fetch Patient Names in bulk 
         patient_name_map = {}
-        for p_id in patient_ids_to_fetch:
-            if p_id == "Unknown": continue
-            try:
-                p_item = patient_table.get_item(
-                    Key={'patient_id': p_id}, 
-                    ProjectionExpression='full_name'
-                ).get('Item', {})
-                patient_name_map[p_id] = p_item.get('full_name', 'Unknown Patient')
-            except Exception as e:
-                print(f"Error fetching name for {p_id}: {e}")
-
-        # ==========================================
-        # 4. APPLY PERFECTED MATH TO EACH PATIENT
-        # ==========================================
-        IST = timezone(timedelta(hours=5, minutes=30))
-        today = datetime.now(IST).date()
-        summaries = []
-        
-        for appt_id, data in grouped_data.items():
-            p_id = data["patient_id"]
-            total_completed = data["total_completed"]
-            
-            # Fetch the Care Plan to get the actual dates and task counts
-            plan_item = None
-            try:
-                plan_response = care_plans_table.query(
-                    KeyConditionExpression=Key('patient_id').eq(p_id)
-                )
-                all_plans = plan_response.get('Items', [])
-                plan_item = next((p for p in all_plans if p.get('appointment_id') == appt_id), None)
-                if not plan_item and all_plans:
-                    plan_item = all_plans[0]
-            except Exception as e:
-                print(f"Error fetching plan in all-stats for {appt_id}: {e}")
-
-            # Calculate Expected Tasks exactly like the detail view
-            expected_tasks = 4 # Absolute fallback
-            
-            if plan_item:
-                raw_created = plan_item.get('created_date') or plan_item.get('created_at') or today.isoformat()
-                created_str = str(raw_created)[:10]
-                
-                raw_follow_up = plan_item.get('follow_up_date')
-                if raw_follow_up:
-                    follow_up_str = str(raw_follow_up)[:10]
-                else:
-                    creation_date_obj = datetime.strptime(created_str, "%Y-%m-%d").date()
-                    follow_up_str = (creation_date_obj + timedelta(days=7)).isoformat()
-
-                try:
-                    tasks_per_day = int(plan_item.get('daily_task_count', 4))
-                except (TypeError, ValueError):
-                    tasks_per_day = 4
-
-                consultation_date = datetime.strptime(created_str, "%Y-%m-%d").date()
-                follow_up_date = datetime.strptime(follow_up_str, "%Y-%m-%d").date()
-
-                start_date = consultation_date
-                calc_end_date = min(today, follow_up_date)
-
-                days_elapsed = (calc_end_date - start_date).days + 1
-                if days_elapsed < 1:
-                    days_elapsed = 1
-
-                expected_tasks = days_elapsed * tasks_per_day
-
-            # The actual percentage math
-            if expected_tasks > 0:
-                percentage = min(int((total_completed / expected_tasks) * 100), 100)
-            else:
-                percentage = 0
-            
-            # Determine Status
-            if percentage >= 75: status = "On Track"
-            elif percentage >= 50: status = "Needs Attention"
-            else: status = "Critical"
-                
-            summaries.append({
-                "appointment_id": appt_id,
-                "patient_id": p_id,
-                "patient_name": patient_name_map.get(p_id, "Unknown Patient"),
-                "adherence_percentage": percentage,
-                "status": status,
-                "last_active": data["last_active"]
-            })
-            
-        # 5. Sort: Critical/Needs Attention (lowest percentage) first
-        summaries.sort(key=lambda x: x["adherence_percentage"])
+        patient_ids_to_fetch.discard("Unknown")
+        try:
+            profiles = await ProfileLoader(repo).patients(patient_ids_to_fetch, attributes=['full_name'])
+            for p_id in patient_ids_to_fetch:
+                patient_name_map[p_id] = profiles.get(p_id, {}).get('full_name', 'Unknown Patient')
+        except Exception as e:
+            print(f"Error fetching patient names: {e}")
 
-        return summaries
+        # 4. Fetch every care plan in batches, then score all appointments in one vectorized pass
+        appointment_ids = list(grouped_data)
+        plans = {}
+        try:
+            plans = await load_care_plans(
+                [(grouped_data[a]["patient_id"], a) for a in appointment_ids], attributes=PLAN_SCORING_ATTRIBUTES
+            )
+        except Exception as e:
+            print(f"Error fetching plans in all-stats: {e}")
 
-    except Exception as e:
-        print(f"Error in all-stats: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
-    try:
-        doctor_id = current_user['sub'] 
-        
-        # 1. Fetch all logs for this doctor
-        response = adherence_logs_table.query(
-            IndexName='doctor_id-index',
-            KeyConditionExpression=Key('doctor_id').eq(doctor_id)
+        scores = adherence_engine.score(
+            [grouped_data[a]["total_completed"] for a in appointment_ids],
+            [plans.get(a) for a in appointment_ids],
+            clinic_today()
         )
-        all_logs = response.get('Items', [])
-        
-        if not all_logs:
-            return []
-
-        # 2. Group logs by appointment_id and collect unique patient_ids
-        grouped_data = {}
-        patient_ids_to_fetch = set()
-
-        for log in all_logs:
-            appt_id = log.get('appointment_id')
-            p_id = log.get('patient_id', 'Unknown')
-            
-            if appt_id not in grouped_data:
-                patient_ids_to_fetch.add(p_id)
-                grouped_data[appt_id] = {
-                    "appointment_id": appt_id,
-                    "patient_id": p_id,
-                    "total_completed": 0,
-                    "last_active": log.get('timestamp')
-                }
-            
-            grouped_data[appt_id]["total_completed"] += 1
-            
-            # Update last active if this log is newer
-            if log.get('timestamp') > grouped_data[appt_id]["last_active"]:
-                grouped_data[appt_id]["last_active"] = log.get('timestamp')
-
-        # 3. Fetch Patient Names in bulk (or one-by-one per unique patient, not per log)
-        # Optimization: Create a map of {patient_id: patient_name}
-        patient_name_map = {}
-        for p_id in patient_ids_to_fetch:
-            if p_id == "Unknown": continue
-            # This only runs ONCE per patient, not per log record
-            p_item = patient_table.get_item(
-                Key={'patient_id': p_id}, 
-                ProjectionExpression='full_name'
-            ).get('Item', {})
-            patient_name_map[p_id] = p_item.get('full_name', 'Unknown User')
-
-        # 4. Calculate percentages and build the summary list
-        summaries = []
-        expected_tasks = 20 # Mocked
-        
-        for appt_id, data in grouped_data.items():
-            percentage = min(int((data["total_completed"] / expected_tasks) * 100), 100)
-            
-            # Determine Status
-            if percentage >= 75: status = "On Track"
-            elif percentage >= 50: status = "Needs Attention"
-            else: status = "Critical"
-                
-            summaries.append({
+        summaries = [
+            {
                 "appointment_id": appt_id,
-                "patient_id": data["patient_id"],
-                "patient_name": patient_name_map.get(data["patient_id"], "Unknown"),
-                "adherence_percentage": percentage,
-                "status": status,
-                "last_active": data["last_active"]
-            })
+                "patient_id": grouped_data[appt_id]["patient_id"],
+                "patient_name": patient_name_map.get(grouped_data[appt_id]["patient_id"], "Unknown Patient"),
+                "adherence_percentage": int(percentage),
+                "status": str(status),
+                "last_active": grouped_data[appt_id]["last_active"]
+            }
+            for appt_id, percentage, status in zip(appointment_ids, scores["adherence_percentage"], scores["status"])
+        ]
             
         # 5. Sort: Critical/Needs Attention (lowest percentage) first
         summaries.sort(key=lambda x: x["adherence_percentage"])
 
+        # 6. Keep the dashboard's critical-alerts counter in step with what the doctor just saw
+        await doctor_stats.record_critical_alerts(repo, doctor_id, sum(1 for s in summaries if s["status"] == "Critical"))
+
         return summaries
 
     except Exception as e:
         print(f"Error in all-stats: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -1,10 +1,11 @@
-import os
-import boto3
 from fastapi import APIRouter, HTTPException, Depends, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel 
 from app.models import UserLogin, UserSignUp, UserConfirm, AppointmentStatus, ChangePasswordRequest
 from app.services.auth import  sign_up_user, login_user, confirm_sign_up, update_password_via_admin, verify_cognito_token, trigger_cognito_resend
+from app.repository import get_repository
+from app.services.queue_events import queue_broadcaster
+from app.services import doctor_stats
 from dotenv import load_dotenv
 security_scheme = HTTPBearer()
 load_dotenv()
@@ -13,21 +14,20 @@ load_dotenv()
 auth_router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 appointment_router = APIRouter(prefix="/api/appointments", tags=["Appointments"])
 
-dynamodb = boto3.resource('dynamodb', region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
-appointments_table = dynamodb.Table('DrDecideAppointments')
+repo = get_repository()
 
 # --- AUTH ROUTES ---
 
 @auth_router.post("/signup")
 async def signup(user: UserSignUp):
-    response = sign_up_user(user.email, user.password, user.role)
+    response = await sign_up_user(user.email, user.password, user.role)
     if "error" in response:
         raise HTTPException(status_code=400, detail=response["error"])
     return {"message": "User created successfully. Please check email to verify."}
 
 @auth_router.post("/login")
 async def login(user: UserLogin):
-    response = login_user(user.email, user.password)
+    response = await login_user(user.email, user.password)
     if "error" in response:
         raise HTTPException(status_code=401, detail=response["error"])
     
@@ -39,7 +39,7 @@ async def login(user: UserLogin):
 
 @auth_router.post("/confirm")
 async def confirm_signup(user_data: UserConfirm):
-    confirm_sign_up(user_data.email, user_data.code)
+    await confirm_sign_up(user_data.email, user_data.code)
     return {"message": "Email verified successfully! You can now log in."}
 
 
@@ -55,12 +55,17 @@ async def update_appointment_status(appointment_id: str, request: UpdateStatusRe
     Updates the status of an appointment (e.g. Scheduled -> In-Consultation)
     """
     try:
-        appointments_table.update_item(
-            Key={'appointment_id': appointment_id},
-            UpdateExpression="SET #s = :status",
-            ExpressionAttributeNames={'#s': 'status'},
-            ExpressionAttributeValues={':status': request.status.value} 
-        )
+        previous = await repo.update_appointment_status(appointment_id, request.status.value)
+        await doctor_stats.record_status_change(repo, previous, request.status.value)
+
+        # Let the live queue board move this patient (only if they're on a board)
+        clinic_id = queue_broadcaster.clinic_for(appointment_id)
+        if clinic_id:
+            queue_broadcaster.publish(clinic_id, {
+                "type": "status",
+                "appointment_id": appointment_id,
+                "status": request.status.value
+            })
         return {"message": f"Appointment marked as {request.status.value}"}
     
     # 3. FIXED THE DANGLING EXCEPTION BLOCK
@@ -70,7 +75,7 @@ async def update_appointment_status(appointment_id: str, request: UpdateStatusRe
 
 
 @auth_router.post("/change-password")
-def change_password(
+async def change_password(
     request: ChangePasswordRequest,
     claims: dict = Depends(verify_cognito_token)
 ):
@@ -90,7 +95,7 @@ def change_password(
 
     # 3. Call the admin-level update function
     # Note: No need for a try/except here if the helper already raises HTTPException
-    return update_password_via_admin(
+    return await update_password_via_admin(
         username=username,
         old_password=request.old_password,
         new_password=request.new_password
@@ -112,7 +117,7 @@ async def resend_code(data: ResendCodeRequest):
     """
     print(f"Attempting to resend code for: {data.email}") # Debugging line
     
-    delivery_details = trigger_cognito_resend(data.email)
+    delivery_details = await trigger_cognito_resend(data.email)
     destination = delivery_details.get('Destination', 'your email')
     
     return {
@@ -1,52 +1,34 @@
-import uuid
-from boto3.dynamodb.conditions import Attr 
-from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile
-from typing import Optional
-from google.genai import types, Client 
-from google.genai.types import GenerateContentConfig
-from app.models import ConsultationDetails, CarePlanResponse,DoctorProfileSetup,CapacityUpdateRequest
-from app.services.auth import require_role
-import boto3
-import os
-import json
-from datetime import datetime
-
-from fastapi import APIRouter, Depends, File, UploadFile, Form
-from typing import Optional
-
-# Import your service function here if it's in a different file
-# from services import generate_and_save_care_plan 
-
-
+import asyncio
 import json
-from datetime import date, datetime
-import uuid
-import os
-from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional
-# Make sure to import types from the new genai SDK
-from google.genai import types, Client 
-
+from app.models import CarePlanResponse, DoctorProfileSetup, CapacityUpdateRequest
+from app.services.auth import require_role
+from app.repository import DEFAULT_PAGE_SIZE, InvalidPageToken, ProfileLoader, get_repository
+from app.services.aws import get_client
+from app.services.utils import appointment_date_window
+from app.services import attachments, consultation, doctor_stats
+from app.services.attachments import AttachmentTooLarge
+from app.services.consultation_jobs import JobQueueFull, consultation_pipeline
+from app.services.plan_stream import PlanStreamParser, remaining_events
+from app.services.queue_events import format_sse
+
+# Comment frame sent when an event stream has been idle for a while, so proxies don't drop it
+HEARTBEAT_SECONDS = 15
 
 router = APIRouter(prefix="/api/doctor", tags=["Doctor"])
 
+# Streaming consultations still generating or saving (a reference keeps their tasks alive)
+_streaming_consultations = set()
 
-# Initialize AWS Services
-dynamodb = boto3.resource('dynamodb', region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
-care_plans_table = dynamodb.Table('DrDecideCarePlans')
-appointments_table = dynamodb.Table('DrDecideAppointments')
-notifications_table = dynamodb.Table('DrDecideNotifications')
-doctors_table = dynamodb.Table('DrDecideDoctors')
-patients_table = dynamodb.Table('DrDecidePatients')
 
-# Initialize Bedrock (AI) and SNS (Text Messages) Clients
-bedrock_client = boto3.client('bedrock-runtime', region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
-sns_client = boto3.client(
-    "sns",
-    region_name=os.getenv("AWS_REGION", "us-east-1"),
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-)
+# Async data-access layer (DynamoDB, or the in-memory stand-in offline)
+repo = get_repository()
+
+# Bedrock (AI) and SNS (Text Messages) Clients
+bedrock_client = get_client('bedrock-runtime')
+sns_client = get_client('sns')
 
 @router.post("/setup-profile")
 async def setup_doctor_profile(
@@ -70,7 +52,7 @@ async def setup_doctor_profile(
     }
 
     try:
-        doctors_table.put_item(Item=record)
+        await repo.put_doctor(record)
         return {"message": "Doctor profile completed!", "profile": record}
     except Exception as e:
         print(f"Doctor Profile Setup Error: {e}")
@@ -78,40 +60,38 @@ async def setup_doctor_profile(
 
 @router.get("/my-appointments")
 async def get_doctor_appointments(
+    view: str = "all",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
     current_user: dict = Depends(require_role("Doctor"))
 ):
     """
-    Retrieves all appointments assigned to the logged-in doctor,
+    Retrieves the appointments assigned to the logged-in doctor,
     enriched with the patient's full name.
+    Narrow it with view=today|upcoming|all or an explicit start_date/end_date (YYYY-MM-DD, IST).
     """
     doctor_id = current_user.get('sub')
     doctor_email = current_user.get('email') or current_user.get('cognito:username') or current_user.get('username')
     
-    print(f"--- Fetching Schedule for Doctor ID: {doctor_id} ---")
-    
     try:
-        # 1. Fetch all appointments for this doctor
-        response = appointments_table.scan(
-            FilterExpression=Attr('doctor_email').eq(doctor_email) | Attr('doctor_email').eq(doctor_id)
-        )
-        
-        appointments = response.get('Items', [])
-        appointments.sort(key=lambda x: x.get('appointment_date', ''))
+        window_start, window_end = appointment_date_window(view, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # 1. Key-bounded query on the doctor's date index (already sorted by appointment_date)
+        appointments = await repo.query_appointments_for_doctor(doctor_id, window_start, window_end)
         
-        # 2. ENRICHMENT LOOP: Attach the patient_name to each appointment
-        for appt in appointments:
-            patient_id = appt.get('patient_id')
-            
-            if patient_id and not appt.get('patient_name'):
-                try:
-                    patient_response = patients_table.get_item(Key={'patient_id': patient_id})
-                    patient_data = patient_response.get('Item', {})
-                    
-                    appt['patient_name'] = patient_data.get('full_name', 'Unknown Patient')
-                    
-                except Exception as inner_e:
-                    print(f"Error fetching patient name for {patient_id}: {inner_e}")
-                    appt['patient_name'] = 'Unknown Patient'
+        # 2. ENRICHMENT: Attach the patient_name to each appointment (one batched lookup for all of them)
+        needs_name = [appt for appt in appointments if appt.get('patient_id') and not appt.get('patient_name')]
+        patients = {}
+        try:
+            patients = await ProfileLoader(repo).patients((a['patient_id'] for a in needs_name), attributes=['full_name'])
+        except Exception as inner_e:
+            print(f"Error fetching patient names: {inner_e}")
+
+        for appt in needs_name:
+            appt['patient_name'] = patients.get(appt['patient_id'], {}).get('full_name', 'Unknown Patient')
 
         # 3. Return the fully enriched data
         return {
@@ -248,179 +228,355 @@ async def submit_consultation(
     
     print(f"Consultation processed by Doctor ID: {doctor_id}")
 
-    # 1. Prepare the base text prompt
-    prompt = f"""
-    You are an expert medical AI assistant. Analyze these doctor's notes and the attached medical records (if any).
-    Translate them into simple, patient-friendly language.
-    
-    You MUST output your response STRICTLY as a JSON object with two exact keys: "care_plan" and "summarization". 
-    Do not include markdown like ```json.
-    
-    Format requirements:
-    1. "care_plan": A dictionary with keys "Morning", "Afternoon", "Evening", and "Night". Each value should be a short, 1-sentence instruction.
-    2. "summarization": A list of 3 short bullet points summarizing the visit, diagnosis, and next steps in plain English.
-    
-    Doctor's Notes:
-    Manual Medical History: {medical_history_text}
-    Diagnosis & Examination: {current_examination}
-    Prescribed Medicines: {medicines_prescribed}
-    """
-
-    # 2. Build the Multi-Modal Payload for Gemini
-    gemini_contents = [prompt]
-    
-    if file:
-        file_bytes = await file.read()
-        print(f"File attached: {file.filename} ({file.content_type})")
-        gemini_contents.append(
-            types.Part.from_bytes(
-                data=file_bytes,
-                mime_type=file.content_type
-            )
-        )
+    # 1. Copy the upload out in chunks (size-limited, hashed on the way)
+    try:
+        attachment = await attachments.ingest(file)
+    except AttachmentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    # 3. Call Google Gemini
+    # 2. Ask Gemini for the plan (falls back to a default plan on any failure)
     try:
         print("Sending clinical notes & files to Google Gemini...")
-        client = Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=gemini_contents,
-            # Force JSON output schema if you want to be extra safe, but this works well:
-            config={"response_mime_type": "application/json"} 
+        ai_simplified_plan, daily_task_count = await consultation.generate_care_plan(
+            current_examination, medicines_prescribed, medical_history_text, attachment
         )
-
-        ai_simplified_plan = response.text
-        
-        # NEW: Parse the JSON string to count the exact number of daily tasks!
-        parsed_plan = json.loads(ai_simplified_plan)
-        daily_task_count = len(parsed_plan.get("care_plan", {}).keys()) # Usually 4
-        
         print("✅ Gemini Care Plan Generated Successfully!")
-
     except Exception as e:
         print(f"Gemini Error: {e}")
-        daily_task_count = 4 # Fallback
-        ai_simplified_plan = json.dumps({
-            "care_plan": {
-                "Morning": "Take prescribed medication after breakfast.",
-                "Afternoon": "Rest and stay hydrated.",
-                "Evening": "Monitor temperature and log symptoms.",
-                "Night": "Get a full 8 hours of sleep."
-            },
-            "summarization": [
-                "Patient evaluated for reported symptoms.",
-                "Standard recovery protocol initiated.",
-                "Follow up if symptoms worsen after 48 hours."
-            ]
-        })
+        ai_simplified_plan, daily_task_count = consultation.fallback_care_plan()
+    finally:
+        if attachment:
+            attachment.close()
 
-    # 4. Save the final Care Plan record to DynamoDB
-    record = {
-        'patient_id': patient_id,
-        'appointment_id': appointment_id, 
-        'doctor_id': doctor_id,       
-        'doctor_email': doctor_email, 
-        'raw_medical_history': medical_history_text,
-        'file_attached': file.filename if file else "None", 
-        'raw_examination': current_examination,
-        'medicines_prescribed': medicines_prescribed,
-        'simplified_plan': ai_simplified_plan,
-        
-        # NEW: The 3 fields required for the Adherence Tracking Math!
-        'created_at': date.today().isoformat(),
-        'follow_up_date': follow_up_date, # Expected format: "2026-03-21"
-        'daily_task_count': daily_task_count,
-        
-        'follow_up_reminder': follow_up_details,
-        'status': 'Active' # Set to active so it shows up on the dashboard
-    }
+    # 3. Save the final Care Plan record to DynamoDB
+    record = consultation.build_care_plan_record(
+        doctor_id=doctor_id,
+        doctor_email=doctor_email,
+        patient_id=patient_id,
+        appointment_id=appointment_id,
+        current_examination=current_examination,
+        medicines_prescribed=medicines_prescribed,
+        follow_up_date=follow_up_date,
+        follow_up_details=follow_up_details,
+        medical_history_text=medical_history_text,
+        attachment=attachment,
+        simplified_plan=ai_simplified_plan,
+        daily_task_count=daily_task_count
+    )
 
     try:
-        care_plans_table.put_item(Item=record)
+        await consultation.save_care_plan(repo, record)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save care plan to database: {str(e)}")
 
-    # 5. CREATE IN-APP NOTIFICATION
-    notification_id = f"NOTIF-{uuid.uuid4().hex[:6].upper()}"
+    # 4. CREATE IN-APP NOTIFICATION
     try:
-        notifications_table.put_item(Item={
-            'notification_id': notification_id,
-            'patient_id': patient_id,
-            'message': f"Care plan updated by Dr. {doctor_email.split('@')[0]}. New daily tasks added.",
-            'timestamp': datetime.utcnow().isoformat(),
-            'status': 'Unread'
-        })
+        await consultation.create_notification(repo, patient_id, doctor_email)
     except Exception as e:
         print(f"Notification Save Error: {e}")
 
-    # 6. FIRE AMAZON SNS TEXT MESSAGE
-    if phone_number:
+    # 5. FIRE AMAZON SNS TEXT MESSAGE
+    await consultation.send_sms(phone_number)
+
+    # 6. Return the response
+    return CarePlanResponse(**consultation.care_plan_response(record, "Success - Saved to DB, AI Generated, & SMS Sent!"))
+
+
+@router.post("/consultation/stream")
+async def stream_consultation(
+    patient_id: str = Form(...),
+    appointment_id: str = Form(...),
+    current_examination: str = Form(...),
+    medicines_prescribed: str = Form(...),
+    follow_up_date: str = Form(...), # EXPECTING YYYY-MM-DD for the math to work!
+    follow_up_details: str = Form(...),
+    phone_number: Optional[str] = Form(""),
+    medical_history_text: Optional[str] = Form(""),
+    file: Optional[UploadFile] = File(None),
+    current_user: dict = Depends(require_role("Doctor"))
+):
+    """
+    Same form and outcome as /consultation, streamed as Server-Sent Events so
+    the doctor reads the plan while Gemini is still writing it:
+      "status"  {"stage": "generating" | "fallback" | "saving" | "notifying"}
+      "section" {"name": "Morning", "text": ...} as soon as each part parses
+      "summary" {"index": 0, "text": ...} per summary bullet
+      "done"    the saved plan (the /consultation response plus ai_generated)
+      "error"   {"detail": ...} when the plan could not be saved
+    On "fallback" the AI output failed; drop the sections shown so far, the
+    default plan's sections follow. The plan is saved and sent to the
+    patient even if the browser disconnects mid-stream.
+    """
+    doctor_id = current_user.get('sub')
+    doctor_email = current_user.get('email') or current_user.get('cognito:username') or current_user.get('username')
+
+    # 1. The upload is gone once this handler returns, so copy it out now (size-limited, hashed)
+    try:
+        attachment = await attachments.ingest(file)
+    except AttachmentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data: dict):
+        events.put_nowait((event, data))
+
+    async def run():
+        # 2. Generate, forwarding each section the moment it parses
+        parser = PlanStreamParser()
+
+        def on_text(chunk: str):
+            for event, data in parser.feed(chunk):
+                emit(event, data)
+
+        emit("status", {"stage": "generating"})
+        ai_generated = True
         try:
-            sms_message = "Hi! Dr. Decide has finished your consultation. Check the app to view your simplified care instructions."
-            sns_client.publish(
-                PhoneNumber=phone_number,
-                Message=sms_message
+            ai_simplified_plan, daily_task_count = await consultation.generate_care_plan(
+                current_examination, medicines_prescribed, medical_history_text,
+                attachment, on_text=on_text
             )
-            print(f"SMS successfully sent to {phone_number}")
         except Exception as e:
-            print(f"Amazon SNS Error: {e}")
+            print(f"Gemini Error: {e}")
+            ai_generated = False
+            ai_simplified_plan, daily_task_count = consultation.fallback_care_plan()
+            emit("status", {"stage": "fallback"})
+            parser = PlanStreamParser()
+        finally:
+            if attachment:
+                attachment.close()
+        # Whatever the stream didn't show (cached answer, fallback plan)
+        for event, data in remaining_events(parser, json.loads(ai_simplified_plan)):
+            emit(event, data)
+
+        # 3. Save the final, validated plan
+        emit("status", {"stage": "saving"})
+        record = consultation.build_care_plan_record(
+            doctor_id=doctor_id,
+            doctor_email=doctor_email,
+            patient_id=patient_id,
+            appointment_id=appointment_id,
+            current_examination=current_examination,
+            medicines_prescribed=medicines_prescribed,
+            follow_up_date=follow_up_date,
+            follow_up_details=follow_up_details,
+            medical_history_text=medical_history_text,
+            attachment=attachment,
+            simplified_plan=ai_simplified_plan,
+            daily_task_count=daily_task_count
+        )
+        try:
+            await consultation.save_care_plan(repo, record)
+        except Exception as e:
+            emit("error", {"detail": f"Failed to save care plan to database: {str(e)}"})
+            return
 
-    # 7. Return the response
-    return CarePlanResponse(
-        doctor_id=doctor_id,
-        patient_id=patient_id,
-        appointment_id=appointment_id,
-        simplified_plan=ai_simplified_plan,
-        follow_up_reminder=follow_up_details,
-        status="Success - Saved to DB, AI Generated, & SMS Sent!",
-        created_at=date.today().isoformat(),
-        follow_up_date=follow_up_date, 
-        daily_task_count=daily_task_count
+        # 4. Tell the patient
+        emit("status", {"stage": "notifying"})
+        try:
+            await consultation.create_notification(repo, patient_id, doctor_email)
+        except Exception as e:
+            print(f"Notification Save Error: {e}")
+        await consultation.send_sms(phone_number)
+
+        emit("done", {
+            **consultation.care_plan_response(record, "Success - Saved to DB, AI Generated, & SMS Sent!"),
+            "ai_generated": ai_generated
+        })
+
+    async def run_and_close():
+        try:
+            await run()
+        except Exception as e:
+            print(f"Streaming Consultation Error: {e}")
+            emit("error", {"detail": "Consultation failed."})
+        finally:
+            events.put_nowait(None)
+
+    # Runs on its own task so a closed tab doesn't cancel the save
+    task = asyncio.create_task(run_and_close())
+    _streaming_consultations.add(task)
+    task.add_done_callback(_streaming_consultations.discard)
+
+    async def stream():
+        while True:
+            try:
+                item = await asyncio.wait_for(events.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                return
+            yield format_sse(*item)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
+@router.post("/consultation/jobs", status_code=202)
+async def submit_consultation_job(
+    patient_id: str = Form(...),
+    appointment_id: str = Form(...),
+    current_examination: str = Form(...),
+    medicines_prescribed: str = Form(...),
+    follow_up_date: str = Form(...), # EXPECTING YYYY-MM-DD for the math to work!
+    follow_up_details: str = Form(...),
+    phone_number: Optional[str] = Form(""),
+    medical_history_text: Optional[str] = Form(""),
+    file: Optional[UploadFile] = File(None),
+    current_user: dict = Depends(require_role("Doctor"))
+):
+    """
+    Same form as /consultation, but answers 202 with a job id right away:
+    the plan is generated, saved and sent to the patient in the background,
+    so the doctor can move on to the next patient.
+    Poll /consultation/jobs/{job_id} or listen on /consultation/jobs/events.
+    """
+    doctor_id = current_user.get('sub')
+    doctor_email = current_user.get('email') or current_user.get('cognito:username') or current_user.get('username')
+
+    # 1. The upload is gone once this request ends, so copy it out (size-limited, hashed) for the job
+    try:
+        attachment = await attachments.ingest(file)
+    except AttachmentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    # 2. Store and queue the job
+    try:
+        job = await consultation_pipeline.submit(
+            doctor_id,
+            {
+                'doctor_email': doctor_email,
+                'patient_id': patient_id,
+                'appointment_id': appointment_id,
+                'current_examination': current_examination,
+                'medicines_prescribed': medicines_prescribed,
+                'follow_up_date': follow_up_date,
+                'follow_up_details': follow_up_details,
+                'phone_number': phone_number,
+                'medical_history_text': medical_history_text
+            },
+            attachment=attachment
+        )
+    except JobQueueFull as e:
+        if attachment:
+            attachment.close()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except RuntimeError as e:
+        if attachment:
+            attachment.close()
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {**job, "status_url": f"/api/doctor/consultation/jobs/{job['job_id']}"}
+
+
+@router.get("/consultation/jobs")
+async def list_consultation_jobs(
+    limit: int = 20,
+    current_user: dict = Depends(require_role("Doctor"))
+):
+    """The doctor's most recent consultation jobs, newest first."""
+    try:
+        jobs = await consultation_pipeline.list_for_doctor(current_user.get('sub'), max(1, min(limit, 100)))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"jobs": jobs}
+
+
+@router.get("/consultation/jobs/events")
+async def stream_consultation_jobs(
+    request: Request,
+    current_user: dict = Depends(require_role("Doctor"))
+):
+    """
+    Live job progress for the doctor (Server-Sent Events).
+    Sends the recent jobs once ("snapshot"), then a "job" event every time one
+    of them moves to another stage. Clients upsert by job_id.
+    """
+    doctor_id = current_user.get('sub')
+
+    async def events():
+        # Subscribe before reading the snapshot so nothing falls in between
+        queue = consultation_pipeline.events.subscribe(doctor_id)
+        try:
+            send_snapshot = True
+            while True:
+                if send_snapshot:
+                    yield format_sse("snapshot", {"jobs": await consultation_pipeline.list_for_doctor(doctor_id)})
+                    send_snapshot = False
+
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event is None:
+                    return  # Server shutting down
+                if event is consultation_pipeline.events.RESYNC:
+                    send_snapshot = True
+                    continue
+                yield format_sse(event["type"], event)
+        finally:
+            consultation_pipeline.events.unsubscribe(doctor_id, queue)
+
+    if not consultation_pipeline.running:
+        raise HTTPException(status_code=503, detail="Consultation pipeline is not running.")
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/consultation/jobs/{job_id}")
+async def get_consultation_job(
+    job_id: str,
+    current_user: dict = Depends(require_role("Doctor"))
+):
+    """
+    Progress of one consultation job: queued -> generating -> saving ->
+    notifying -> done (or failed). Once done, `result` holds the same fields
+    /consultation returns.
+    """
+    try:
+        job = await consultation_pipeline.get(job_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    # Another doctor's job looks exactly like a missing one
+    if not job or job.pop('doctor_id') != current_user.get('sub'):
+        raise HTTPException(status_code=404, detail="Consultation job not found.")
+    return job
+
+
 @router.get("/dashboard-stats")
 async def get_dashboard_stats(
     current_user: dict = Depends(require_role("Doctor"))
 ):
     """
     Aggregates all data needed for the Doctor Dashboard UI in a single API call.
+    Counters come from the doctor's pre-aggregated stats items (kept up to date
+    on every booking, status change and consultation), not from table scans.
     """
     doctor_id = current_user.get('sub')
-    doctor_email = current_user.get('email') or current_user.get('cognito:username') or current_user.get('username')
     
-    today_str = datetime.utcnow().strftime("%Y-%m-%d")
-
     try:
-        # 1. Fetch all appointments for this doctor
-        appts_response = appointments_table.scan(
-            FilterExpression=Attr('doctor_email').eq(doctor_email) | Attr('doctor_id').eq(doctor_id)
-        )
-        all_appts = appts_response.get('Items', [])
-        
-        # 2. Fetch all care plans generated by this doctor
-        plans_response = care_plans_table.scan(
-            FilterExpression=Attr('doctor_email').eq(doctor_email) | Attr('doctor_id').eq(doctor_id)
+        # 1. Stats items, today's slice of the date index and the doctor's limit, all at once
+        today_start, today_end = appointment_date_window("today")
+        (totals, today_stats), todays_appts, profile = await asyncio.gather(
+            doctor_stats.load_dashboard_stats(repo, doctor_id),
+            repo.query_appointments_for_doctor(doctor_id, today_start, today_end),
+            repo.get_doctor(doctor_id)
         )
-        all_plans = plans_response.get('Items', [])
+        daily_limit = int((profile or {}).get('daily_limit') or doctor_stats.DEFAULT_DAILY_LIMIT)
 
         # --- CALCULATE METRICS ---
-        
-        # Filter for today's appointments
-        todays_appts = [a for a in all_appts if a.get('appointment_date', '').startswith(today_str)]
-        
-        # Get unique patients seen by this doctor
-        unique_patients = set(a.get('patient_id') for a in all_appts)
-        
-        # Mocking hourly capacity for the hackathon UI
-        hourly_capacity = [
-            {"time": "09:00 AM", "booked": 2, "limit": 3},
-            {"time": "10:30 AM", "booked": 3, "limit": 3},
-            {"time": "12:00 PM", "booked": 1, "limit": 2},
-            {"time": "03:15 PM", "booked": 0, "limit": 1}
-        ]
+        hourly_capacity = doctor_stats.hourly_capacity(today_stats, daily_limit)
 
         # Format today's list for the UI
         formatted_todays_list = []
@@ -433,11 +589,12 @@ async def get_dashboard_stats(
 
         return {
             "metrics": {
-                "total_patients": len(unique_patients),
-                "today_appointments_booked": len(todays_appts),
-                "today_appointments_limit": 20, # Hardcoded daily capacity
-                "care_plans_generated": len(all_plans),
-                "critical_alerts": 2 # Mocked for the UI
+                "total_patients": int(totals.get('total_patients', 0)),
+                "total_appointments": int(totals.get('total_appointments', 0)),
+                "today_appointments_booked": int(today_stats.get('booked', 0)),
+                "today_appointments_limit": daily_limit,
+                "care_plans_generated": int(totals.get('care_plans_generated', 0)),
+                "critical_alerts": int(totals.get('critical_alerts', 0))
             },
             "todays_appointments": formatted_todays_list,
             "hourly_capacity": hourly_capacity
@@ -450,25 +607,28 @@ async def get_dashboard_stats(
 
 @router.get("/my-patients")
 async def get_my_patients_and_plans(
+    limit: int = DEFAULT_PAGE_SIZE,
+    next_token: Optional[str] = None,
     current_user: dict = Depends(require_role("Doctor"))
 ):
     """
     NEW FEATURE: Returns a list of all patients under this doctor's care, 
     along with their most recent AI Care Plan AND their real profile data (Name, Phone).
+    Paginated by patient: each patient appears once, on one page, with the newest
+    plan this doctor wrote for them. total_patients counts all of them, not just the page.
     """
     doctor_id = current_user.get('sub')
-    doctor_email = current_user.get('email') or current_user.get('cognito:username') or current_user.get('username')
     
     try:
-        # 1. Scan the care plans table for this doctor's patients
-        response = care_plans_table.scan(
-            FilterExpression=Attr('doctor_email').eq(doctor_email) | Attr('doctor_id').eq(doctor_id)
+        # 1. Read one page of this doctor's patients (one latest plan each) and the overall count
+        page, total_patients = await asyncio.gather(
+            repo.page_latest_care_plans_for_doctor(doctor_id, limit=limit, next_token=next_token),
+            repo.count_patients_for_doctor(doctor_id)
         )
-        all_care_plans = response.get('Items', [])
         
-        # 2. Group by patient to only get their LATEST plan
+        # 2. Shape each patient's latest plan for the frontend
         patients_dict = {}
-        for plan in all_care_plans:
+        for plan in page.items:
             pid = plan.get('patient_id')
             patients_dict[pid] = {
                 "patient_id": pid,
@@ -478,29 +638,38 @@ async def get_my_patients_and_plans(
                 "status": plan.get('status')
             }
             
-        # 3. GO FETCH THE REAL NAMES FROM THE PATIENTS TABLE!
+        # 3. GO FETCH THE REAL NAMES FROM THE PATIENTS TABLE! (batched, not one read per patient)
+        try:
+            profiles = await ProfileLoader(repo).patients(
+                patients_dict.keys(), attributes=['full_name', 'phone_number', 'blood_group']
+            )
+        except Exception as lookup_err:
+            print(f"Error looking up patients: {lookup_err}")
+            profiles = None
+
         for pid in patients_dict:
-            try:
-                patient_profile = patients_table.get_item(Key={'patient_id': pid})
-                if 'Item' in patient_profile:
-                    # Inject the real name and phone number into the dictionary
-                    patients_dict[pid]['patient_name'] = patient_profile['Item'].get('full_name', 'Unknown')
-                    patients_dict[pid]['phone_number'] = patient_profile['Item'].get('phone_number', 'N/A')
-                    patients_dict[pid]['blood_group'] = patient_profile['Item'].get('blood_group', 'Unknown')
-                else:
-                    patients_dict[pid]['patient_name'] = 'Unknown (Profile not setup)'
-            except Exception as lookup_err:
-                print(f"Error looking up patient {pid}: {lookup_err}")
+            if profiles is None:
                 patients_dict[pid]['patient_name'] = 'Error fetching name'
+            elif pid in profiles:
+                # Inject the real name and phone number into the dictionary
+                patient_profile = profiles[pid]
+                patients_dict[pid]['patient_name'] = patient_profile.get('full_name', 'Unknown')
+                patients_dict[pid]['phone_number'] = patient_profile.get('phone_number', 'N/A')
+                patients_dict[pid]['blood_group'] = patient_profile.get('blood_group', 'Unknown')
+            else:
+                patients_dict[pid]['patient_name'] = 'Unknown (Profile not setup)'
 
         # 4. Convert dictionary back to a list for the frontend
         patient_list = list(patients_dict.values())
         
         return {
-            "total_patients": len(patient_list),
-            "patients": patient_list
+            "total_patients": total_patients,
+            "patients": patient_list,
+            "next_token": page.next_token
         }
 
+    except InvalidPageToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Patient Directory Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve patient list.")
@@ -515,10 +684,10 @@ async def get_doctor_profile(
     doctor_id = current_user.get('sub')
     
     try:
-        response = doctors_table.get_item(Key={'doctor_id': doctor_id})
+        profile = await repo.get_doctor(doctor_id)
         
-        if 'Item' in response:
-            return response['Item']
+        if profile:
+            return profile
         else:
             # If no item is found, the profile isn't set up yet!
             return {
@@ -530,7 +699,7 @@ async def get_doctor_profile(
         print(f"Doctor Profile Fetch Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch doctor profile.")
     
-router.patch("/capacity")
+@router.patch("/capacity")
 async def update_capacity(
     req: CapacityUpdateRequest,
     current_user: dict = Depends(require_role("Doctor"))
@@ -542,11 +711,7 @@ async def update_capacity(
 
     try:
         # Save the limit directly to the doctor's profile in the Doctors table
-        doctors_table.update_item(
-            Key={'doctor_id': doctor_id},
-            UpdateExpression="SET daily_limit = :limit",
-            ExpressionAttributeValues={':limit': req.daily_limit}
-        )
+        await repo.update_doctor_daily_limit(doctor_id, req.daily_limit)
         return {"message": f"Daily capacity updated to {req.daily_limit} patients"}
     except Exception as e:
         print(f"Failed to update capacity: {e}")
@@ -1,18 +1,24 @@
-from app.services.auth import require_role
-from fastapi import APIRouter, HTTPException,Depends
-from app.models import DoctorProfileSetup, QueueToken, ReceptionnistProfileSetup
-import boto3
-import os
-import random
+import asyncio
+from app.services.auth import optional_cognito_claims, require_role
+from fastapi import APIRouter, HTTPException,Depends, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.models import AppointmentLookupRequest, DoctorProfileSetup, QueueToken, ReceptionnistProfileSetup
+from app.repository import DEFAULT_PAGE_SIZE, InvalidPageToken, ProfileLoader, get_repository
+from app.services.utils import clinic_today
+from app.services.queue_events import format_sse, queue_broadcaster
+from app.services.patient_search import patient_index, rank_scanned
+
+# Most appointment ids one lookup call may resolve (one BatchGetItem)
+MAX_LOOKUP_IDS = 100
+
+# Comment frame sent when the board is idle, so proxies don't drop the connection
+HEARTBEAT_SECONDS = 15
 
 router = APIRouter(prefix="/api/hospital", tags=["Hospital & Queue"])
 
-# Initialize DynamoDB
-dynamodb = boto3.resource('dynamodb', region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
-queue_table = dynamodb.Table('DrDecideQueue')
-patients_table = dynamodb.Table('DrDecidePatients')
-appointment_table = dynamodb.Table('DrDecideAppointments')
-receptionist_table = dynamodb.Table('DrDecideReceptionists')  # Assuming doctors and receptionists are in the same table for simplicity
+# Async data-access layer (DynamoDB, or the in-memory stand-in offline)
+repo = get_repository()
 
 
 @router.get("/setup-profile")
@@ -32,53 +38,100 @@ async def setup_receptionist_profile(profile_data: ReceptionnistProfileSetup,
             "state": profile_data.state,
             "pincode": profile_data.pincode
         }
-        receptionist_table.put_item(Item=receptionist_data)
+        await repo.put_receptionist(receptionist_data)
         return {"message": "Profile setup successful!", "receptionist_id": receptionist_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save receptionist profile: {str(e)}")   
 @router.get("/search-patient")
-async def search_patient(full_name: str):
+async def search_patient(full_name: str, limit: int = 10):
     """
-    Search patient directory by full_name and return patient_id + appointment_id.
+    Search-as-you-type over the patient directory: case-insensitive prefix and
+    fuzzy (trigram) matching on full_name, best matches first. Each match is the
+    full patient item plus its match score, whichever path served it.
     """
+    limit = max(1, min(limit, 50))
     try:
-        response = patients_table.scan(
-            FilterExpression="contains(#fn, :full_name)",
-            ExpressionAttributeNames={"#fn": "full_name"},
-            ExpressionAttributeValues={":full_name": full_name}
-        )
-        return {"patients": response.get("Items", [])}
+        if not patient_index.ready:
+            # Index still building right after startup: fall back to the slow scan
+            patients = await repo.search_patients_by_name(full_name)
+            return {"patients": rank_scanned(patients, full_name, limit)}
+
+        # The index only holds names and phones; read the full items in one batch
+        hits = patient_index.search(full_name, limit=limit)
+        profiles = await ProfileLoader(repo).patients(hit["patient_id"] for hit in hits)
+        return {"patients": [
+            dict(profiles[hit["patient_id"]], score=hit["score"])
+            for hit in hits if hit["patient_id"] in profiles  # Skip patients deleted since the last rebuild
+        ]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to search patient directory: {str(e)}")
 
+async def resolve_clinic_id(appointment_id: str, clinic_id: Optional[str] = None) -> str:
+    """
+    Works out which clinic's queue a check-in belongs to: the explicit clinic_id
+    if the front desk sent one, else the clinic stored on the appointment (or
+    its doctor's profile).
+    """
+    if clinic_id:
+        return clinic_id
+    appointment = await repo.get_appointment(appointment_id) or {}
+    if appointment.get("clinic_name"):
+        return appointment["clinic_name"]
+    if appointment.get("doctor_id"):
+        doctor = await repo.get_doctor(appointment["doctor_id"]) or {}
+        if doctor.get("clinic_name"):
+            return doctor["clinic_name"]
+    return "default"
+
+
+async def resolve_board_clinic(clinic_id: Optional[str], claims: Optional[dict]) -> str:
+    """
+    Works out which clinic's queue a board shows: the explicit clinic_id, else
+    the clinic on the signed-in receptionist's (or doctor's) profile, the same
+    clinic_name check-in files their tokens under.
+    """
+    if clinic_id:
+        return clinic_id
+    if claims is None:
+        raise HTTPException(status_code=400, detail="clinic_id is required.")
+    user_id, role = claims.get('sub'), claims.get('custom:role')
+    if role == "Receptionist":
+        profile = await repo.get_receptionist(user_id) or {}
+    elif role == "Doctor":
+        profile = await repo.get_doctor(user_id) or {}
+    else:
+        raise HTTPException(status_code=400, detail="clinic_id is required.")
+    return profile.get("clinic_name") or "default"
+
+
 @router.post("/check-in/{patient_id}", response_model=QueueToken)
-async def generate_queue_token(patient_id: str, appointment_id: str):
+async def generate_queue_token(patient_id: str, appointment_id: str, clinic_id: Optional[str] = None):
     """
     Patient arrives at the hospital, receives a sequential queue token, and is saved to DynamoDB.
+    Tokens count up from 1 per clinic per day.
     """
     try:
-        # Get the current max token number
-        response = queue_table.scan(
-            ProjectionExpression="token_number"
-        )
-        items = response.get("Items", [])
-        
-        if items:
-            max_token = max(int(item["token_number"]) for item in items)
-        else:
-            max_token = 0  # First patient in queue
+        clinic_id = await resolve_clinic_id(appointment_id, clinic_id)
+        service_date = clinic_today().isoformat()
 
-        assigned_token = max_token + 1
+        # Atomic counter: unique even when two receptionists check patients in at once
+        assigned_token = await repo.next_queue_token(clinic_id, service_date)
 
         token_data = {
             "patient_id": patient_id,
             "appointment_id": appointment_id,
+            "clinic_id": clinic_id,
+            "service_date": service_date,
             "token_number": assigned_token,
             "status": "Waiting"
         }
 
         # Save to AWS DynamoDB
-        queue_table.put_item(Item=token_data)
+        await repo.put_queue_token(token_data)
+
+        # Push the new token to every board watching this clinic
+        queue_broadcaster.track(appointment_id, clinic_id)
+        queue_broadcaster.publish(clinic_id, {"type": "check_in", "token": token_data})
         return token_data
 
     except Exception as e:
@@ -86,52 +139,143 @@ async def generate_queue_token(patient_id: str, appointment_id: str):
 
 
 @router.get("/queue-status")
-async def get_queue_status():
+async def get_queue_status(
+    clinic_id: Optional[str] = None,
+    service_date: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    next_token: Optional[str] = None,
+    claims: Optional[dict] = Depends(optional_cognito_claims)
+):
     """
-    Fetches all patients currently waiting in the hospital (for the TV screen).
+    Fetches one clinic's queue for one day (today by default) for the TV screen,
+    in token order, one page at a time. Without clinic_id, the signed-in
+    receptionist's or doctor's own clinic is shown.
     """
+    service_date = service_date or clinic_today().isoformat()
+    clinic_id = await resolve_board_clinic(clinic_id, claims)
     try:
-        # Scans the table to get everyone in the queue
-        response = queue_table.scan()
-        return {"current_queue": response.get('Items', [])}
+        page = await repo.page_clinic_queue(clinic_id, service_date, limit=limit, next_token=next_token)
+        return {
+            "clinic_id": clinic_id,
+            "service_date": service_date,
+            "current_queue": page.items,
+            "next_token": page.next_token
+        }
+    except InvalidPageToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@router.get("/appointment/{appointment_id}")
-async def get_patient_from_appointment(appointment_id: str):
+@router.get("/queue-stream")
+async def stream_queue(clinic_id: str, request: Request):
     """
-    Fetch patient_id and full_name using appointment_id from the Appointment table.
+    Live queue board for the waiting-room TV (Server-Sent Events).
+    Sends today's queue for the clinic once ("snapshot"), then only changes
+    ("check_in" / "status") as they happen. Clients upsert by token_number.
+    """
+    async def events():
+        # Subscribe before reading the snapshot so nothing falls in between
+        queue = queue_broadcaster.subscribe(clinic_id)
+        try:
+            send_snapshot = True
+            while True:
+                if send_snapshot:
+                    tokens = await repo.list_clinic_queue(clinic_id, clinic_today().isoformat())
+                    for token in tokens:
+                        queue_broadcaster.track(token.get("appointment_id"), clinic_id)
+                    yield format_sse("snapshot", {"clinic_id": clinic_id, "tokens": tokens})
+                    send_snapshot = False
+
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event is None:
+                    return  # Server shutting down
+                if event is queue_broadcaster.RESYNC:
+                    send_snapshot = True
+                    continue
+                yield format_sse(event["type"], event)
+        finally:
+            queue_broadcaster.unsubscribe(clinic_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def describe_appointments(appointments: List[dict]) -> List[dict]:
     """
+    Front-desk view of appointments: patient and doctor display names come
+    from the (cached) profile loader, one batched lookup for all of them.
+    """
+    loader = ProfileLoader(repo)
+    doctors, patients = {}, {}
     try:
-        response = appointment_table.scan(
-            FilterExpression="#aid = :appointment_id",
-            ExpressionAttributeNames={"#aid": "appointment_id"},
-            ExpressionAttributeValues={":appointment_id": appointment_id}
+        doctors, patients = await asyncio.gather(
+            loader.doctors((a.get("doctor_id") for a in appointments), attributes=["doctor_name", "clinic_name"]),
+            loader.patients(
+                (a.get("patient_id") for a in appointments if not a.get("patient_name")),
+                attributes=["full_name"]
+            )
         )
-        items = response.get("Items", [])
-        if not items:
-            raise HTTPException(status_code=404, detail="No appointment found with this ID")
+    except Exception as e:
+        print(f"Appointment lookup enrichment failed: {e}")  # Fall back to what the appointment stores
 
-        # Assuming appointment_id is unique, return the first match
-        appointment = items[0]
-        
-        # Fetch doctor name from Doctor table if needed
-        doctor_name = appointment.get("doctor_id")
-        try:
-            doctors_table = dynamodb.Table('DrDecideDoctors')
-            doctor_response = doctors_table.get_item(Key={"doctor_id": appointment.get("doctor_id")})
-            if "Item" in doctor_response:
-                doctor_name = doctor_response["Item"].get("doctor_name", appointment.get("doctor_id"))
-        except Exception:
-            pass  # Fall back to doctor_id if lookup fails
-        
-        return {
+    described = []
+    for appointment in appointments:
+        doctor = doctors.get(appointment.get("doctor_id")) or {}
+        patient = patients.get(appointment.get("patient_id")) or {}
+        described.append({
             "patient_id": appointment.get("patient_id"),
-            "full_name": appointment.get("patient_name"),
-            "doctor_name": doctor_name,
+            "full_name": appointment.get("patient_name") or patient.get("full_name"),
+            "doctor_name": doctor.get("doctor_name", appointment.get("doctor_id")),
+            "clinic_name": appointment.get("clinic_name") or doctor.get("clinic_name"),
             "time": appointment.get("appointment_date"),
+            "status": appointment.get("status"),
             "doctor_id": appointment.get("doctor_id"),
             "appointment_id": appointment.get("appointment_id")
-        } 
+        })
+    return described
+
+@router.get("/appointment/{appointment_id}")
+async def get_patient_from_appointment(appointment_id: str):
+    """
+    Fetch patient_id and full_name using appointment_id from the Appointment table.
+    """
+    try:
+        appointment = await repo.get_appointment(appointment_id)
+        if not appointment:
+            raise HTTPException(status_code=404, detail="No appointment found with this ID")
+        
+        return (await describe_appointments([appointment]))[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.post("/appointments/lookup")
+async def lookup_appointments(req: AppointmentLookupRequest):
+    """
+    Batch version of /appointment/{id} for the check-in desk: resolves up to
+    100 appointment ids (e.g. scanned QR codes) with one key-based batch read.
+    Unknown ids are listed under "not_found".
+    """
+    appointment_ids = list(dict.fromkeys(req.appointment_ids))
+    if len(appointment_ids) > MAX_LOOKUP_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOOKUP_IDS} appointment ids per lookup.")
+
+    try:
+        found = await repo.batch_get_appointments(appointment_ids)
+        appointments = await describe_appointments([found[a] for a in appointment_ids if a in found])
+        return {
+            "appointments": appointments,
+            "not_found": [a for a in appointment_ids if a not in found]
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -1,73 +1,71 @@
 import uuid
-import boto3
-import os
-from boto3.dynamodb.conditions import Attr, Key
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
-from app.models import AppointmentRequest, CarePlanResponse, PatientProfileSetup, TaskUpdate
+from app.models import AppointmentRequest, CarePlanResponse, PatientProfileSetup, TaskSyncRequest, TaskUpdate
 from app.services.auth import require_role 
+from app.repository import DEFAULT_PAGE_SIZE, InvalidPageToken, ProfileLoader, get_repository
+from app.repository.pagination import decode_page_token, encode_page_token
+from app.services.utils import IST, appointment_date_window, appointment_local_time, clinic_today
+from app.services.patient_search import patient_index
+from app.services import adherence_engine, adherence_summary, doctor_stats
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 
 router = APIRouter(prefix="/api/patient", tags=["Patient Operations"])
 
-# Initialize DynamoDB directly to sync with your AWS backend
-dynamodb = boto3.resource('dynamodb', region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
-care_plans_table = dynamodb.Table('DrDecideCarePlans')
-appointments_table = dynamodb.Table('DrDecideAppointments')
-notifications_table = dynamodb.Table('DrDecideNotifications')
-doctors_table = dynamodb.Table('DrDecideDoctors')
-patients_table = dynamodb.Table('DrDecidePatients')
+# Async data-access layer (DynamoDB, or the in-memory stand-in offline)
+repo = get_repository()
+
+# Offline sync limits: completions per request, and how many days back a device may catch up
+MAX_SYNC_COMPLETIONS = 500
+SYNC_MAX_AGE_DAYS = 14
 
 @router.get("/my-appointments")
 async def get_patient_appointments(
+    view: str = "all",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
     current_user: dict = Depends(require_role("Patient"))
 ):
     """
-    Retrieves all appointments for the logged-in patient.
+    Retrieves the appointments for the logged-in patient.
+    Narrow it with view=today|upcoming|all or an explicit start_date/end_date (YYYY-MM-DD, IST).
     """
-    patient_email = current_user.get('email') or current_user.get('cognito:username') or current_user.get('username')
-    
+    patient_id = current_user.get('sub')
+
     try:
-        response = appointments_table.scan(
-            FilterExpression=Attr('patient_email').eq(patient_email)
-        )
-        my_appointments = response.get('Items', [])
+        window_start, window_end = appointment_date_window(view, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        my_appointments = await repo.query_appointments_for_patient(patient_id, window_start, window_end)
 
         # Enrich appointments with doctor profile fields for consistent frontend display.
+        needs_profile = []
         for appt in my_appointments:
             doctor_ref = appt.get('doctor_id') or appt.get('doctor_email')
             if doctor_ref:
                 appt['doctor_id'] = doctor_ref
+                if not appt.get('doctor_name') or not appt.get('clinic_name'):
+                    needs_profile.append(appt)
+
+        # One batched lookup for every distinct doctor (historical rows may store the email instead of the id)
+        profiles = {}
+        try:
+            profiles = await ProfileLoader(repo).doctors(
+                (a['doctor_id'] for a in needs_profile), attributes=['doctor_name', 'clinic_name']
+            )
+        except Exception as lookup_err:
+            print(f"Doctor lookup failed: {lookup_err}")
 
-                needs_profile = not appt.get('doctor_name') or not appt.get('clinic_name')
-                if needs_profile:
-                    profile = None
-                    try:
-                        by_id = doctors_table.get_item(Key={'doctor_id': doctor_ref})
-                        profile = by_id.get('Item')
-                    except Exception as lookup_err:
-                        print(f"Doctor lookup by id failed for {doctor_ref}: {lookup_err}")
-
-                    # Backward compatibility: some historical rows may store doctor email in doctor_ref.
-                    if not profile:
-                        try:
-                            by_email = doctors_table.scan(
-                                FilterExpression=Attr('email').eq(doctor_ref)
-                            )
-                            profile_items = by_email.get('Items', [])
-                            if profile_items:
-                                profile = profile_items[0]
-                                if not appt.get('doctor_id'):
-                                    appt['doctor_id'] = profile.get('doctor_id')
-                        except Exception as lookup_err:
-                            print(f"Doctor lookup by email failed for {doctor_ref}: {lookup_err}")
-
-                    if profile:
-                        if profile.get('doctor_name'):
-                            appt['doctor_name'] = profile.get('doctor_name')
-                        if profile.get('clinic_name'):
-                            appt['clinic_name'] = profile.get('clinic_name')
+        for appt in needs_profile:
+            profile = profiles.get(appt['doctor_id'])
+            if profile:
+                if profile.get('doctor_name'):
+                    appt['doctor_name'] = profile.get('doctor_name')
+                if profile.get('clinic_name'):
+                    appt['clinic_name'] = profile.get('clinic_name')
 
         my_appointments.sort(key=lambda x: x.get('appointment_date', ''), reverse=True)
         
@@ -88,15 +86,10 @@ async def get_care_plan(
     patient_id = current_user.get('sub') 
     
     try:
-        response = care_plans_table.query(
-            KeyConditionExpression=Key('patient_id').eq(patient_id)
-        )
-        
-        plans = response.get('Items', [])
-        if not plans:
+        # Newest plan via the LATEST pointer: one read, however many visits the patient has had
+        latest_plan = await repo.get_latest_care_plan(patient_id)
+        if not latest_plan:
             raise HTTPException(status_code=404, detail="Care plan not found.")
-            
-        latest_plan = plans[-1]
         
         return {
             "appointment_id": latest_plan.get("appointment_id"),
@@ -126,12 +119,150 @@ async def log_task_done(
     if update.status != "Done":
         return {"message": "No update required."}
 
-    success = True # Mocking success for now until the adherence table is built
-    
-    if not success:
+    try:
+        # Same plan /my-plan shows, unless the app names the appointment
+        if update.appointment_id:
+            plan = await repo.get_care_plan_for_appointment(update.appointment_id)
+            if plan and plan.get('patient_id') != patient_id:
+                plan = None
+        else:
+            plan = await repo.get_latest_care_plan(patient_id)
+        if not plan:
+            raise HTTPException(status_code=404, detail="Care plan not found.")
+
+        # Legacy plans may predate doctor_id; take it from the appointment, else log without one
+        doctor_id = plan.get('doctor_id')
+        if not doctor_id:
+            appt = await repo.get_appointment(plan['appointment_id'])
+            doctor_id = (appt or {}).get('doctor_id') or None
+
+        log_item = adherence_summary.build_log(
+            plan['appointment_id'], patient_id, doctor_id,
+            update.task_id, update.task_title or update.task_id, datetime.utcnow(), clinic_today()
+        )
+        results = await adherence_summary.record_completions(repo, [log_item])
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error logging task: {e}")
         raise HTTPException(status_code=500, detail="Failed to log adherence status.")
-        
+
+    if not results[log_item['log_id']]:
+        return {"message": f"Task {update.task_id} was already marked as done today."}
     return {"message": f"Task {update.task_id} marked as done for {patient_id}. Adherence logged successfully!"}
+
+
+@router.post("/sync")
+async def sync_task_logs(
+    request: TaskSyncRequest,
+    current_user: dict = Depends(require_role("Patient"))
+):
+    """
+    Offline catch-up in one request: uploads every task the device marked done
+    while offline, then returns what changed since the device's last sync.
+
+    Completions are deduplicated by appointment, day and task, so replaying a
+    batch (or overlapping with /log) never double counts. Send the returned
+    `version` next time to get only the appointments whose numbers moved.
+    """
+    patient_id = current_user.get('sub')
+    if len(request.completions) > MAX_SYNC_COMPLETIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SYNC_COMPLETIONS} completions per sync.")
+    try:
+        known = decode_page_token(request.version) or {}
+    except InvalidPageToken:
+        raise HTTPException(status_code=400, detail="Invalid version token.")
+
+    try:
+        # 1. The patient's plans say which appointments they may log against (and the doctor);
+        #    anything else must at least be one of their appointments
+        plans = await repo.query_care_plans_for_patient(patient_id)
+        plan_by_appointment = {p['appointment_id']: p for p in plans if p.get('appointment_id')}
+        #    (None for legacy records with no doctor: build_log then leaves the attribute out)
+        doctors = {appt_id: p.get('doctor_id') or None for appt_id, p in plan_by_appointment.items()}
+        requested = {c.appointment_id for c in request.completions}
+        others = requested - set(doctors)
+        missing_doctor = {a for a in requested & set(doctors) if doctors[a] is None}
+        if others or missing_doctor:
+            for appt_id, appt in (await repo.batch_get_appointments(list(others | missing_doctor))).items():
+                if appt_id in missing_doctor or appt.get('patient_id') == patient_id:
+                    doctors[appt_id] = appt.get('doctor_id') or None
+
+        # 2. Validate and convert; the same task twice in one batch collapses to the earliest
+        today = clinic_today()
+        now = datetime.now(IST)
+        logs, rejected = {}, []
+        for index, completion in enumerate(request.completions):
+            if completion.appointment_id not in doctors:
+                rejected.append({"index": index, "reason": "Unknown appointment."})
+                continue
+            local = appointment_local_time(completion.completed_at)
+            if local is None:
+                rejected.append({"index": index, "reason": "Invalid completed_at."})
+                continue
+            local = min(local, now)  # A device clock running ahead can't log into the future
+            if (today - local.date()).days > SYNC_MAX_AGE_DAYS:
+                rejected.append({"index": index, "reason": "Too old to sync."})
+                continue
+            log_item = adherence_summary.build_log(
+                completion.appointment_id, patient_id, doctors[completion.appointment_id],
+                completion.task_id, completion.task_title or completion.task_id,
+                local.astimezone(timezone.utc).replace(tzinfo=None), local.date()
+            )
+            current = logs.get(log_item['log_id'])
+            if current is None or log_item['timestamp'] < current['timestamp']:
+                logs[log_item['log_id']] = log_item
+
+        # 3. Count and persist them in bulk
+        results = await adherence_summary.record_completions(repo, list(logs.values()))
+
+        # 4. Delta since the device's version: appointments whose totals moved (or everything on a new day)
+        summaries = await repo.batch_get_adherence_summaries(list(plan_by_appointment))
+        totals = {a: int(summaries.get(a, {}).get('total_completed', 0)) for a in plan_by_appointment}
+        same_day = known.get('d') == today.isoformat()
+        changed = [a for a in plan_by_appointment if not same_day or known.get('s', {}).get(a) != totals[a]]
+        scores = adherence_engine.score([totals[a] for a in changed], [plan_by_appointment[a] for a in changed], today)
+
+        latest_plan = plans[-1] if plans else None  # History comes back oldest first
+        plan_marker = (
+            f"{latest_plan.get('appointment_id')}|{latest_plan.get('created_at') or latest_plan.get('created_date')}"
+            if latest_plan else None
+        )
+    except Exception as e:
+        print(f"Error syncing task logs: {e}")
+        raise HTTPException(status_code=500, detail="Failed to sync task logs.")
+
+    return {
+        "accepted": [log_id for log_id, is_new in results.items() if is_new],
+        "duplicates": len(request.completions) - len(rejected) - sum(1 for is_new in results.values() if is_new),
+        "rejected": rejected,
+        "adherence": [
+            {
+                "appointment_id": appt_id,
+                "total_completed": totals[appt_id],
+                "expected_tasks": int(expected),
+                "adherence_percentage": int(percentage),
+                "status": str(status),
+                "todays_completed_tasks": adherence_summary.tasks_done_on(summaries.get(appt_id, {}), today),
+                "last_active": summaries.get(appt_id, {}).get('last_active')
+            }
+            for appt_id, expected, percentage, status in zip(
+                changed, scores["expected_tasks"], scores["adherence_percentage"], scores["status"]
+            )
+        ],
+        # Only when the plan on /my-plan changed since the last sync
+        "plan": {
+            "appointment_id": latest_plan.get("appointment_id"),
+            "doctor_id": latest_plan.get("doctor_id"),
+            "simplified_plan": latest_plan.get("simplified_plan"),
+            "follow_up_reminder": latest_plan.get("follow_up_reminder"),
+            "follow_up_date": latest_plan.get("follow_up_date"),
+            "status": latest_plan.get("status")
+        } if latest_plan and plan_marker != known.get('p') else None,
+        "version": encode_page_token({"d": today.isoformat(), "s": totals, "p": plan_marker})
+    }
+
+
 @router.post("/book-appointment")
 async def book_appointment(
     req: AppointmentRequest,
@@ -147,8 +278,7 @@ async def book_appointment(
 
     doctor_profile = None
     try:
-        doctor_profile_res = doctors_table.get_item(Key={'doctor_id': req.doctor_id})
-        doctor_profile = doctor_profile_res.get('Item')
+        doctor_profile = await repo.get_doctor(req.doctor_id)
     except Exception as lookup_err:
         print(f"Doctor profile lookup failed for {req.doctor_id}: {lookup_err}")
     
@@ -167,7 +297,8 @@ async def book_appointment(
     }
     
     try:
-        appointments_table.put_item(Item=record)
+        await repo.put_appointment(record)
+        await doctor_stats.record_booking(repo, record)
         return {
             "message": "Appointment booked successfully.",
             "appointment_id": appointment_id,
@@ -181,27 +312,28 @@ async def book_appointment(
 
 @router.get("/notifications")
 async def get_notifications(
+    limit: int = DEFAULT_PAGE_SIZE,
+    next_token: Optional[str] = None,
     current_user: dict = Depends(require_role("Patient"))
 ):
     """
-    Fetches in-app notifications for the patient dashboard.
+    Fetches in-app notifications for the patient dashboard, newest first.
     """
     patient_id = current_user.get('sub') 
     
     try:
-        response = notifications_table.scan(
-            FilterExpression=Attr('patient_id').eq(patient_id)
-        )
-        
-        my_notifications = response.get('Items', [])
-        my_notifications.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        page = await repo.page_notifications_for_patient(patient_id, limit=limit, next_token=next_token)
         
-        unread_count = sum(1 for n in my_notifications if n.get('status') == 'Unread')
+        # Counted server-side so the badge stays right even when only one page is loaded
+        unread_count = await repo.count_unread_notifications(patient_id)
         
         return {
             "unread_count": unread_count, 
-            "notifications": my_notifications
+            "notifications": page.items,
+            "next_token": page.next_token
         }
+    except InvalidPageToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"DynamoDB Error: {e}")
         raise HTTPException(status_code=500, detail="Could not retrieve notifications.")
@@ -222,8 +354,7 @@ async def search_nearby_doctors(
     """
     try:
         # Start with a base scan (In a production app, we would use a Global Secondary Index here)
-        response = doctors_table.scan()
-        all_doctors = response.get('Items', [])
+        all_doctors = await repo.list_doctors()
 
         # Apply our "Smart Filters" in Python
         filtered_doctors = all_doctors
@@ -286,7 +417,9 @@ async def setup_patient_profile(
     }
 
     try:
-        patients_table.put_item(Item=record)
+        await repo.put_patient(record)
+        # Keep the front-desk name search current without waiting for the next rebuild
+        patient_index.upsert(record)
         return {
             "message": "Patient profile completed successfully!", 
             "profile": record
@@ -306,10 +439,10 @@ async def get_patient_profile(
     patient_id = current_user.get('sub')
     
     try:
-        response = patients_table.get_item(Key={'patient_id': patient_id})
+        profile = await repo.get_patient(patient_id)
         
-        if 'Item' in response:
-            return response['Item']
+        if profile:
+            return profile
         else:
             # If no item is found, the profile isn't set up yet!
             return {
@@ -328,24 +461,15 @@ async def get_care_plan_by_appointment_id(appointment_id: str):
     """
     try:
         # 1. Query using the Global Secondary Index (GSI)
-        # It's better to use Key('appointment_id').eq(...) for performance
-        response = care_plans_table.query(
-            IndexName='appointment_id-index', 
-            KeyConditionExpression=Key('appointment_id').eq(appointment_id)
-        )
-
-        items = response.get('Items', [])
+        record = await repo.get_care_plan_for_appointment(appointment_id)
         
-        if not items:
+        if not record:
             raise HTTPException(
                 status_code=404, 
                 detail=f"No care plan found for Appointment ID: {appointment_id}"
             )
 
-        # 2. Extract the first matching record
-        record = items[0]
-
-        # 3. Explicitly map fields to handle Decimal conversion and missing keys
+        # 2. Explicitly map fields to handle Decimal conversion and missing keys
         # This prevents the "Validation Error" if DynamoDB has a missing column
         return CarePlanResponse(
             doctor_id=str(record.get('doctor_id', '')),
@@ -0,0 +1,98 @@
+"""
+Adherence math shared by the recovery detail view and the doctor's overview.
+
+Tracking starts the day after the consultation and stops at the follow-up
+date; until then the patient is expected to log `daily_task_count` tasks per
+day. Everything is computed on NumPy arrays, so scoring every appointment a
+doctor has costs the same handful of vector operations as scoring one.
+"""
+from datetime import date
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_TASKS_PER_DAY = 4
+# Used when a plan was saved without a follow-up date
+DEFAULT_FOLLOW_UP_DAYS = 7
+
+ON_TRACK_PERCENT = 75
+NEEDS_ATTENTION_PERCENT = 50
+
+NOT_STARTED = "Starts Tomorrow"
+ON_TRACK = "On Track"
+NEEDS_ATTENTION = "Needs Attention"
+CRITICAL = "Critical"
+
+
+def _to_days(values: List[Optional[str]]) -> np.ndarray:
+    """YYYY-MM-DD prefixes -> datetime64[D]; missing or malformed dates become NaT."""
+    try:
+        return np.array([v[:10] if v else "NaT" for v in values], dtype="datetime64[D]")
+    except ValueError:
+        # One bad value shouldn't fail the whole batch; parse the slow way
+        days = []
+        for v in values:
+            try:
+                days.append(np.datetime64(v[:10], "D") if v else np.datetime64("NaT"))
+            except ValueError:
+                days.append(np.datetime64("NaT"))
+        return np.array(days, dtype="datetime64[D]")
+
+
+def _tasks_per_day(plans: Sequence[Optional[dict]]) -> np.ndarray:
+    counts = []
+    for plan in plans:
+        try:
+            counts.append(int((plan or {}).get("daily_task_count", DEFAULT_TASKS_PER_DAY)))
+        except (TypeError, ValueError):
+            counts.append(DEFAULT_TASKS_PER_DAY)
+    return np.array(counts, dtype=np.int64)
+
+
+def score(completed: Sequence[int], plans: Sequence[Optional[dict]], today: date) -> dict:
+    """
+    Scores many appointments at once. `completed[i]` is the number of tasks
+    logged against the appointment whose care plan is `plans[i]` (None when
+    the plan can't be found, which is scored as one day of default tasks).
+
+    Returns parallel arrays: expected_tasks, adherence_percentage, status.
+    """
+    completed = np.asarray(completed, dtype=np.int64)
+    today_d = np.datetime64(today, "D")
+    has_plan = np.array([plan is not None for plan in plans], dtype=bool)
+
+    created = _to_days([
+        str(plan.get("created_date") or plan.get("created_at") or "") if plan else None for plan in plans
+    ])
+    created = np.where(np.isnat(created), today_d, created)
+    follow_up = _to_days([str(plan.get("follow_up_date") or "") if plan else None for plan in plans])
+    follow_up = np.where(np.isnat(follow_up), created + DEFAULT_FOLLOW_UP_DAYS, follow_up)
+
+    # Tracking starts the day AFTER the consultation and stops at the follow-up date
+    start = np.where(has_plan, created + 1, today_d)
+    end = np.where(has_plan, np.minimum(today_d, follow_up), today_d)
+    not_started = today_d < start
+
+    days_elapsed = np.clip((end - start).astype(np.int64) + 1, 0, None)
+    expected = np.where(not_started, 0, days_elapsed * _tasks_per_day(plans))
+    percentage = np.where(
+        expected > 0,
+        np.minimum(completed * 100 // np.maximum(expected, 1), 100),
+        0
+    )
+    status = np.select(
+        [not_started, percentage >= ON_TRACK_PERCENT, percentage >= NEEDS_ATTENTION_PERCENT],
+        [NOT_STARTED, ON_TRACK, NEEDS_ATTENTION],
+        default=CRITICAL
+    )
+    return {"expected_tasks": expected, "adherence_percentage": percentage, "status": status}
+
+
+def score_one(completed: int, plan: Optional[dict], today: date) -> dict:
+    """Single-appointment form of `score`, with plain Python values."""
+    scores = score([completed], [plan], today)
+    return {
+        "expected_tasks": int(scores["expected_tasks"][0]),
+        "adherence_percentage": int(scores["adherence_percentage"][0]),
+        "status": str(scores["status"][0]),
+    }
@@ -0,0 +1,181 @@
+import asyncio
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from app.services.batch_writer import MAX_BATCH_SIZE, adherence_log_writer
+
+# One item per appointment in DrDecideAdherenceSummaries, folded forward by every
+# task log so the stats endpoints never re-read the log history:
+#   total_completed, last_active, recent_logs (newest first, except that a late
+#   offline log may sit out of order until read through newest_recent_logs),
+#   done_YYYY-MM-DD (completions that day), tasks_YYYY-MM-DD (task ids done that day)
+RECENT_LOGS_LIMIT = 10
+
+DAY_COUNT_PREFIX = "done_"
+DAY_TASKS_PREFIX = "tasks_"
+
+
+def day_count_attribute(day) -> str:
+    return f"{DAY_COUNT_PREFIX}{day.isoformat() if isinstance(day, date) else day}"
+
+
+def day_tasks_attribute(day) -> str:
+    return f"{DAY_TASKS_PREFIX}{day.isoformat() if isinstance(day, date) else day}"
+
+
+def recent_entry(log: dict) -> dict:
+    """The slice of a log the stats screens show in 'recent activity'."""
+    return {
+        "id": log.get("log_id"),
+        "task_title": log.get("task_title", "Unknown Task"),
+        "logged_at": log.get("timestamp")
+    }
+
+
+def newest_recent_logs(entries: List[dict], limit: int = RECENT_LOGS_LIMIT) -> List[dict]:
+    """The `limit` newest recent_logs entries, newest first, whatever order they were stored in."""
+    return sorted(entries, key=lambda e: e.get("logged_at") or "", reverse=True)[:limit]
+
+
+def summary_from_logs(appointment_id: str, logs: List[dict]) -> Optional[dict]:
+    """
+    Builds the summary item from raw logs (backfill for appointments logged
+    before summaries existed). Repeats of a task on the same day, left by old
+    double taps, are counted once, as /log does now.
+    """
+    seen, unique = set(), []
+    for log in sorted(logs, key=lambda l: l.get("timestamp", "")):
+        key = (log.get("date_logged"), log.get("task_id"))
+        if log.get("task_id") and key in seen:
+            continue
+        seen.add(key)
+        unique.append(log)
+    if not unique:
+        return None
+    unique.reverse()  # Newest first
+
+    summary = {
+        "appointment_id": appointment_id,
+        "total_completed": len(unique),
+        "last_active": unique[0].get("timestamp"),
+        "recent_logs": [recent_entry(l) for l in unique[:RECENT_LOGS_LIMIT]],
+    }
+    for key in ("patient_id", "doctor_id"):
+        owner = next((l[key] for l in unique if l.get(key)), None)
+        if owner:
+            summary[key] = owner
+    for log in unique:
+        day = log.get("date_logged")
+        if not day:
+            continue
+        count = day_count_attribute(day)
+        summary[count] = summary.get(count, 0) + 1
+        if log.get("task_id"):
+            summary.setdefault(day_tasks_attribute(day), set()).add(log["task_id"])
+    return summary
+
+
+def log_id_for(appointment_id: str, day, task_id: str) -> str:
+    """
+    Deterministic id of one task's completion on one day, so a double tap or a
+    client retry writes the same log item instead of a second one.
+    """
+    return f"LOG#{appointment_id}#{day.isoformat() if isinstance(day, date) else day}#{task_id}"
+
+
+async def record_log(repo, log: dict) -> bool:
+    """
+    Folds the log into the summary. Returns False if that task was already
+    logged for the day. A failed update is logged and treated as new, because
+    the summary is derived data and the deterministic log id still dedupes the
+    raw log.
+    """
+    try:
+        return await repo.add_to_adherence_summary(log, RECENT_LOGS_LIMIT)
+    except Exception as e:
+        print(f"Adherence summary update failed for {log.get('appointment_id')}: {e}")
+        return True
+
+
+def build_log(appointment_id: str, patient_id: str, doctor_id: Optional[str], task_id: str, task_title: str, logged_at: datetime, day: date) -> dict:
+    """
+    One raw log item; `logged_at` is naive UTC and `day` the clinic (IST) day it counts for.
+    Legacy plans and appointments may have no doctor; the log is then written
+    without doctor_id, which is a GSI key and must never be None or "".
+    """
+    log = {
+        'log_id': log_id_for(appointment_id, day, task_id), # Primary Key
+        'appointment_id': appointment_id, # Global Secondary Index for fast querying
+        'patient_id': patient_id,
+        'task_id': task_id,
+        'task_title': task_title,
+        'timestamp': logged_at.isoformat(),
+        'date_logged': day.isoformat() # Storing the date makes fetching "Today's tasks" very fast
+    }
+    if doctor_id:
+        log['doctor_id'] = doctor_id
+    return log
+
+
+async def record_completions(repo, logs: List[dict]) -> Dict[str, bool]:
+    """
+    Counts and persists many task logs at once (e.g. an offline device
+    catching up). Returns {log_id: True if new, False if a duplicate}.
+
+    Each appointment's logs are folded into its summary oldest first, so
+    last_active and recent_logs end up in time order; different appointments
+    run concurrently. New raw logs go to the coalescing writer, or straight
+    out as BatchWriteItem chunks when it isn't running.
+    """
+    by_appointment: Dict[str, List[dict]] = {}
+    for log in logs:
+        by_appointment.setdefault(log["appointment_id"], []).append(log)
+
+    results: Dict[str, bool] = {}
+
+    async def fold(appointment_logs: List[dict]):
+        for log in sorted(appointment_logs, key=lambda l: l["timestamp"]):
+            results[log["log_id"]] = await record_log(repo, log)
+
+    await asyncio.gather(*(fold(group) for group in by_appointment.values()))
+
+    unqueued = [log for log in logs if results[log["log_id"]] and not adherence_log_writer.submit(log)]
+    await asyncio.gather(*(
+        repo.batch_put_adherence_logs(unqueued[i:i + MAX_BATCH_SIZE]) for i in range(0, len(unqueued), MAX_BATCH_SIZE)
+    ))
+    return results
+
+
+async def load_summary(repo, appointment_id: str) -> Optional[dict]:
+    """
+    Reads the appointment's summary item. Appointments logged before summaries
+    existed are rebuilt from their logs once and stored, so every later read is
+    a single GetItem.
+    """
+    summary = await repo.get_adherence_summary(appointment_id)
+    if summary is not None:
+        return summary
+
+    summary = summary_from_logs(appointment_id, await repo.query_logs_for_appointment(appointment_id))
+    if summary is None:
+        return None
+    if not await repo.create_adherence_summary(summary):
+        # A log landed while we were rebuilding; its atomic update already created the item
+        return await repo.get_adherence_summary(appointment_id)
+    return summary
+
+
+def completed_on(summary: dict, day) -> int:
+    return int(summary.get(day_count_attribute(day), 0))
+
+
+def tasks_done_on(summary: dict, day) -> List[str]:
+    return sorted(summary.get(day_tasks_attribute(day), ()))
+
+
+def daily_counts(summary: dict) -> Dict[str, int]:
+    """{YYYY-MM-DD: completions} for every day with at least one log, oldest first."""
+    return {
+        name[len(DAY_COUNT_PREFIX):]: int(value)
+        for name, value in sorted(summary.items()) if name.startswith(DAY_COUNT_PREFIX)
+    }
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import UploadFile
+from google.genai import types
+
+from app.services.gemini import gemini
+
+# Bigger uploads are refused with 413
+MAX_ATTACHMENT_BYTES = int(float(os.getenv("CONSULTATION_MAX_ATTACHMENT_MB", "20")) * 1024 * 1024)
+# Up to this size the file is kept in memory and sent inline; above it, it is
+# spooled to disk and handed to Gemini through the Files API
+INLINE_ATTACHMENT_BYTES = int(float(os.getenv("CONSULTATION_INLINE_ATTACHMENT_MB", "4")) * 1024 * 1024)
+CHUNK_BYTES = 64 * 1024
+
+
+class AttachmentTooLarge(ValueError):
+    pass
+
+
+class Attachment:
+    """
+    One consultation upload, copied out of the request in fixed-size chunks
+    and hashed on the way. Small files stay in memory; once a file passes
+    INLINE_ATTACHMENT_BYTES the copy moves to a temp file on disk, so a
+    request never holds more than INLINE_ATTACHMENT_BYTES of it in memory,
+    whatever the upload's size.
+
+    Call `close` when done; it removes the temp file.
+    """
+
+    def __init__(self, filename: str, mime_type: str):
+        self.filename = filename
+        self.mime_type = mime_type or "application/octet-stream"
+        self.size = 0
+        self.sha256 = ""
+        self.path: Optional[str] = None
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+
+    @property
+    def inline(self) -> bool:
+        return self.size <= INLINE_ATTACHMENT_BYTES
+
+    @property
+    def digest(self) -> str:
+        """Identifies the content for the generation cache."""
+        return f"{self.mime_type}:{self.sha256}"
+
+    def metadata(self) -> dict:
+        """What the care plan record keeps about the file."""
+        return {
+            "file_attached": self.filename,
+            "attachment_type": self.mime_type,
+            "attachment_size": self.size,
+            "attachment_sha256": self.sha256,
+        }
+
+    @classmethod
+    def from_path(cls, path: str, filename: str, mime_type: str, size: int, sha256: str) -> "Attachment":
+        """Re-opens a file persisted with `persist` (e.g. a job resumed after a restart)."""
+        attachment = cls(filename, mime_type)
+        attachment.path, attachment.size, attachment.sha256 = path, size, sha256
+        attachment._buffer = None
+        return attachment
+
+    def read_bytes(self) -> bytes:
+        if self._buffer is not None:
+            return self._buffer.getvalue()
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def persist(self, directory: str, name: str) -> None:
+        """Moves (or writes) the content to `directory/name`, outliving this request."""
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, name)
+        if self._buffer is not None:
+            with open(target, "wb") as f:
+                f.write(self._buffer.getvalue())
+            self._buffer = None
+        else:
+            shutil.move(self.path, target)
+        self.path = target
+
+    def close(self) -> None:
+        self._buffer = None
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+async def ingest(upload: Optional[UploadFile], max_bytes: int = MAX_ATTACHMENT_BYTES) -> Optional[Attachment]:
+    """
+    Copies an upload into an Attachment chunk by chunk, hashing as it goes.
+    Raises AttachmentTooLarge as soon as the copy passes `max_bytes`.
+    """
+    if upload is None or not upload.filename:
+        return None
+
+    attachment = Attachment(upload.filename, upload.content_type)
+    hasher = hashlib.sha256()
+    spool = None
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            attachment.size += len(chunk)
+            if attachment.size > max_bytes:
+                raise AttachmentTooLarge(
+                    f"Attachment is larger than the {max_bytes // (1024 * 1024)} MB limit."
+                )
+            hasher.update(chunk)
+
+            if spool is None and attachment.size > INLINE_ATTACHMENT_BYTES:
+                # Too big to keep in memory: continue on disk
+                spool = tempfile.NamedTemporaryFile(prefix="consultation-", delete=False)
+                attachment.path = spool.name
+                await asyncio.to_thread(spool.write, attachment._buffer.getvalue())
+                attachment._buffer = None
+            if spool is None:
+                attachment._buffer.write(chunk)
+            else:
+                await asyncio.to_thread(spool.write, chunk)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+        attachment.close()
+        raise
+    if spool is not None:
+        spool.close()
+
+    attachment.sha256 = hasher.hexdigest()
+    print(f"File attached: {attachment.filename} ({attachment.mime_type}, {attachment.size} bytes)")
+    return attachment
+
+
+@asynccontextmanager
+async def gemini_part(attachment: Attachment) -> AsyncIterator[types.Part]:
+    """
+    Inline bytes for small files; large ones are uploaded from disk through
+    the Files API and referenced by URI, so they never sit in memory whole.
+    The uploaded copy is deleted again when the block exits.
+    """
+    if attachment.inline:
+        yield types.Part.from_bytes(data=attachment.read_bytes(), mime_type=attachment.mime_type)
+        return
+    uploaded = await gemini.upload(attachment.path, attachment.mime_type, attachment.filename)
+    try:
+        yield types.Part.from_uri(file_uri=uploaded.uri, mime_type=uploaded.mime_type or attachment.mime_type)
+    finally:
+        await gemini.delete_file(uploaded.name)
@@ -1,13 +1,17 @@
-import urllib.request
+import asyncio
 import os
-import json
-import boto3
+import time
 from botocore.exceptions import ClientError
-from jose import jwk, jwt
+from jose import jwt
 from jose.utils import base64url_decode
 from fastapi import HTTPException, Security, Depends,status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Optional
 from dotenv import load_dotenv
+from app.services.aws import get_client
+from app.services.concurrency import BoundedExecutor
+from app.services.jwks import build_key_store
+from app.services.token_cache import VerifiedClaimsCache
 
 # 1. Load environment variables
 load_dotenv()
@@ -18,14 +22,45 @@ USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID")
 APP_CLIENT_ID = os.getenv("COGNITO_APP_CLIENT_ID")
 
 # 3. Initialize Boto3 Cognito Client (For Login/Signup)
-cognito_client = boto3.client('cognito-idp', region_name=REGION)
+cognito_client = get_client('cognito-idp')
+
+# boto3 is synchronous, so Cognito calls run on their own bounded pool instead of the event loop
+COGNITO_CALL_TIMEOUT = float(os.getenv("COGNITO_CALL_TIMEOUT_SECONDS", "10"))
+cognito_executor = BoundedExecutor(
+    name="cognito",
+    max_workers=int(os.getenv("COGNITO_MAX_CONCURRENCY", "16")),
+    default_timeout=COGNITO_CALL_TIMEOUT
+)
+
+async def _cognito_call(operation: str, timeout: Optional[float] = None, **params):
+    """
+    Runs one Cognito API call without blocking the event loop.
+    A call that exceeds its timeout (including time spent waiting for a slot) becomes a 504.
+    """
+    method = getattr(cognito_client, operation)
+    try:
+        return await cognito_executor.run(method, timeout=timeout, **params)
+    except asyncio.TimeoutError:
+        print(f"Cognito {operation} timed out")
+        raise HTTPException(status_code=504, detail="Authentication service timed out. Please try again.")
 
 # --- PART 0: COGNITO KEYS INITIALIZATION ---
+if not USER_POOL_ID or not APP_CLIENT_ID:
+    print("CRITICAL WARNING: COGNITO_USER_POOL_ID or COGNITO_APP_CLIENT_ID is missing from your .env file!")
+
+# Public keys are indexed by kid and refreshed in the background (see main.py startup)
+key_store = build_key_store(REGION, USER_POOL_ID)
+
+# Verified claims are reused until the token expires; a key rotation invalidates them all
+claims_cache = VerifiedClaimsCache(max_entries=int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "10000")))
+key_store.add_rotation_listener(claims_cache.clear)
+
 # --- PART 1: LOGIN & SIGNUP FUNCTIONS ---
 
-def sign_up_user(email, password, role):
+async def sign_up_user(email, password, role):
     try:
-        cognito_client.sign_up(
+        await _cognito_call(
+            'sign_up',
             ClientId=APP_CLIENT_ID,
             Username=email,
             Password=password,
@@ -36,12 +71,15 @@ def sign_up_user(email, password, role):
         )
         # We return a message telling the frontend to redirect to the verification screen
         return {"message": "Sign up successful! Please check your email for the verification code."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-def login_user(email, password):
+async def login_user(email, password):
     try:
-        response = cognito_client.initiate_auth(
+        response = await _cognito_call(
+            'initiate_auth',
             ClientId=APP_CLIENT_ID,
             AuthFlow='USER_PASSWORD_AUTH',
             AuthParameters={
@@ -53,13 +91,14 @@ def login_user(email, password):
     except ClientError as e:
         return {"error": e.response['Error']['Message']}
 
-def change_cognito_password(access_token: str, old_password: str, new_password: str) -> None:
+async def change_cognito_password(access_token: str, old_password: str, new_password: str) -> None:
     """
     Communicates with AWS Cognito to change the user's password using their active Access Token.
     Raises FastAPI HTTPExceptions if Cognito rejects the request.
     """
     try:
-        cognito_client.change_password(
+        await _cognito_call(
+            'change_password',
             PreviousPassword=old_password,
             ProposedPassword=new_password,
             AccessToken=access_token
@@ -73,46 +112,37 @@ def change_cognito_password(access_token: str, old_password: str, new_password:
         
     except cognito_client.exceptions.LimitExceededException:
         raise HTTPException(status_code=429, detail="Too many attempts. Please try again later.")
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Cognito Change Password Error: {e}")
         raise HTTPException(status_code=500, detail="An error occurred while changing your password.")
 
-keys = []
-if not USER_POOL_ID or not APP_CLIENT_ID:
-    print("CRITICAL WARNING: COGNITO_USER_POOL_ID or COGNITO_APP_CLIENT_ID is missing from your .env file!")
-else:
-    # Build the URL where Cognito stores your public keys
-    KEYS_URL = f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
-    
-    try:
-        # Fetch the keys once when the server starts
-        with urllib.request.urlopen(KEYS_URL) as response:
-            keys = json.loads(response.read().decode('utf-8'))['keys']
-        print("SUCCESS: Cognito security keys loaded properly.")
-    except Exception as e:
-        print(f"CRITICAL ERROR FETCHING COGNITO KEYS: {e}")
 security_scheme = HTTPBearer()
 
 def verify_cognito_token(credentials: HTTPAuthorizationCredentials = Security(security_scheme)):
     """
     Validates the JWT token provided in the Authorization header.
     """
-    if not keys:
-        raise HTTPException(status_code=500, detail="Cognito keys were not loaded properly on server startup.")
-
     token = credentials.credentials
-    
+
+    # Hot path: this exact token was already verified and has not expired
+    cached_claims = claims_cache.get(token)
+    if cached_claims is not None:
+        return cached_claims
+
     try:
         headers = jwt.get_unverified_headers(token)
         kid = headers['kid']
 
-        # Find the matching public key
-        key_index = next((i for i, k in enumerate(keys) if k['kid'] == kid), -1)
-        if key_index == -1:
+        # Look up the pre-constructed public key (refetches the JWKS once on an unknown kid)
+        public_key = key_store.get_key(kid)
+        if public_key is None:
+            if not key_store.has_keys:
+                raise HTTPException(status_code=503, detail="Cognito keys are not available yet. Please retry shortly.")
             raise HTTPException(status_code=401, detail="Public key not found in JWKS")
 
-        public_key = jwk.construct(keys[key_index])
         message, encoded_signature = str(token).rsplit('.', 1)
         decoded_signature = base64url_decode(encoded_signature.encode('utf-8'))
         if not public_key.verify(message.encode("utf8"), decoded_signature):
@@ -124,8 +154,15 @@ def verify_cognito_token(credentials: HTTPAuthorizationCredentials = Security(se
         verified_audience = claims.get('client_id') or claims.get('aud')
         if verified_audience != APP_CLIENT_ID:
             raise HTTPException(status_code=401, detail="Token was not issued for this audience")
+
+        if float(claims.get('exp', 0)) <= time.time():
+            raise HTTPException(status_code=401, detail="Token has expired")
+
+        claims_cache.put(token, claims)
         return claims 
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid authentication credentials: {str(e)}")
 
@@ -135,7 +172,6 @@ def require_role(required_role: str):
     """
     def role_checker(claims: dict = Depends(verify_cognito_token)):
         user_role = claims.get('custom:role')
-        print(user_role)
         if user_role != required_role:
             raise HTTPException(
                 status_code=403, 
@@ -144,25 +180,40 @@ def require_role(required_role: str):
         return claims
         
     return role_checker
-def confirm_sign_up(email: str, code: str):
+
+optional_security_scheme = HTTPBearer(auto_error=False)
+
+def optional_cognito_claims(credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security_scheme)) -> Optional[dict]:
+    """
+    Claims of the signed-in caller, or None when no token was sent (public
+    screens such as the waiting-room board). A token that is sent must be valid.
+    """
+    if credentials is None:
+        return None
+    return verify_cognito_token(credentials)
+async def confirm_sign_up(email: str, code: str):
     """
     Business Logic: Talks directly to AWS Cognito to verify the code.
     """
     try:
-        response = cognito_client.confirm_sign_up(
+        response = await _cognito_call(
+            'confirm_sign_up',
             ClientId=os.getenv("COGNITO_APP_CLIENT_ID"),
             Username=email,
             ConfirmationCode=code
         )
         return response
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"AWS Verification Error: {e}")
         # We raise the HTTP exception here so the router can just catch it seamlessly
         raise HTTPException(status_code=400, detail="Invalid or expired verification code.")
-def update_password_via_admin(username, old_password, new_password):
+async def update_password_via_admin(username, old_password, new_password):
     try:
         # This call will now succeed because of the change you made in the screenshot
-        cognito_client.admin_initiate_auth(
+        await _cognito_call(
+            'admin_initiate_auth',
             UserPoolId=USER_POOL_ID,
             ClientId=APP_CLIENT_ID,
             AuthFlow='ADMIN_NO_SRP_AUTH',
@@ -172,7 +223,8 @@ def update_password_via_admin(username, old_password, new_password):
             }
         )
 
-        cognito_client.admin_set_user_password(
+        await _cognito_call(
+            'admin_set_user_password',
             UserPoolId=USER_POOL_ID,
             Username=username,
             Password=new_password,
@@ -187,13 +239,14 @@ def update_password_via_admin(username, old_password, new_password):
         raise HTTPException(status_code=400, detail=e.response['Error']['Message'])
 import botocore.exceptions
 
-def trigger_cognito_resend(email: str):
+async def trigger_cognito_resend(email: str):
     """
     Business Logic: Triggers Cognito to send a new verification code.
     """
     try:
         # Use APP_CLIENT_ID which was initialized at the top of your file
-        response = cognito_client.resend_confirmation_code(
+        response = await _cognito_call(
+            'resend_confirmation_code',
             ClientId=APP_CLIENT_ID,
             Username=email
         )
@@ -215,6 +268,8 @@ def trigger_cognito_resend(email: str):
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="User is already confirmed or access denied."
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Resend Error: {e}")
         raise HTTPException(
@@ -0,0 +1,123 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import boto3
+from botocore.config import Config
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REGION = os.getenv("AWS_DEFAULT_REGION", "us-east-1")
+
+# --- TABLE NAMES (override per environment) ---
+APPOINTMENTS_TABLE = os.getenv("APPOINTMENTS_TABLE", "DrDecideAppointments")
+CARE_PLANS_TABLE = os.getenv("CARE_PLANS_TABLE", "DrDecideCarePlans")  # Legacy layout; migrate_care_plans.py copies it into the history table
+CARE_PLAN_HISTORY_TABLE = os.getenv("CARE_PLAN_HISTORY_TABLE", "DrDecideCarePlanHistory")
+NOTIFICATIONS_TABLE = os.getenv("NOTIFICATIONS_TABLE", "DrDecideNotifications")
+DOCTORS_TABLE = os.getenv("DOCTORS_TABLE", "DrDecideDoctors")
+PATIENTS_TABLE = os.getenv("PATIENTS_TABLE", "DrDecidePatients")
+RECEPTIONISTS_TABLE = os.getenv("RECEPTIONISTS_TABLE", "DrDecideReceptionists")
+QUEUE_TABLE = os.getenv("QUEUE_TABLE", "DrDecideQueue")  # Legacy single-bucket queue, no longer written
+CLINIC_QUEUE_TABLE = os.getenv("CLINIC_QUEUE_TABLE", "DrDecideClinicQueue")
+QUEUE_COUNTERS_TABLE = os.getenv("QUEUE_COUNTERS_TABLE", "DrDecideQueueCounters")
+QUEUE_SUMMARIES_TABLE = os.getenv("QUEUE_SUMMARIES_TABLE", "DrDecideQueueSummaries")
+ADHERENCE_LOGS_TABLE = os.getenv("ADHERENCE_LOGS_TABLE", "DrDecideAdherenceLogs")
+ADHERENCE_SUMMARIES_TABLE = os.getenv("ADHERENCE_SUMMARIES_TABLE", "DrDecideAdherenceSummaries")
+DOCTOR_STATS_TABLE = os.getenv("DOCTOR_STATS_TABLE", "DrDecideDoctorStats")
+
+# One tuned config shared by every client: a pool big enough for the request
+# concurrency, keep-alive to reuse TLS connections, and bounded timeouts/retries.
+CLIENT_CONFIG = Config(
+    region_name=REGION,
+    max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50")),
+    tcp_keepalive=True,
+    connect_timeout=float(os.getenv("AWS_CONNECT_TIMEOUT_SECONDS", "3")),
+    read_timeout=float(os.getenv("AWS_READ_TIMEOUT_SECONDS", "10")),
+    retries={
+        "mode": os.getenv("AWS_RETRY_MODE", "standard"),
+        "max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", "4"))
+    }
+)
+
+# Model invocations legitimately take longer than a DynamoDB read
+SERVICE_CONFIG_OVERRIDES = {
+    "bedrock-runtime": Config(read_timeout=60),
+}
+
+# Services pinned to their own region. SMS has always gone out through AWS_REGION
+# (us-east-1 if unset), independently of AWS_DEFAULT_REGION used for the rest.
+SERVICE_REGIONS = {
+    "sns": os.getenv("AWS_REGION", "us-east-1"),
+}
+
+_session = boto3.session.Session(region_name=REGION)
+_lock = threading.Lock()
+_clients: Dict[str, object] = {}
+_tables: Dict[str, object] = {}
+_dynamodb = None
+
+
+def get_client(service_name: str):
+    """
+    Returns the process-wide client for `service_name` (boto3 clients are thread-safe).
+    """
+    if service_name == "dynamodb":
+        # Share the resource's connection pool instead of opening a second one
+        return get_dynamodb().meta.client
+
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                config = CLIENT_CONFIG
+                if service_name in SERVICE_CONFIG_OVERRIDES:
+                    config = config.merge(SERVICE_CONFIG_OVERRIDES[service_name])
+                client = _session.client(service_name, region_name=SERVICE_REGIONS.get(service_name, REGION), config=config)
+                _clients[service_name] = client
+    return client
+
+
+def get_dynamodb():
+    """
+    Returns the single DynamoDB resource, built on the pooled client.
+    """
+    global _dynamodb
+    if _dynamodb is None:
+        with _lock:
+            if _dynamodb is None:
+                _dynamodb = _session.resource("dynamodb", config=CLIENT_CONFIG)
+    return _dynamodb
+
+
+def get_table(table_name: str):
+    """
+    Returns a shared Table handle so routers never build their own resource.
+    """
+    table = _tables.get(table_name)
+    if table is None:
+        table = get_dynamodb().Table(table_name)
+        _tables[table_name] = table
+    return table
+
+
+def prewarm(connections: int = None) -> None:
+    """
+    Opens `connections` keep-alive connections to DynamoDB before the first
+    request arrives, so the first users don't pay for DNS + TLS handshakes.
+    Failures are logged and ignored; the app still works cold.
+    """
+    connections = connections or int(os.getenv("AWS_PREWARM_CONNECTIONS", "4"))
+    client = get_dynamodb().meta.client
+
+    def _touch(_):
+        try:
+            client.describe_limits()
+        except Exception as e:
+            print(f"AWS prewarm warning: {e}")
+
+    # Concurrent calls force the pool to open several connections, not just one
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        list(pool.map(_touch, range(connections)))
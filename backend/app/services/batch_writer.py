@@ -0,0 +1,219 @@
+import asyncio
+import os
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+# BatchWriteItem accepts at most 25 puts per request
+MAX_BATCH_SIZE = 25
+
+# DynamoDB errors that come back the same however often the write is repeated
+# (e.g. a GSI key written as ""): one bad item fails its whole batch
+PERMANENT_ERROR_CODES = {
+    "ValidationException",
+    "SerializationException",
+    "ResourceNotFoundException",
+    "AccessDeniedException",
+    "ItemCollectionSizeLimitExceededException",
+}
+
+
+def is_permanent_error(error: BaseException) -> bool:
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in PERMANENT_ERROR_CODES
+    # boto3 refuses to serialize the item before sending anything (floats, empty sets...)
+    return isinstance(error, (TypeError, ValueError))
+
+
+class CoalescingWriter:
+    """
+    Buffers item writes for a short window and flushes them as batches.
+
+    Handlers hand items to `submit` and return without waiting; a background task
+    waits `window_seconds` after the first pending item (or until a full batch
+    is waiting) and writes everything buffered in batches of `max_batch`, all
+    batches concurrently. Items are keyed, so a second write of the same key
+    inside a window replaces the first instead of costing another write.
+
+    Batches that fail with a transient error (throttling, network) go back
+    into the buffer, and the writer backs off exponentially before the next
+    attempt; an item is given up after `max_attempts`. A batch rejected as
+    invalid is split and its items retried one by one, so a single bad item
+    can't hold back the rest; items that are invalid on their own are given
+    up at once. Given-up items are logged and kept in `dead_letters`.
+
+    `stop` flushes whatever is still pending, so a graceful shutdown loses
+    nothing; a crash can lose at most one window of writes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        key: Callable[[dict], str],
+        window_seconds: float = 0.05,
+        max_batch: int = MAX_BATCH_SIZE,
+        max_attempts: int = 5,
+        max_backoff_seconds: float = 2.0,
+        dead_letter_limit: int = 100
+    ):
+        self.name = name
+        self.key = key
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.max_backoff_seconds = max_backoff_seconds
+        self._flush: Optional[Callable[[List[dict]], Awaitable[None]]] = None
+        self._buffer: Dict[str, dict] = {}
+        self._attempts: Dict[str, int] = {}
+        self._backoff = 0.0
+        self.dead_letters: deque = deque(maxlen=dead_letter_limit)
+        self._wake = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.written = 0
+        self.failures = 0
+        self.dead_lettered = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, flush: Callable[[List[dict]], Awaitable[None]]) -> None:
+        """`flush(items)` must write up to `max_batch` items in one request."""
+        self._flush = flush
+        self._closing = False
+
+        async def writer_loop():
+            while not self._closing:
+                await self._wake.wait()
+                if not self._closing:
+                    try:
+                        await asyncio.wait_for(self._full.wait(), self.window_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                await self._drain()
+                if self._backoff and not self._closing:
+                    await asyncio.sleep(self._backoff)
+
+        self._task = asyncio.create_task(writer_loop())
+
+    async def stop(self) -> None:
+        # Let the loop finish its current flush rather than cancelling it mid-write
+        if self._task is not None:
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self._drain()  # One more attempt for anything a failed batch put back
+        if self._buffer:
+            print(f"{self.name}: {len(self._buffer)} writes could not be flushed on shutdown")
+
+    def submit(self, item: dict) -> bool:
+        """
+        Queues `item` for the next batch. Returns False when the background
+        writer isn't running (scripts, tests without the app lifespan); the
+        caller then writes the item itself.
+        """
+        if self._task is None:
+            return False
+        self.submitted += 1
+        key = self.key(item)
+        if key in self._buffer:
+            self.coalesced += 1
+        self._buffer[key] = item
+        self._attempts.pop(key, None)  # A fresh write starts its own attempt count
+        self._wake.set()
+        if len(self._buffer) >= self.max_batch:
+            self._full.set()
+        return True
+
+    async def _drain(self) -> None:
+        self._wake.clear()
+        self._full.clear()
+        if not self._buffer or self._flush is None:
+            return
+        pending, self._buffer = self._buffer, {}
+        items = list(pending.values())
+        batches = [items[i:i + self.max_batch] for i in range(0, len(items), self.max_batch)]
+        results = await asyncio.gather(*(self._flush(batch) for batch in batches), return_exceptions=True)
+
+        isolated = []
+        for batch, result in zip(batches, results):
+            if not isinstance(result, BaseException):
+                self.flushes += 1
+                self.written += len(batch)
+                self._forget(batch)
+                continue
+            self.failures += 1
+            if is_permanent_error(result) and len(batch) > 1:
+                print(f"{self.name}: batch of {len(batch)} rejected, retrying its items one by one: {result}")
+                isolated.extend(batch)
+            else:
+                self._failed(batch, result)
+
+        if isolated:
+            results = await asyncio.gather(*(self._flush([item]) for item in isolated), return_exceptions=True)
+            for item, result in zip(isolated, results):
+                if isinstance(result, BaseException):
+                    self._failed([item], result)
+                else:
+                    self.flushes += 1
+                    self.written += 1
+                    self._forget([item])
+
+        if self._buffer:
+            # Transient failures: wait longer after each one, up to max_backoff_seconds
+            worst = max((self._attempts.get(k, 0) for k in self._buffer), default=0)
+            self._backoff = min(self.window_seconds * (2 ** worst), self.max_backoff_seconds)
+            self._wake.set()
+        else:
+            self._backoff = 0.0
+
+    def _forget(self, items: List[dict]) -> None:
+        for item in items:
+            self._attempts.pop(self.key(item), None)
+
+    def _failed(self, items: List[dict], error: BaseException) -> None:
+        permanent = is_permanent_error(error)
+        retried = 0
+        for item in items:
+            key = self.key(item)
+            attempts = self._attempts.get(key, 0) + 1
+            if key in self._buffer:
+                # A newer write of the same key arrived meanwhile; it replaces this one
+                continue
+            if permanent or attempts >= self.max_attempts:
+                self._attempts.pop(key, None)
+                self.dead_lettered += 1
+                self.dead_letters.append({"key": key, "item": item, "error": str(error)})
+                print(f"{self.name}: giving up on {key} after {attempts} attempt(s): {error}")
+                continue
+            self._attempts[key] = attempts
+            self._buffer[key] = item
+            retried += 1
+        if retried:
+            print(f"{self.name}: {retried} write(s) failed, retrying after a backoff: {error}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._buffer),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "written": self.written,
+            "failures": self.failures,
+            "dead_lettered": self.dead_lettered,
+            "backoff_seconds": self._backoff,
+        }
+
+
+adherence_log_writer = CoalescingWriter(
+    "adherence-logs",
+    key=lambda log: log["log_id"],
+    window_seconds=float(os.getenv("ADHERENCE_LOG_FLUSH_MS", "50")) / 1000
+)
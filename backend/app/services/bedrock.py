@@ -1,7 +1,7 @@
-import boto3
 import json
+from app.services.aws import get_client
 
-bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-east-1')
+bedrock_runtime = get_client('bedrock-runtime')
 
 def generate_comprehensive_care_plan(details: dict) -> dict:
     """
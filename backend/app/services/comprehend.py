@@ -1,7 +1,7 @@
-import boto3
+from app.services.aws import get_client
 
-# Initialize the AWS Comprehend Medical client
-client = boto3.client('comprehendmedical', region_name='us-east-1')
+# Shared AWS Comprehend Medical client
+client = get_client('comprehendmedical')
 
 def extract_medical_entities(text: str):
     """
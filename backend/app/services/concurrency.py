@@ -0,0 +1,39 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class BoundedExecutor:
+    """
+    Runs blocking SDK calls (boto3, etc.) off the event loop on a dedicated
+    thread pool, with a cap on in-flight calls and a per-call timeout.
+
+    Each backend gets its own instance so a slow dependency can only exhaust
+    its own threads, never the loop or another dependency's pool.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_concurrency: Optional[int] = None, default_timeout: Optional[float] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore = asyncio.Semaphore(max_concurrency or max_workers)
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Awaits `fn(*args, **kwargs)` on the pool. Waiting for a free slot counts
+        against the timeout, so callers are never queued indefinitely.
+        Raises asyncio.TimeoutError when the call does not finish in time.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+
+        async def _bounded_call():
+            async with self._semaphore:
+                return await loop.run_in_executor(self._executor, call)
+
+        return await asyncio.wait_for(_bounded_call(), timeout or self.default_timeout)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
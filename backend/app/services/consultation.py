@@ -0,0 +1,187 @@
+import asyncio
+import json
+import uuid
+from datetime import date, datetime
+from typing import Callable, Optional, Tuple
+
+from app.services import doctor_stats
+from app.services.aws import get_client
+from app.services.attachments import Attachment, gemini_part
+from app.services.gemini import gemini
+from app.services.plan_cache import generation_key, plan_cache
+
+# The stages of a consultation (AI plan -> save -> tell the patient), shared by
+# the synchronous /consultation endpoint and the background job pipeline.
+
+sns_client = get_client('sns')
+
+FALLBACK_TASK_COUNT = 4
+FALLBACK_PLAN = {
+    "care_plan": {
+        "Morning": "Take prescribed medication after breakfast.",
+        "Afternoon": "Rest and stay hydrated.",
+        "Evening": "Monitor temperature and log symptoms.",
+        "Night": "Get a full 8 hours of sleep."
+    },
+    "summarization": [
+        "Patient evaluated for reported symptoms.",
+        "Standard recovery protocol initiated.",
+        "Follow up if symptoms worsen after 48 hours."
+    ]
+}
+
+
+def build_prompt(medical_history_text: str, current_examination: str, medicines_prescribed: str) -> str:
+    # Changing this text? Bump plan_cache.PROMPT_VERSION so cached plans from the old prompt stop matching
+    return f"""
+    You are an expert medical AI assistant. Analyze these doctor's notes and the attached medical records (if any).
+    Translate them into simple, patient-friendly language.
+
+    You MUST output your response STRICTLY as a JSON object with two exact keys: "care_plan" and "summarization".
+    Do not include markdown like ```json.
+
+    Format requirements:
+    1. "care_plan": A dictionary with keys "Morning", "Afternoon", "Evening", and "Night". Each value should be a short, 1-sentence instruction.
+    2. "summarization": A list of 3 short bullet points summarizing the visit, diagnosis, and next steps in plain English.
+
+    Doctor's Notes:
+    Manual Medical History: {medical_history_text}
+    Diagnosis & Examination: {current_examination}
+    Prescribed Medicines: {medicines_prescribed}
+    """
+
+
+async def generate_care_plan(
+    current_examination: str,
+    medicines_prescribed: str,
+    medical_history_text: str,
+    attachment: Optional[Attachment] = None,
+    on_text: Optional[Callable[[str], None]] = None
+) -> Tuple[str, int]:
+    """
+    Asks Gemini for the plan, or reuses the answer to an identical
+    consultation (see plan_cache). Returns (plan JSON string, daily task count).
+    Raises on timeouts, API errors and unparseable output; callers decide
+    whether to retry or use `fallback_care_plan`.
+
+    With `on_text`, the model's output is streamed and handed over chunk by
+    chunk as it arrives. A cached or shared answer arrives whole, with no
+    chunks at all.
+    """
+    key = generation_key(
+        current_examination, medicines_prescribed, medical_history_text, attachment.digest if attachment else ""
+    )
+
+    async def call_model(gemini_contents: list) -> str:
+        # Shared client, async call: other requests keep being served while Gemini thinks
+        # (Force JSON output schema if you want to be extra safe, but this works well)
+        config = {"response_mime_type": "application/json"}
+        if on_text is None:
+            response = await gemini.generate(contents=gemini_contents, config=config)
+            return response.text
+        text = ""
+        async for chunk in gemini.stream(contents=gemini_contents, config=config):
+            text += chunk
+            on_text(chunk)
+        return text
+
+    async def generate() -> Tuple[str, int]:
+        # 1. Build the Multi-Modal Payload for Gemini (big attachments go by Files API reference)
+        prompt = build_prompt(medical_history_text, current_examination, medicines_prescribed)
+        if attachment:
+            async with gemini_part(attachment) as part:
+                ai_simplified_plan = await call_model([prompt, part])
+        else:
+            ai_simplified_plan = await call_model([prompt])
+
+        # 2. Parse the JSON string to count the exact number of daily tasks!
+        # (Parsing before caching keeps malformed answers out of the cache)
+        parsed_plan = json.loads(ai_simplified_plan)
+        daily_task_count = len(parsed_plan.get("care_plan", {}).keys()) # Usually 4
+        return ai_simplified_plan, daily_task_count
+
+    return await plan_cache.get_or_generate(key, generate)
+
+
+def fallback_care_plan() -> Tuple[str, int]:
+    return json.dumps(FALLBACK_PLAN), FALLBACK_TASK_COUNT
+
+
+def build_care_plan_record(
+    doctor_id: str,
+    doctor_email: str,
+    patient_id: str,
+    appointment_id: str,
+    current_examination: str,
+    medicines_prescribed: str,
+    follow_up_date: str,
+    follow_up_details: str,
+    medical_history_text: str,
+    attachment: Optional[Attachment],
+    simplified_plan: str,
+    daily_task_count: int
+) -> dict:
+    return {
+        'patient_id': patient_id,
+        'appointment_id': appointment_id,
+        'doctor_id': doctor_id,
+        'doctor_email': doctor_email,
+        'raw_medical_history': medical_history_text,
+        # Name, type, size and SHA-256 of the upload, so the file can be matched later
+        **(attachment.metadata() if attachment else {'file_attached': "None"}),
+        'raw_examination': current_examination,
+        'medicines_prescribed': medicines_prescribed,
+        'simplified_plan': simplified_plan,
+
+        # The 3 fields required for the Adherence Tracking Math!
+        'created_at': date.today().isoformat(),
+        'follow_up_date': follow_up_date, # Expected format: "2026-03-21"
+        'daily_task_count': daily_task_count,
+
+        'follow_up_reminder': follow_up_details,
+        'status': 'Active' # Set to active so it shows up on the dashboard
+    }
+
+
+async def save_care_plan(repo, record: dict) -> None:
+    await repo.put_care_plan(record)
+    await doctor_stats.record_care_plan(repo, record['doctor_id'])
+
+
+async def create_notification(repo, patient_id: str, doctor_email: str) -> None:
+    """In-app notification for the patient dashboard. Raises if the write fails."""
+    await repo.put_notification({
+        'notification_id': f"NOTIF-{uuid.uuid4().hex[:6].upper()}",
+        'patient_id': patient_id,
+        'message': f"Care plan updated by Dr. {doctor_email.split('@')[0]}. New daily tasks added.",
+        'timestamp': datetime.utcnow().isoformat(),
+        'status': 'Unread'
+    })
+
+
+async def send_sms(phone_number: str) -> None:
+    """Best effort: SMS failures are logged, never raised."""
+    if not phone_number:
+        return
+    try:
+        sms_message = "Hi! Dr. Decide has finished your consultation. Check the app to view your simplified care instructions."
+        # boto3 is blocking; keep it off the event loop
+        await asyncio.to_thread(sns_client.publish, PhoneNumber=phone_number, Message=sms_message)
+        print(f"SMS successfully sent to {phone_number}")
+    except Exception as e:
+        print(f"Amazon SNS Error: {e}")
+
+
+def care_plan_response(record: dict, status: str) -> dict:
+    """Fields of CarePlanResponse for a saved record."""
+    return {
+        "doctor_id": record['doctor_id'],
+        "patient_id": record['patient_id'],
+        "appointment_id": record['appointment_id'],
+        "simplified_plan": record['simplified_plan'],
+        "follow_up_reminder": record['follow_up_reminder'],
+        "status": status,
+        "created_at": record['created_at'],
+        "follow_up_date": record['follow_up_date'],
+        "daily_task_count": record['daily_task_count']
+    }
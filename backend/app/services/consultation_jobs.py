@@ -0,0 +1,437 @@
+import asyncio
+import json
+import os
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from app.repository.base import new_care_plan_sort_key
+from app.services import consultation
+from app.services.attachments import Attachment
+from app.services.concurrency import BoundedExecutor
+from app.services.queue_events import QueueBroadcaster
+
+# Job status doubles as the stage it is in
+QUEUED = "queued"
+GENERATING = "generating"
+SAVING = "saving"
+NOTIFYING = "notifying"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATUSES = (DONE, FAILED)
+
+JOB_SUCCESS_STATUS = "Success - Saved to DB, AI Generated, & SMS Sent!"
+
+
+JOB_COLUMNS = (
+    "job_id, doctor_id, status, attempts, request, file_name, file_type, file_path, file_size, file_sha256,"
+    " record, result, error, created_at, updated_at"
+)
+
+
+class JobQueueFull(Exception):
+    """Too many consultations are already waiting; the doctor should retry shortly."""
+
+
+def remove_file(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Could not remove consultation attachment {path}: {e}")
+
+
+class JobStore:
+    """
+    Consultation jobs in a local SQLite file: the request, where the attachment
+    waits on disk until the plan is generated, the care-plan record once built,
+    and the outcome. Keeping them on disk means queued work survives a restart.
+
+    Not thread-safe on its own; the pipeline calls it from a single-thread
+    executor, which also serializes writes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS consultation_jobs (
+            job_id TEXT PRIMARY KEY,
+            doctor_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            request TEXT NOT NULL,
+            file_name TEXT,
+            file_type TEXT,
+            file_path TEXT,
+            file_size INTEGER,
+            file_sha256 TEXT,
+            record TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS consultation_jobs_doctor ON consultation_jobs (doctor_id, created_at);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        # Files used to be stored inline (file_bytes); add the columns that replaced them
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(consultation_jobs)")}
+        for column, kind in (("file_path", "TEXT"), ("file_size", "INTEGER"), ("file_sha256", "TEXT")):
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE consultation_jobs ADD COLUMN {column} {kind}")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def insert(self, job: dict) -> None:
+        columns = ", ".join(job)
+        placeholders = ", ".join("?" for _ in job)
+        self._conn.execute(f"INSERT INTO consultation_jobs ({columns}) VALUES ({placeholders})", list(job.values()))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn.execute(f"SELECT {JOB_COLUMNS} FROM consultation_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._conn.execute(f"UPDATE consultation_jobs SET {assignments} WHERE job_id = ?", [*fields.values(), job_id])
+
+    def list_for_doctor(self, doctor_id: str, limit: int) -> List[dict]:
+        rows = self._conn.execute(
+            f"SELECT {JOB_COLUMNS} FROM consultation_jobs WHERE doctor_id = ? ORDER BY created_at DESC LIMIT ?",
+            (doctor_id, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def unfinished(self) -> List[str]:
+        """Jobs a previous run accepted but never finished, oldest first."""
+        rows = self._conn.execute(
+            "SELECT job_id FROM consultation_jobs WHERE status NOT IN (?, ?) ORDER BY created_at",
+            FINISHED_STATUSES
+        ).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def file_paths(self) -> List[str]:
+        """Attachments still referenced by a job."""
+        rows = self._conn.execute("SELECT file_path FROM consultation_jobs WHERE file_path IS NOT NULL").fetchall()
+        return [row["file_path"] for row in rows]
+
+    def prune(self, finished_before: str) -> int:
+        """Deletes finished jobs older than the cutoff, and any attachment they still hold."""
+        where = "status IN (?, ?) AND updated_at < ?"
+        params = (*FINISHED_STATUSES, finished_before)
+        for row in self._conn.execute(f"SELECT file_path FROM consultation_jobs WHERE {where} AND file_path IS NOT NULL", params):
+            remove_file(row["file_path"])
+        return self._conn.execute(f"DELETE FROM consultation_jobs WHERE {where}", params).rowcount
+
+
+def job_view(job: dict) -> dict:
+    """What the doctor's screen sees of a job (never the attachment itself)."""
+    request = json.loads(job["request"])
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "patient_id": request.get("patient_id"),
+        "appointment_id": request.get("appointment_id"),
+        "file_attached": job.get("file_name") or "None",
+        "error": job.get("error"),
+        "result": json.loads(job["result"]) if job.get("result") else None,
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+class ConsultationPipeline:
+    """
+    Runs consultations in the background: the doctor's request is stored and
+    answered with a job id straight away, and a fixed pool of workers takes
+    each job through generate -> save -> notify.
+
+    Each stage is retried with exponential backoff. Generation falls back to
+    the default plan after its last attempt (as the synchronous endpoint
+    does); a plan that can't be saved fails the job; a notification that
+    can't be written is only logged, since the plan is already saved. The
+    care-plan record, including its sort key, is stored before saving, so a
+    retried or resumed save overwrites the same item.
+
+    Progress is pushed to the doctor's open job streams through an in-process
+    broadcaster keyed by doctor_id. Like the queue board, that is per process;
+    run the API as a single worker process (as the Dockerfile does) so jobs,
+    status and events all live in the same place. Jobs interrupted by a
+    shutdown are picked up again on the next start.
+    """
+
+    def __init__(self, store: JobStore, attachments_dir: str, workers: int, max_pending: int, max_attempts: int, retry_seconds: float, retention_hours: float):
+        self.store = store
+        self.attachments_dir = attachments_dir
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.retention_hours = retention_hours
+        self.events = QueueBroadcaster(max_pending=50)
+        self._db: Optional[BoundedExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.repo = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.fallbacks = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, repo) -> None:
+        self.repo = repo
+        # One thread, so SQLite only ever sees one caller at a time
+        self._db = BoundedExecutor("consultation-jobs", max_workers=1, default_timeout=10)
+        await self._db.run(self.store.open)
+        cutoff = (datetime.utcnow() - timedelta(hours=self.retention_hours)).isoformat()
+        pruned = await self._db.run(self.store.prune, cutoff)
+        await self._remove_orphaned_files()
+        self._queue = asyncio.Queue()
+        resumed = await self._db.run(self.store.unfinished)
+        for job_id in resumed:
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"SUCCESS: Consultation pipeline started ({len(resumed)} jobs resumed, {pruned} old jobs pruned).")
+
+    async def stop(self) -> None:
+        if self._db is None:
+            return
+        # In-flight jobs keep their stage in the store and resume on the next start
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.events.close()
+        await self._db.run(self.store.close)
+        self._db.shutdown()
+        self._db = None
+
+    async def _remove_orphaned_files(self) -> None:
+        """Attachments no job points at (e.g. the process died between saving the file and the job)."""
+        if not os.path.isdir(self.attachments_dir):
+            return
+        referenced = {os.path.abspath(p) for p in await self._db.run(self.store.file_paths)}
+        for name in os.listdir(self.attachments_dir):
+            path = os.path.join(self.attachments_dir, name)
+            if os.path.isfile(path) and os.path.abspath(path) not in referenced:
+                print(f"Removing orphaned consultation attachment {path}")
+                await asyncio.to_thread(remove_file, path)
+
+    async def submit(self, doctor_id: str, request: dict, attachment: Optional[Attachment] = None) -> dict:
+        """
+        Stores the consultation and queues it; the attachment is moved into
+        `attachments_dir` so it outlives the request. Raises JobQueueFull when
+        `max_pending` jobs are already waiting, RuntimeError when the pipeline
+        isn't running.
+        """
+        if not self.running:
+            raise RuntimeError("Consultation pipeline is not running.")
+        if self._queue.qsize() >= self.max_pending:
+            raise JobQueueFull(f"{self._queue.qsize()} consultations are already waiting.")
+
+        now = datetime.utcnow().isoformat()
+        job_id = f"JOB-{uuid.uuid4().hex[:12].upper()}"
+        job = {
+            "job_id": job_id,
+            "doctor_id": doctor_id,
+            "status": QUEUED,
+            "attempts": 0,
+            "request": json.dumps(request),
+            "created_at": now,
+            "updated_at": now,
+        }
+        if attachment:
+            await asyncio.to_thread(attachment.persist, self.attachments_dir, job_id)
+            job.update(
+                file_name=attachment.filename,
+                file_type=attachment.mime_type,
+                file_path=attachment.path,
+                file_size=attachment.size,
+                file_sha256=attachment.sha256
+            )
+        try:
+            await self._db.run(self.store.insert, job)
+        except Exception:
+            # No job will ever point at the persisted file
+            if attachment:
+                await asyncio.to_thread(attachment.close)
+            raise
+        self._queue.put_nowait(job["job_id"])
+        self.submitted += 1
+        view = job_view(job)
+        self.events.publish(doctor_id, {"type": "job", **view})
+        return view
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        if not self.running:
+            raise RuntimeError("Consultation pipeline is not running.")
+        job = await self._db.run(self.store.get, job_id)
+        return dict(job_view(job), doctor_id=job["doctor_id"]) if job else None
+
+    async def list_for_doctor(self, doctor_id: str, limit: int = 20) -> List[dict]:
+        if not self.running:
+            raise RuntimeError("Consultation pipeline is not running.")
+        return [job_view(job) for job in await self._db.run(self.store.list_for_doctor, doctor_id, limit)]
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+            except Exception as e:
+                # A broken job must not take the worker down with it
+                print(f"Consultation job {job_id} crashed: {e}")
+                try:
+                    await self._fail(job_id, str(e))
+                except Exception as inner_e:
+                    print(f"Consultation job {job_id} could not be marked failed: {inner_e}")
+
+    async def _set(self, job_id: str, status: str, **fields) -> None:
+        await self._db.run(self.store.update, job_id, status=status, **fields)
+        job = await self._db.run(self.store.get, job_id)
+        self.events.publish(job["doctor_id"], {"type": "job", **job_view(job)})
+
+    async def _fail(self, job_id: str, error: str) -> None:
+        """Marks the job failed; a failed job is never retried, so its attachment goes too."""
+        job = await self._db.run(self.store.get, job_id)
+        if job and job["file_path"]:
+            await asyncio.to_thread(remove_file, job["file_path"])
+        await self._set(job_id, FAILED, error=error, file_path=None)
+        self.failed += 1
+
+    async def _with_retries(self, job_id: str, stage: str, call: Callable[[], Awaitable]):
+        attempt = 1
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                if attempt >= self.max_attempts:
+                    raise
+                self.retries += 1
+                print(f"Consultation job {job_id}: {stage} attempt {attempt} failed, retrying: {e}")
+                await self._db.run(self.store.update, job_id, attempts=attempt, error=f"{stage}: {e}")
+                await asyncio.sleep(self.retry_seconds * 2 ** (attempt - 1))
+                attempt += 1
+
+    async def _process(self, job_id: str) -> None:
+        job = await self._db.run(self.store.get, job_id)
+        if job is None or job["status"] in FINISHED_STATUSES:
+            return
+        request = json.loads(job["request"])
+        attachment = None
+        if job["file_path"]:
+            attachment = Attachment.from_path(
+                job["file_path"], job["file_name"], job["file_type"], job["file_size"], job["file_sha256"]
+            )
+
+        # 1. Generate the plan, unless a previous run already got that far
+        if job["record"]:
+            record = json.loads(job["record"])
+        else:
+            await self._set(job_id, GENERATING)
+            try:
+                ai_simplified_plan, daily_task_count = await self._with_retries(
+                    job_id, GENERATING,
+                    lambda: consultation.generate_care_plan(
+                        request["current_examination"], request["medicines_prescribed"], request["medical_history_text"],
+                        attachment
+                    )
+                )
+                print(f"✅ Gemini Care Plan Generated for {job_id}")
+            except Exception as e:
+                print(f"Gemini Error: {e}")
+                self.fallbacks += 1
+                ai_simplified_plan, daily_task_count = consultation.fallback_care_plan()
+
+            record = consultation.build_care_plan_record(
+                doctor_id=job["doctor_id"],
+                doctor_email=request["doctor_email"],
+                patient_id=request["patient_id"],
+                appointment_id=request["appointment_id"],
+                current_examination=request["current_examination"],
+                medicines_prescribed=request["medicines_prescribed"],
+                follow_up_date=request["follow_up_date"],
+                follow_up_details=request["follow_up_details"],
+                medical_history_text=request["medical_history_text"],
+                attachment=attachment,
+                simplified_plan=ai_simplified_plan,
+                daily_task_count=daily_task_count
+            )
+            # Fixed up front so every save attempt writes the same history item
+            record["plan_sk"] = new_care_plan_sort_key(record)
+            # The attachment isn't needed once the plan exists
+            await self._db.run(self.store.update, job_id, record=json.dumps(record), file_path=None)
+            if attachment:
+                await asyncio.to_thread(attachment.close)
+
+        # 2. Save the plan
+        if job["status"] != NOTIFYING:
+            await self._set(job_id, SAVING)
+            try:
+                await self._with_retries(job_id, SAVING, lambda: consultation.save_care_plan(self.repo, record))
+            except Exception as e:
+                await self._fail(job_id, f"Failed to save care plan to database: {e}")
+                return
+
+        # 3. Tell the patient (the plan is saved either way)
+        await self._set(job_id, NOTIFYING)
+        try:
+            await self._with_retries(
+                job_id, NOTIFYING,
+                lambda: consultation.create_notification(self.repo, request["patient_id"], request["doctor_email"])
+            )
+        except Exception as e:
+            print(f"Notification Save Error: {e}")
+        await consultation.send_sms(request.get("phone_number"))
+
+        self.completed += 1
+        await self._set(
+            job_id, DONE, error=None,
+            result=json.dumps(consultation.care_plan_response(record, JOB_SUCCESS_STATUS))
+        )
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": len(self._tasks),
+            "pending": self._queue.qsize() if self._queue else 0,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "streams": self.events.stats()["subscribers"],
+        }
+
+
+consultation_pipeline = ConsultationPipeline(
+    JobStore(os.getenv("CONSULTATION_JOBS_DB", "consultation_jobs.db")),
+    attachments_dir=os.getenv("CONSULTATION_ATTACHMENTS_DIR", "consultation_attachments"),
+    workers=int(os.getenv("CONSULTATION_WORKERS", "4")),
+    max_pending=int(os.getenv("CONSULTATION_MAX_PENDING", "100")),
+    max_attempts=int(os.getenv("CONSULTATION_MAX_ATTEMPTS", "3")),
+    retry_seconds=float(os.getenv("CONSULTATION_RETRY_SECONDS", "2")),
+    retention_hours=float(os.getenv("CONSULTATION_JOB_RETENTION_HOURS", "24"))
+)
@@ -1,15 +1,14 @@
-import boto3
 import time
+from app.services.aws import get_table, CARE_PLANS_TABLE
 
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-table_name = 'DrDecideCarePlans'
+table_name = CARE_PLANS_TABLE
 
 def store_care_plan(patient_id: str, raw_notes: str, plain_plan: str):
     """
     Stores the finalized care plan in Amazon DynamoDB.
     """
     try:
-        table = dynamodb.Table(table_name)
+        table = get_table(table_name)
         table.put_item(
             Item={
                 'patient_id': patient_id,
@@ -30,7 +29,7 @@ def get_patient_plan(patient_id: str):
     Fetches the patient's care plan from DynamoDB.
     """
     try:
-        table = dynamodb.Table(table_name)
+        table = get_table(table_name)
         # Assuming patient_id is the primary partition key
         response = table.get_item(Key={'patient_id': patient_id})
         return response.get('Item')
@@ -43,7 +42,7 @@ def update_adherence(patient_id: str):
     Increments the patient's adherence score in DynamoDB when they complete a task.
     """
     try:
-        table = dynamodb.Table(table_name)
+        table = get_table(table_name)
         # Atomically adds 1 to the adherence_score without reading it first
         response = table.update_item(
             Key={'patient_id': patient_id},
@@ -0,0 +1,123 @@
+import asyncio
+import math
+import os
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from app.services.utils import appointment_local_time, clinic_today
+
+# Per-doctor items in DrDecideDoctorStats (doctor_id + stat_key):
+#   TOTALS         total_appointments, care_plans_generated, total_patients, critical_alerts
+#   DAY#YYYY-MM-DD booked, completed, hour_HH (bookings per IST hour), all net of cancellations
+#   PATIENT#<id>   empty marker: the doctor has seen this patient (counted once in total_patients)
+TOTALS = "TOTALS"
+PATIENT_MARKER_PREFIX = "PATIENT#"
+
+# Bookings in these states don't take up a slot
+INACTIVE_STATUSES = {"Cancelled", "No-Show"}
+
+DEFAULT_DAILY_LIMIT = 20
+CLINIC_HOURS_PER_DAY = int(os.getenv("CLINIC_HOURS_PER_DAY", "8"))
+
+
+def day_key(day) -> str:
+    return f"DAY#{day.isoformat() if isinstance(day, date) else day}"
+
+
+def patient_marker_key(patient_id: str) -> str:
+    return f"{PATIENT_MARKER_PREFIX}{patient_id}"
+
+
+def hour_attribute(hour: int) -> str:
+    return f"hour_{hour:02d}"
+
+
+async def _safely(description: str, call) -> None:
+    # Counters are derived data: a failed update is logged, never fails the request
+    try:
+        await call
+    except Exception as e:
+        print(f"Doctor stats update failed ({description}): {e}")
+
+
+async def record_booking(repo, appointment: dict) -> None:
+    """
+    A new appointment: one more booking overall, for its day and for its hour,
+    and one more patient if this is the doctor's first booking with them.
+    """
+    doctor_id = appointment.get("doctor_id")
+    if not doctor_id:
+        return
+
+    async def update_totals():
+        counters = {"total_appointments": 1}
+        patient_id = appointment.get("patient_id")
+        if patient_id and await repo.add_doctor_patient(doctor_id, patient_id):
+            counters["total_patients"] = 1
+        await repo.increment_doctor_stats(doctor_id, TOTALS, counters)
+
+    updates = [update_totals()]
+    local = appointment_local_time(appointment.get("appointment_date"))
+    if local:
+        updates.append(repo.increment_doctor_stats(doctor_id, day_key(local.date()), {"booked": 1, hour_attribute(local.hour): 1}))
+    await _safely("booking", asyncio.gather(*updates))
+
+
+async def record_status_change(repo, previous: Optional[dict], new_status: str) -> None:
+    """
+    Adjusts the day's counters from the appointment as it was before the
+    update, so cancelling frees its hour and re-activating takes it back.
+    """
+    if not previous or not previous.get("doctor_id"):
+        return
+    old_status = previous.get("status")
+    local = appointment_local_time(previous.get("appointment_date"))
+    if old_status == new_status or not local:
+        return
+
+    counters: Dict[str, int] = {}
+    was_active, is_active = old_status not in INACTIVE_STATUSES, new_status not in INACTIVE_STATUSES
+    if was_active != is_active:
+        delta = 1 if is_active else -1
+        counters["booked"] = delta
+        counters[hour_attribute(local.hour)] = delta
+    if new_status == "Completed":
+        counters["completed"] = 1
+    elif old_status == "Completed":
+        counters["completed"] = -1
+
+    if counters:
+        await _safely("status change", repo.increment_doctor_stats(previous["doctor_id"], day_key(local.date()), counters))
+
+
+async def record_care_plan(repo, doctor_id: str) -> None:
+    await _safely("care plan", repo.increment_doctor_stats(doctor_id, TOTALS, {"care_plans_generated": 1}))
+
+
+async def record_critical_alerts(repo, doctor_id: str, count: int) -> None:
+    """Stores the latest number of patients whose adherence is Critical."""
+    await _safely("critical alerts", repo.set_doctor_stat(doctor_id, TOTALS, "critical_alerts", count))
+
+
+async def load_dashboard_stats(repo, doctor_id: str) -> Tuple[dict, dict]:
+    """Returns (totals, today's bucket) for the doctor in one batched read."""
+    today = day_key(clinic_today())
+    stats = await repo.get_doctor_stats(doctor_id, [TOTALS, today])
+    return stats.get(TOTALS, {}), stats.get(today, {})
+
+
+def hourly_capacity(day_stats: dict, daily_limit: int) -> List[dict]:
+    """Today's booked slots per IST hour, against the doctor's limit spread over clinic hours."""
+    hourly_limit = max(1, math.ceil(daily_limit / CLINIC_HOURS_PER_DAY))
+    slots = []
+    for name in sorted(k for k in day_stats if k.startswith("hour_")):
+        booked = int(day_stats[name])
+        if booked <= 0:
+            continue
+        hour = int(name[len("hour_"):])
+        slots.append({
+            "time": f"{hour % 12 or 12:02d}:00 {'AM' if hour < 12 else 'PM'}",
+            "booked": booked,
+            "limit": hourly_limit
+        })
+    return slots
@@ -0,0 +1,166 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Optional
+
+from google.genai import Client, types
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+
+class GeminiService:
+    """
+    One long-lived Gemini client for the whole process, called through its
+    async API (`client.aio`) so a 5-15 s generation never blocks the event loop.
+
+    A semaphore caps how many generations are in flight; waiting for a slot
+    counts against the per-call timeout (same as BoundedExecutor), so a
+    backlog of slow consultations fails fast instead of queueing forever.
+    Check-ins, logins and dashboards never wait on it at all.
+    """
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._client: Optional[Client] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.calls = 0
+        self.uploads = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    @property
+    def client(self) -> Client:
+        # Created on first use when the app lifespan didn't (scripts, tests)
+        if self._client is None:
+            self._client = Client(api_key=os.getenv("GEMINI_API_KEY"))
+        return self._client
+
+    def start(self) -> None:
+        """Builds the client (and its connection pool) before the first consultation."""
+        try:
+            self.client
+        except Exception as e:
+            # Missing key etc.: consultations fall back to the default plan until it's fixed
+            print(f"Gemini client not ready: {e}")
+
+    async def generate(self, contents: Any, config: Optional[dict] = None, model: str = GEMINI_MODEL, timeout: Optional[float] = None):
+        """
+        Awaits `generate_content` on the shared client.
+        Raises asyncio.TimeoutError when the call, including the wait for a slot, takes longer than the timeout.
+        """
+        self.calls += 1
+
+        async def _bounded_call():
+            async with self._semaphore:
+                self.in_flight += 1
+                try:
+                    return await self.client.aio.models.generate_content(model=model, contents=contents, config=config)
+                finally:
+                    self.in_flight -= 1
+
+        try:
+            return await asyncio.wait_for(_bounded_call(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+
+    async def stream(self, contents: Any, config: Optional[dict] = None, model: str = GEMINI_MODEL, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yields the text of `generate_content_stream` chunk by chunk, holding a
+        slot until the stream ends. The timeout covers the whole stream,
+        including the wait for a slot; raises asyncio.TimeoutError past it.
+        """
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+
+        def remaining() -> float:
+            return max(deadline - loop.time(), 0)
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), remaining())
+            self.in_flight += 1
+            try:
+                chunks = await asyncio.wait_for(
+                    self.client.aio.models.generate_content_stream(model=model, contents=contents, config=config),
+                    remaining()
+                )
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), remaining())
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        yield chunk.text
+            finally:
+                self.in_flight -= 1
+                self._semaphore.release()
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+
+    async def upload(self, path: str, mime_type: str, display_name: Optional[str] = None, timeout: Optional[float] = None) -> types.File:
+        """
+        Uploads a file from disk through the Files API and waits until Gemini
+        can use it. Raises asyncio.TimeoutError past the timeout.
+        """
+        async def _upload():
+            uploaded = await self.client.aio.files.upload(
+                file=path, config={"mime_type": mime_type, "display_name": display_name}
+            )
+            while uploaded.state == types.FileState.PROCESSING:
+                await asyncio.sleep(1)
+                uploaded = await self.client.aio.files.get(name=uploaded.name)
+            if uploaded.state == types.FileState.FAILED:
+                raise RuntimeError(f"Gemini could not process {display_name or path}")
+            return uploaded
+
+        self.uploads += 1
+        try:
+            return await asyncio.wait_for(_upload(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+
+    async def delete_file(self, name: str) -> None:
+        """Best effort: Gemini expires uploads by itself after 48 hours anyway."""
+        try:
+            await self.client.aio.files.delete(name=name)
+        except Exception as e:
+            print(f"Gemini file cleanup failed for {name}: {e}")
+
+    async def close(self) -> None:
+        if self._client is None:
+            return
+        try:
+            await self._client.aio.aclose()
+            self._client.close()
+        except Exception as e:
+            print(f"Gemini client close error: {e}")
+        self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "uploads": self.uploads,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+        }
+
+
+gemini = GeminiService(
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    timeout=float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+)
@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional
+
+from jose import jwk
+
+
+class JWKSKeyStore:
+    """
+    Holds the Cognito public keys indexed by `kid`, already constructed into
+    ready-to-verify key objects so a request never rebuilds an RSA key.
+
+    Keys come from the user pool's JWKS URL or, when `file_path` is set, from a
+    local JWKS file (offline development and tests). A daemon thread refreshes
+    them every `ttl_seconds`, and an unknown `kid` triggers a single-flight
+    refetch so a Cognito key rotation never requires a server restart.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        file_path: Optional[str] = None,
+        ttl_seconds: int = 3600,
+        min_refetch_interval: int = 30,
+        fetch_timeout: float = 5.0,
+    ):
+        self.url = url
+        self.file_path = file_path
+        self.ttl_seconds = ttl_seconds
+        self.min_refetch_interval = min_refetch_interval
+        self.fetch_timeout = fetch_timeout
+
+        self._keys: Dict[str, Any] = {}
+        self._fetch_lock = threading.Lock()
+        self._last_fetch_attempt = 0.0
+        self._loaded_at = 0.0
+        self._listeners: List[Callable[[], None]] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- LOADING ---
+
+    def _read_jwks(self) -> List[dict]:
+        if self.file_path:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                return json.load(f)["keys"]
+        if not self.url:
+            raise RuntimeError("No JWKS URL or file configured.")
+        with urllib.request.urlopen(self.url, timeout=self.fetch_timeout) as response:
+            return json.loads(response.read().decode("utf-8"))["keys"]
+
+    def load(self) -> bool:
+        """
+        Fetches the JWKS and atomically swaps in the constructed keys.
+        Returns False (keeping the previous keys) if the fetch fails.
+        """
+        self._last_fetch_attempt = time.monotonic()
+        try:
+            raw_keys = self._read_jwks()
+            new_keys = {k["kid"]: jwk.construct(k) for k in raw_keys}
+        except Exception as e:
+            print(f"CRITICAL ERROR FETCHING COGNITO KEYS: {e}")
+            return False
+
+        rotated = bool(self._keys) and set(new_keys) != set(self._keys)
+        # Swapping the whole dict keeps readers lock-free
+        self._keys = new_keys
+        self._loaded_at = time.monotonic()
+        print(f"SUCCESS: {len(new_keys)} Cognito security keys loaded.")
+
+        if rotated:
+            for listener in self._listeners:
+                try:
+                    listener()
+                except Exception as e:
+                    print(f"JWKS rotation listener error: {e}")
+        return True
+
+    # --- LOOKUP ---
+
+    @property
+    def has_keys(self) -> bool:
+        return bool(self._keys)
+
+    def get_key(self, kid: str) -> Optional[Any]:
+        """
+        Returns the constructed public key for `kid`. An unknown kid causes at
+        most one refetch at a time; concurrent callers wait for it and reuse the result.
+        """
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        with self._fetch_lock:
+            # Another thread may have refreshed while we were waiting for the lock
+            key = self._keys.get(kid)
+            if key is not None:
+                return key
+            # Throttle so a flood of forged kids can't hammer the JWKS endpoint
+            since_last = time.monotonic() - self._last_fetch_attempt
+            if self._last_fetch_attempt and since_last < self.min_refetch_interval:
+                return None
+            self.load()
+            return self._keys.get(kid)
+
+    def add_rotation_listener(self, listener: Callable[[], None]) -> None:
+        """Registers a callback fired whenever the set of key ids changes."""
+        self._listeners.append(listener)
+
+    # --- BACKGROUND REFRESH ---
+
+    def _refresh_loop(self) -> None:
+        with self._fetch_lock:
+            if not self._keys:
+                self.load()
+        while not self._stop_event.wait(self.ttl_seconds):
+            with self._fetch_lock:
+                self.load()
+
+    def start(self) -> None:
+        """Loads the keys and keeps them fresh from a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="jwks-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+def build_key_store(region: str, user_pool_id: Optional[str]) -> JWKSKeyStore:
+    """
+    Builds the key store from the environment. COGNITO_JWKS_FILE points at a
+    local JWKS document and takes precedence over the user pool URL.
+    """
+    url = None
+    if user_pool_id:
+        url = f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}/.well-known/jwks.json"
+
+    return JWKSKeyStore(
+        url=url,
+        file_path=os.getenv("COGNITO_JWKS_FILE") or None,
+        ttl_seconds=int(os.getenv("COGNITO_JWKS_TTL_SECONDS", "3600")),
+        min_refetch_interval=int(os.getenv("COGNITO_JWKS_MIN_REFETCH_SECONDS", "30")),
+    )
@@ -1,6 +1,6 @@
-import boto3
+from app.services.aws import get_client
 
-sns_client = boto3.client('sns', region_name='us-east-1')
+sns_client = get_client('sns')
 
 def trigger_immediate_reminder(phone_number: str, message: str):
     """
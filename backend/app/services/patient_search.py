@@ -0,0 +1,253 @@
+import asyncio
+import bisect
+import heapq
+import math
+import os
+import time
+import unicodedata
+from typing import Dict, List, Optional, Set
+
+# Fields kept per patient; enough for the front desk to pick the right person
+INDEXED_ATTRIBUTES = ["patient_id", "full_name", "phone_number"]
+# Share of the query's trigrams a fuzzy match must contain
+MIN_TRIGRAM_SIMILARITY = 0.5
+
+
+def normalize(text: str) -> str:
+    """Case- and accent-insensitive form used for both indexing and queries."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def trigrams(text: str) -> Set[str]:
+    # Padded per word, so "kumr" still shares its leading grams with "ravi kumar"
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def rank_scanned(patients: List[dict], query: str, limit: int) -> List[dict]:
+    """
+    Orders full-table-scan matches (used while the index is still building) the
+    way the index scores them, coarsely: exact name 3.0, name prefix 2.0, any
+    other substring match 1.0.
+    """
+    q = normalize(query)
+
+    def score(patient: dict) -> float:
+        name = normalize(patient.get("full_name", ""))
+        return 3.0 if name == q else 2.0 if name.startswith(q) else 1.0
+
+    scored = [dict(p, score=score(p)) for p in patients]
+    scored.sort(key=lambda p: (-p["score"], normalize(p.get("full_name", ""))))
+    return scored[:limit]
+
+
+def _insert(sorted_list: list, value: tuple, keep_sorted: bool) -> None:
+    if keep_sorted:
+        bisect.insort(sorted_list, value)
+    else:
+        sorted_list.append(value)
+
+
+def _delete(sorted_list: list, value: tuple) -> None:
+    i = bisect.bisect_left(sorted_list, value)
+    if i < len(sorted_list) and sorted_list[i] == value:
+        del sorted_list[i]
+
+
+class _Snapshot:
+    """Immutable-once-built lookup structures, swapped in whole on rebuild."""
+
+    def __init__(self):
+        self.entries: Dict[str, dict] = {}
+        self.names: Dict[str, str] = {}             # patient_id -> normalized name
+        self.grams: Dict[str, Set[str]] = {}         # patient_id -> its trigrams
+        self.full_names: List[tuple] = []            # sorted (name, patient_id) for whole-name prefixes
+        self.words: List[tuple] = []                 # sorted (word, patient_id) for word prefixes
+        self.postings: Dict[str, Set[str]] = {}      # trigram -> patient_ids
+
+    def add(self, patient: dict, keep_sorted: bool = True) -> None:
+        patient_id = patient["patient_id"]
+        name = normalize(patient.get("full_name", ""))
+        self.entries[patient_id] = {k: patient.get(k) for k in INDEXED_ATTRIBUTES}
+        self.names[patient_id] = name
+        self.grams[patient_id] = trigrams(name)
+        _insert(self.full_names, (name, patient_id), keep_sorted)
+        for word in set(name.split()):
+            _insert(self.words, (word, patient_id), keep_sorted)
+        for gram in self.grams[patient_id]:
+            self.postings.setdefault(gram, set()).add(patient_id)
+
+    def remove(self, patient_id: str) -> None:
+        name = self.names.pop(patient_id, None)
+        if name is None:
+            return
+        self.entries.pop(patient_id, None)
+        _delete(self.full_names, (name, patient_id))
+        for word in set(name.split()):
+            _delete(self.words, (word, patient_id))
+        for gram in self.grams.pop(patient_id, ()):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(patient_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def sort(self) -> None:
+        self.full_names.sort()
+        self.words.sort()
+
+    @staticmethod
+    def prefix_range(sorted_list: list, prefix: str) -> range:
+        """Indexes of the entries whose first element starts with `prefix`."""
+        lo = bisect.bisect_left(sorted_list, (prefix, ""))
+        hi = bisect.bisect_left(sorted_list, (prefix + "\U0010ffff", ""))
+        return range(lo, hi)
+
+    def fuzzy_scores(self, query_grams: Set[str]) -> Dict[str, float]:
+        """
+        Patients containing at least MIN_TRIGRAM_SIMILARITY of the query's
+        trigrams. Any such patient must hold one of the rarest
+        (len - needed + 1) query grams, so only those posting lists are read.
+        """
+        needed = math.ceil(MIN_TRIGRAM_SIMILARITY * len(query_grams))
+        rarest = sorted(query_grams, key=lambda g: len(self.postings.get(g, ())))
+        candidates = set()
+        for gram in rarest[:len(query_grams) - needed + 1]:
+            candidates.update(self.postings.get(gram, ()))
+        scores = {}
+        for patient_id in candidates:
+            similarity = len(query_grams & self.grams[patient_id]) / len(query_grams)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                scores[patient_id] = similarity
+        return scores
+
+
+class PatientNameIndex:
+    """
+    In-memory search-as-you-type index over patient names.
+
+    Every query word must match the start of a name word (case- and
+    accent-insensitive). When that finds fewer than `limit` patients,
+    trigram matching tops the page up with typo-tolerant and mid-word
+    matches. Results are ranked: exact name, then whole-name prefix, then
+    word prefixes, then fuzzy matches.
+
+    The index is built once at startup from a projected scan and kept current
+    by `upsert` when a patient saves their profile. A periodic rebuild picks
+    up writes made by other worker processes.
+    """
+
+    def __init__(self, refresh_seconds: float = 600):
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: Optional[_Snapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        # Profile writes that land while a rebuild is reading the table
+        self._pending: Optional[List[dict]] = None
+        self.built_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    async def rebuild(self, repo) -> None:
+        snapshot = _Snapshot()
+        self._pending = []
+        try:
+            async for page in repo.iter_patients(attributes=INDEXED_ATTRIBUTES):
+                for patient in page:
+                    if patient.get("full_name"):
+                        snapshot.add(patient, keep_sorted=False)
+                await asyncio.sleep(0)  # Stay responsive while indexing a big directory
+            snapshot.sort()
+            # Replay writes the scan may have missed, then swap in the new snapshot
+            pending, self._pending = self._pending, None
+            self._snapshot = snapshot
+            for patient in pending:
+                self.upsert(patient)
+        finally:
+            self._pending = None
+        self.built_at = time.time()
+        print(f"SUCCESS: Patient name index built with {len(snapshot.entries)} patients.")
+
+    def start(self, repo) -> None:
+        async def refresh_loop():
+            while True:
+                try:
+                    await self.rebuild(repo)
+                except Exception as e:
+                    print(f"Patient name index refresh failed: {e}")
+                await asyncio.sleep(self.refresh_seconds)
+
+        self._task = asyncio.create_task(refresh_loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def upsert(self, patient: dict) -> None:
+        if self._pending is not None:
+            self._pending.append(patient)
+        if self._snapshot is None:
+            return  # The initial build will pick it up
+        self._snapshot.remove(patient["patient_id"])
+        if patient.get("full_name"):
+            self._snapshot.add(patient)
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        snapshot = self._snapshot
+        q = normalize(query)
+        if snapshot is None or not q:
+            return []
+
+        # Each tier is read in sorted order and stops as soon as the page is full,
+        # so the cost is O(log n + limit) for typical as-you-type queries.
+        results: Dict[str, float] = {}
+
+        # 1. Exact name, then whole-name prefix (the exact name sorts first)
+        for i in snapshot.prefix_range(snapshot.full_names, q):
+            if len(results) >= limit:
+                break
+            name, patient_id = snapshot.full_names[i]
+            results[patient_id] = 3.0 if name == q else 2.0
+
+        # 2. Every query word starts some word of the name, walking the rarest word's range
+        if len(results) < limit:
+            query_words = q.split()
+            ranges = sorted(((snapshot.prefix_range(snapshot.words, w), w) for w in query_words), key=lambda r: len(r[0]))
+            others = [w for _, w in ranges[1:]]
+            for i in ranges[0][0]:
+                if len(results) >= limit:
+                    break
+                patient_id = snapshot.words[i][1]
+                if patient_id in results:
+                    continue
+                name_words = snapshot.names[patient_id].split()
+                if all(any(nw.startswith(w) for nw in name_words) for w in others):
+                    results[patient_id] = 1.0
+
+        # 3. Only when prefixes can't fill the page, add typo-tolerant trigram matches
+        if len(results) < limit and len(q) >= 3:
+            fuzzy = {pid: s for pid, s in snapshot.fuzzy_scores(trigrams(q)).items() if pid not in results}
+            for patient_id, similarity in heapq.nsmallest(
+                limit - len(results), fuzzy.items(), key=lambda kv: (-kv[1], snapshot.names[kv[0]])
+            ):
+                results[patient_id] = similarity
+
+        return [dict(snapshot.entries[pid], score=round(score, 3)) for pid, score in results.items()]
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "patients": len(snapshot.entries) if snapshot else 0,
+            "built_at": self.built_at,
+        }
+
+
+patient_index = PatientNameIndex(refresh_seconds=float(os.getenv("PATIENT_INDEX_REFRESH_SECONDS", "600")))
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+
+from app.services.gemini import GEMINI_MODEL
+
+# Bump whenever consultation.build_prompt changes, so old answers stop matching
+PROMPT_VERSION = "care-plan-v1"
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Case and whitespace don't change the plan, so they don't change the key either."""
+    return " ".join((text or "").casefold().split())
+
+
+def generation_key(
+    current_examination: str,
+    medicines_prescribed: str,
+    medical_history_text: str,
+    file_digest: str = "",
+    model: str = GEMINI_MODEL,
+    prompt_version: str = PROMPT_VERSION
+) -> str:
+    """
+    SHA-256 over everything that goes into the model call. `file_digest`
+    identifies the attachment's content (Attachment.digest), never its name.
+    """
+    parts = [
+        prompt_version,
+        model,
+        normalize_text(current_examination),
+        normalize_text(medicines_prescribed),
+        normalize_text(medical_history_text),
+        file_digest,
+    ]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Content-addressed cache of generated care plans with single-flight.
+
+    Near-identical consultations (same diagnosis, same standard prescription)
+    and accidental double submits reuse one Gemini answer instead of paying
+    for another 5-15 s call. While a generation is running, identical requests
+    wait on it rather than starting their own. Only successful generations
+    are cached; a failure is handed to everyone waiting on that call, and
+    each of them falls back or retries as it would have anyway.
+
+    Entries expire after `ttl_seconds` and the least recently used are evicted
+    beyond `max_entries`. Every hit is credited with the model time the
+    original call took, so /metrics can show the latency saved.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 21600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._cache: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # /metrics runs on the threadpool, so guard the counters even though callers share one loop
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+        self.failures = 0
+        self.model_seconds = 0.0
+        self.model_seconds_saved = 0.0
+
+    async def get_or_generate(self, key: str, generate: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            entry: Optional[Tuple[Any, float]] = self._cache.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.model_seconds_saved += entry[1]
+                return entry[0]
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            # shield: a waiter giving up must not cancel the call others are waiting on
+            value, latency = await asyncio.shield(in_flight)
+            with self._lock:
+                self.shared += 1
+                self.model_seconds_saved += latency
+            return value
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting when it fails; don't warn about an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        with self._lock:
+            self.misses += 1
+        started = time.perf_counter()
+        try:
+            value = await generate()
+        except asyncio.CancelledError:
+            with self._lock:
+                self.failures += 1
+            future.set_exception(RuntimeError("The shared generation was cancelled."))
+            raise
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            future.set_exception(e)
+            raise
+        finally:
+            del self._in_flight[key]
+
+        latency = time.perf_counter() - started
+        with self._lock:
+            self.model_seconds += latency
+            self._cache[key] = (value, latency)
+        future.set_result((value, latency))
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared + self.misses
+            return {
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "in_flight": len(self._in_flight),
+                "hits": self.hits,
+                "shared_in_flight": self.shared,
+                "misses": self.misses,
+                "failures": self.failures,
+                "hit_ratio": round((self.hits + self.shared) / lookups, 4) if lookups else 0.0,
+                "model_seconds": round(self.model_seconds, 3),
+                "model_seconds_saved": round(self.model_seconds_saved, 3),
+            }
+
+
+plan_cache = GenerationCache(
+    max_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("PLAN_CACHE_TTL_SECONDS", "21600"))
+)
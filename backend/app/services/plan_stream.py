@@ -0,0 +1,143 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+_decoder = json.JSONDecoder()
+_SKIPPED = " \t\r\n,"
+
+
+class PlanStreamParser:
+    """
+    Pulls finished sections out of care-plan JSON that is still arriving.
+
+    Feed it the model's text chunk by chunk; every `feed` returns the sections
+    completed so far that haven't been returned yet:
+      ("section", {"name": "Morning", "text": ...})   one per care_plan entry
+      ("summary", {"index": 0, "text": ...})          one per summarization bullet
+
+    It only ever decodes whole JSON values (json.raw_decode) and waits for
+    more text when a value is cut off, so nothing half-written is emitted.
+    This is a preview for the screen: the complete text is still validated
+    with json.loads before the plan is saved.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._state = "start"  # start -> top -> (care_plan | summarization -> top)* -> end
+        self.emitted_sections = set()
+        self.emitted_summaries = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, dict]]:
+        self.text += chunk
+        events = []
+        while self._state != "end":
+            if not self._step(events):
+                break
+        return events
+
+    def _skip(self) -> Optional[str]:
+        """Skips separators; returns the next significant character (None when the text runs out)."""
+        while self._pos < len(self.text) and self.text[self._pos] in _SKIPPED:
+            self._pos += 1
+        return self.text[self._pos] if self._pos < len(self.text) else None
+
+    def _decode(self, pos: int) -> Optional[Tuple[Any, int]]:
+        try:
+            value, end = _decoder.raw_decode(self.text, pos)
+        except json.JSONDecodeError:
+            return None
+        if end == len(self.text) and not isinstance(value, (str, list, dict)):
+            return None  # A number at the very end may still be missing digits
+        return value, end
+
+    def _member(self) -> Optional[Tuple[str, int]]:
+        """Decodes `"key":` at the current position; returns (key, position after the colon)."""
+        decoded = self._decode(self._pos)
+        if decoded is None:
+            return None
+        key, pos = decoded
+        while pos < len(self.text) and self.text[pos] in " \t\r\n":
+            pos += 1
+        if pos >= len(self.text) or self.text[pos] != ":":
+            return None
+        pos += 1
+        while pos < len(self.text) and self.text[pos] in " \t\r\n":
+            pos += 1
+        return str(key), pos
+
+    def _step(self, events: list) -> bool:
+        """Advances by one element; returns False when it has to wait for more text."""
+        char = self._skip()
+        if char is None:
+            return False
+
+        if self._state == "start":
+            if char != "{":
+                # Not the object we asked for (e.g. a ```json fence); leave it to the final parse
+                self._pos += 1
+                return True
+            self._pos += 1
+            self._state = "top"
+            return True
+
+        if self._state == "top":
+            if char == "}":
+                self._state = "end"
+                return False
+            member = self._member()
+            if member is None or member[1] >= len(self.text):
+                return False
+            key, pos = member
+            opener = self.text[pos]
+            if key == "care_plan" and opener == "{":
+                self._pos, self._state = pos + 1, "care_plan"
+                return True
+            if key == "summarization" and opener == "[":
+                self._pos, self._state = pos + 1, "summarization"
+                return True
+            decoded = self._decode(pos)  # Some other key: skip its whole value
+            if decoded is None:
+                return False
+            self._pos = decoded[1]
+            return True
+
+        if self._state == "care_plan":
+            if char == "}":
+                self._pos += 1
+                self._state = "top"
+                return True
+            member = self._member()
+            if member is None:
+                return False
+            decoded = self._decode(member[1])
+            if decoded is None:
+                return False
+            name, (value, self._pos) = member[0], decoded
+            self.emitted_sections.add(name)
+            events.append(("section", {"name": name, "text": value if isinstance(value, str) else json.dumps(value)}))
+            return True
+
+        # summarization
+        if char == "]":
+            self._pos += 1
+            self._state = "top"
+            return True
+        decoded = self._decode(self._pos)
+        if decoded is None:
+            return False
+        value, self._pos = decoded
+        events.append(("summary", {"index": self.emitted_summaries, "text": value if isinstance(value, str) else json.dumps(value)}))
+        self.emitted_summaries += 1
+        return True
+
+
+def remaining_events(parser: PlanStreamParser, plan: dict) -> List[Tuple[str, dict]]:
+    """Sections of the final plan the stream never showed (cache hits, odd formatting, the fallback plan)."""
+    events = []
+    for name, text in (plan.get("care_plan") or {}).items():
+        if name not in parser.emitted_sections:
+            events.append(("section", {"name": name, "text": text if isinstance(text, str) else json.dumps(text)}))
+    for index, text in enumerate(plan.get("summarization") or []):
+        if index >= parser.emitted_summaries:
+            events.append(("summary", {"index": index, "text": text if isinstance(text, str) else json.dumps(text)}))
+    return events
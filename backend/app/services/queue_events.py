@@ -0,0 +1,97 @@
+import asyncio
+import json
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, Optional, Set
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Unserializable value: {value!r}")
+
+
+def format_sse(event: str, data) -> str:
+    """Encodes one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+
+
+class QueueBroadcaster:
+    """
+    In-process fan-out of queue changes to the waiting-room screens.
+
+    Every connected screen gets its own bounded asyncio.Queue per clinic.
+    Check-ins and status changes are published once and copied to each
+    subscriber without touching the database. A screen that falls too far
+    behind is told to resync (re-read the snapshot) instead of blocking the
+    publisher or growing memory without bound.
+
+    This is per process: with several workers, run the board stream on one
+    of them (or front it with sticky routing) so it sees every check-in.
+    """
+
+    RESYNC = {"type": "resync"}
+
+    def __init__(self, max_pending: int = 100, max_tracked_appointments: int = 10000):
+        self.max_pending = max_pending
+        self.max_tracked_appointments = max_tracked_appointments
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # appointment_id -> clinic_id, so a status change knows which boards to notify
+        self._clinics: "OrderedDict[str, str]" = OrderedDict()
+        self.published = 0
+        self.resyncs = 0
+
+    def subscribe(self, clinic_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        self._subscribers.setdefault(clinic_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, clinic_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(clinic_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[clinic_id]
+
+    def track(self, appointment_id: Optional[str], clinic_id: str) -> None:
+        if not appointment_id:
+            return
+        self._clinics[appointment_id] = clinic_id
+        self._clinics.move_to_end(appointment_id)
+        while len(self._clinics) > self.max_tracked_appointments:
+            self._clinics.popitem(last=False)
+
+    def clinic_for(self, appointment_id: str) -> Optional[str]:
+        return self._clinics.get(appointment_id)
+
+    def publish(self, clinic_id: str, event: dict) -> None:
+        """Queues `event` for every screen watching `clinic_id`. Never blocks."""
+        self.published += 1
+        for queue in self._subscribers.get(clinic_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Drop the backlog; the stream re-sends a fresh snapshot instead
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self.RESYNC)
+                self.resyncs += 1
+
+    def close(self) -> None:
+        """Ends every open stream (used on shutdown)."""
+        for subscribers in self._subscribers.values():
+            for queue in subscribers:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "clinics": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+
+queue_broadcaster = QueueBroadcaster()
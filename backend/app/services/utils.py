@@ -1,5 +1,11 @@
 import json
-from typing import Dict, Any
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Any, Optional, Tuple
+
+# Clinics run on Indian Standard Time; "today" always means the IST calendar day
+IST = timezone(timedelta(hours=5, minutes=30))
+
+APPOINTMENT_VIEWS = ("all", "today", "upcoming")
 
 def parse_care_plan_text(raw: str) -> Dict[str, Any]:
     """
@@ -43,4 +49,61 @@ def parse_care_plan_text(raw: str) -> Dict[str, Any]:
             "planLines": [],
             "summaryLines": [],
             "rawText": trimmed
-        }
\ No newline at end of file
+        }
+
+
+def clinic_today() -> date:
+    """Returns the current calendar date in the clinic's timezone (IST)."""
+    return datetime.now(IST).date()
+
+
+def appointment_local_time(appointment_date: Optional[str]) -> Optional[datetime]:
+    """
+    Converts a stored appointment_date (UTC ISO string) to clinic time (IST).
+    Returns None when the value is missing or unparseable.
+    """
+    if not appointment_date:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(appointment_date).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(IST)
+
+
+def _ist_day_start_utc(day: date) -> str:
+    # appointment_date is stored as a UTC ISO string, so IST midnights are converted before comparing
+    return datetime.combine(day, time.min, IST).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def appointment_date_window(
+    view: str = "all",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Translates a view ("all", "today", "upcoming") or an explicit IST date range
+    (YYYY-MM-DD, inclusive) into (lower, upper) bounds on the appointment_date
+    sort key. A None bound means open-ended. Raises ValueError on bad input.
+    """
+    if start_date or end_date:
+        lower = upper = None
+        if start_date:
+            lower = _ist_day_start_utc(date.fromisoformat(start_date))
+        if end_date:
+            upper = _ist_day_start_utc(date.fromisoformat(end_date) + timedelta(days=1))
+        if lower and upper and lower > upper:
+            raise ValueError("start_date must be on or before end_date")
+        return lower, upper
+
+    if view not in APPOINTMENT_VIEWS:
+        raise ValueError(f"view must be one of {', '.join(APPOINTMENT_VIEWS)}")
+
+    today = clinic_today()
+    if view == "today":
+        return _ist_day_start_utc(today), _ist_day_start_utc(today + timedelta(days=1))
+    if view == "upcoming":
+        return _ist_day_start_utc(today), None
+    return None, None
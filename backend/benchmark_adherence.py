@@ -0,0 +1,147 @@
+"""
+Compares the old per-row adherence overview with the summary + NumPy engine path.
+
+  python benchmark_adherence.py                        # 1k / 10k / 100k logs
+  python benchmark_adherence.py --logs 50000 --latency-ms 8
+
+For each size it times, on synthetic data (no AWS access needed):
+  1. CPU: grouping every raw log and doing the date math per appointment in
+     Python (the old /all-stats loop) vs scoring the per-appointment summaries
+     with adherence_engine in one vectorized pass.
+  2. Care-plan fetch: one query per appointment, one after another (old) vs
+     BatchGetItem chunks of 100 fetched concurrently, with each round trip
+     simulated as --latency-ms of network time.
+
+The few percentages that differ come from the old float math truncating
+e.g. 29/50 to 57%; the engine uses exact integer division (58%).
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from app.services import adherence_engine
+from app.services.utils import clinic_today
+
+LOGS_PER_APPOINTMENT = 25
+BATCH_GET_SIZE = 100
+
+
+def generate(n_logs: int, today: date):
+    n_appointments = max(1, n_logs // LOGS_PER_APPOINTMENT)
+    plans, logs = {}, []
+    for i in range(n_appointments):
+        created = today - timedelta(days=random.randint(0, 30))
+        plans[f"A{i}"] = {
+            "patient_id": f"P{i}",
+            "appointment_id": f"A{i}",
+            "created_at": created.isoformat(),
+            "follow_up_date": (created + timedelta(days=random.randint(3, 21))).isoformat(),
+            "daily_task_count": random.choice([3, 4, 4, 5]),
+        }
+    for n in range(n_logs):
+        appt_id = f"A{random.randrange(n_appointments)}"
+        logs.append({
+            "appointment_id": appt_id,
+            "patient_id": plans[appt_id]["patient_id"],
+            "timestamp": f"{today.isoformat()}T{n % 24:02d}:{n % 60:02d}:00",
+        })
+    return plans, logs
+
+
+def legacy_overview(logs, plans, today):
+    """The old loop: group raw logs in dicts, then strptime/timedelta per appointment."""
+    grouped = {}
+    for log in logs:
+        appt_id = log["appointment_id"]
+        if appt_id not in grouped:
+            grouped[appt_id] = {"total_completed": 0, "last_active": log["timestamp"]}
+        grouped[appt_id]["total_completed"] += 1
+        if log["timestamp"] > grouped[appt_id]["last_active"]:
+            grouped[appt_id]["last_active"] = log["timestamp"]
+
+    results = {}
+    for appt_id, data in grouped.items():
+        plan = plans[appt_id]
+        consultation_date = datetime.strptime(str(plan["created_at"])[:10], "%Y-%m-%d").date()
+        follow_up_date = datetime.strptime(str(plan["follow_up_date"])[:10], "%Y-%m-%d").date()
+        start_date = consultation_date + timedelta(days=1)
+        if today < start_date:
+            results[appt_id] = (0, "Starts Tomorrow")
+            continue
+        expected = ((min(today, follow_up_date) - start_date).days + 1) * int(plan["daily_task_count"])
+        percentage = min(int((data["total_completed"] / expected) * 100), 100) if expected > 0 else 0
+        if percentage >= 75:
+            status = "On Track"
+        elif percentage >= 50:
+            status = "Needs Attention"
+        else:
+            status = "Critical"
+        results[appt_id] = (percentage, status)
+    return results
+
+
+def summaries_from(logs):
+    # What /api/adherence/log maintains incrementally; built here outside the timed section
+    totals = {}
+    for log in logs:
+        totals[log["appointment_id"]] = totals.get(log["appointment_id"], 0) + 1
+    return totals
+
+
+def engine_overview(totals, plans, today):
+    appointment_ids = list(totals)
+    scores = adherence_engine.score(
+        [totals[a] for a in appointment_ids], [plans.get(a) for a in appointment_ids], today
+    )
+    return dict(zip(appointment_ids, zip(scores["adherence_percentage"].tolist(), scores["status"].tolist())))
+
+
+async def fetch_sequential(appointment_ids, latency):
+    for _ in appointment_ids:
+        await asyncio.sleep(latency)
+
+
+async def fetch_batched(appointment_ids, latency):
+    chunks = [appointment_ids[i:i + BATCH_GET_SIZE] for i in range(0, len(appointment_ids), BATCH_GET_SIZE)]
+    await asyncio.gather(*(asyncio.sleep(latency) for _ in chunks))
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def run(n_logs: int, latency: float):
+    today = clinic_today()
+    plans, logs = generate(n_logs, today)
+    totals = summaries_from(logs)
+
+    legacy, legacy_seconds = timed(legacy_overview, logs, plans, today)
+    engine, engine_seconds = timed(engine_overview, totals, plans, today)
+    mismatches = sum(1 for a in legacy if legacy[a] != engine[a])
+
+    appointment_ids = list(totals)
+    _, sequential_seconds = timed(asyncio.run, fetch_sequential(appointment_ids, latency))
+    _, batched_seconds = timed(asyncio.run, fetch_batched(appointment_ids, latency))
+
+    print(f"📊 {n_logs:>7} logs / {len(appointment_ids):>5} appointments")
+    print(f"   math:  legacy {legacy_seconds * 1000:9.1f} ms   engine {engine_seconds * 1000:7.1f} ms"
+          f"   x{legacy_seconds / max(engine_seconds, 1e-9):.0f}   ({mismatches} differ)")
+    print(f"   plans: per-row {sequential_seconds * 1000:8.1f} ms   batched {batched_seconds * 1000:6.1f} ms"
+          f"   x{sequential_seconds / max(batched_seconds, 1e-9):.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the adherence overview.")
+    parser.add_argument("--logs", type=int, nargs="*", default=[1000, 10000, 100000], help="Log counts to try.")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Simulated DynamoDB round trip.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    print("🚀 Benchmarking adherence overview...\n")
+    for n in args.logs:
+        run(n, args.latency_ms / 1000)
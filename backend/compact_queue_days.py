@@ -0,0 +1,88 @@
+"""
+Rolls finished queue days up into one summary item per clinic per day.
+
+  python compact_queue_days.py            # summarise every finished, uncompacted day
+  python compact_queue_days.py --dry-run  # only print the summaries
+
+Run it daily (cron / scheduled task). The raw tokens of a day expire via TTL
+QUEUE_RETENTION_DAYS after the day ends, so the summary in
+DrDecideQueueSummaries is what remains for reporting afterwards.
+
+Finished days are found from DrDecideQueueCounters (one small item per clinic
+per day), never by scanning the token table.
+"""
+import argparse
+from collections import Counter
+
+from dotenv import load_dotenv
+
+# 1. MUST BE AT THE VERY TOP: Load environment variables first!
+load_dotenv()
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from app.repository.dynamo import queue_key
+from app.services.aws import get_table, CLINIC_QUEUE_TABLE, QUEUE_COUNTERS_TABLE, QUEUE_SUMMARIES_TABLE
+from app.services.utils import clinic_today
+
+
+def iterate(call, **kwargs):
+    """Yields every item of a query/scan, following LastEvaluatedKey."""
+    while True:
+        response = call(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def summarise(clinic_id: str, service_date: str, tokens: list) -> dict:
+    statuses = Counter(t.get("status", "Unknown") for t in tokens)
+    return {
+        "clinic_id": clinic_id,
+        "service_date": service_date,
+        "total_tokens": len(tokens),
+        "last_token": max((int(t["token_number"]) for t in tokens), default=0),
+        "status_counts": dict(statuses),
+        "unique_patients": len({t.get("patient_id") for t in tokens if t.get("patient_id")}),
+    }
+
+
+def compact(dry_run: bool):
+    counters = get_table(QUEUE_COUNTERS_TABLE)
+    queue = get_table(CLINIC_QUEUE_TABLE)
+    summaries = get_table(QUEUE_SUMMARIES_TABLE)
+    today = clinic_today().isoformat()
+
+    finished_days = iterate(
+        counters.scan,
+        FilterExpression=Attr("service_date").lt(today) & Attr("compacted").not_exists()
+    )
+
+    compacted = 0
+    for counter in finished_days:
+        clinic_id, service_date = counter["clinic_id"], counter["service_date"]
+        tokens = list(iterate(queue.query, KeyConditionExpression=Key("queue_key").eq(queue_key(clinic_id, service_date))))
+        summary = summarise(clinic_id, service_date, tokens)
+        print(f"📊 {clinic_id} {service_date}: {summary['total_tokens']} tokens {summary['status_counts']}")
+        if dry_run:
+            continue
+
+        summaries.put_item(Item=summary)
+        counters.update_item(
+            Key={"counter_id": counter["counter_id"]},
+            UpdateExpression="SET compacted = :yes",
+            ExpressionAttributeValues={":yes": True},
+        )
+        compacted += 1
+
+    print(f"\n🎉 Compacted {compacted} clinic-days.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise finished queue days.")
+    parser.add_argument("--dry-run", action="store_true", help="Print summaries without writing anything.")
+    args = parser.parse_args()
+
+    print("🚀 Compacting finished queue days...\n")
+    compact(args.dry_run)
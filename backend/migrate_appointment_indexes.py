@@ -0,0 +1,166 @@
+"""
+Builds the date-sorted appointment indexes (plus the patient notifications
+index) and backfills existing items.
+
+  python migrate_appointment_indexes.py            # create indexes + backfill
+  python migrate_appointment_indexes.py --dry-run  # only report what would change
+
+Both indexes are sparse on appointment_date, so an appointment only shows up
+in a doctor's or patient's schedule once it carries doctor_id / patient_id.
+Historical rows stored the doctor's email in doctor_id and some never had a
+patient_id; the backfill resolves both from the profile tables.
+
+The notifications index (patient_id + timestamp) lets the inbox be read newest
+first, one page at a time, instead of scanning the whole table. The doctor
+email index resolves those historical email references without a scan.
+"""
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+# 1. MUST BE AT THE VERY TOP: Load environment variables first!
+load_dotenv()
+
+from app.repository.dynamo import (
+    DOCTOR_APPOINTMENTS_INDEX,
+    DOCTOR_EMAIL_INDEX,
+    PATIENT_APPOINTMENTS_INDEX,
+    PATIENT_NOTIFICATIONS_INDEX,
+)
+from app.services.aws import get_client, get_table, APPOINTMENTS_TABLE, DOCTORS_TABLE, NOTIFICATIONS_TABLE, PATIENTS_TABLE
+
+
+# (table, index, partition key, sort key or None)
+INDEXES = [
+    (APPOINTMENTS_TABLE, DOCTOR_APPOINTMENTS_INDEX, "doctor_id", "appointment_date"),
+    (APPOINTMENTS_TABLE, PATIENT_APPOINTMENTS_INDEX, "patient_id", "appointment_date"),
+    (NOTIFICATIONS_TABLE, PATIENT_NOTIFICATIONS_INDEX, "patient_id", "timestamp"),
+    (DOCTORS_TABLE, DOCTOR_EMAIL_INDEX, "email", None),
+]
+
+
+def scan_all(table, **kwargs):
+    """Yields every item in the table, following LastEvaluatedKey."""
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def wait_for_index(client, table_name, index_name):
+    print(f"   -> Waiting for {index_name} to become ACTIVE...")
+    while True:
+        table = client.describe_table(TableName=table_name)["Table"]
+        index = next((i for i in table.get("GlobalSecondaryIndexes", []) if i["IndexName"] == index_name), None)
+        if index and index["IndexStatus"] == "ACTIVE":
+            return
+        time.sleep(10)
+
+
+def ensure_indexes(dry_run: bool):
+    client = get_client("dynamodb")
+
+    for table_name, index_name, partition_key, sort_key in INDEXES:
+        table = client.describe_table(TableName=table_name)["Table"]
+        existing = {i["IndexName"] for i in table.get("GlobalSecondaryIndexes", [])}
+        provisioned = table.get("BillingModeSummary", {}).get("BillingMode", "PROVISIONED") == "PROVISIONED"
+
+        if index_name in existing:
+            print(f"✅ {table_name}.{index_name} already exists")
+            continue
+        print(f"🛠️  Creating {table_name}.{index_name} ({partition_key}{' + ' + sort_key if sort_key else ''})")
+        if dry_run:
+            continue
+
+        key_schema = [{"AttributeName": partition_key, "KeyType": "HASH"}]
+        if sort_key:
+            key_schema.append({"AttributeName": sort_key, "KeyType": "RANGE"})
+        create = {
+            "IndexName": index_name,
+            "KeySchema": key_schema,
+            "Projection": {"ProjectionType": "ALL"},
+        }
+        if provisioned:
+            create["ProvisionedThroughput"] = {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5}
+
+        # DynamoDB only allows one index creation per UpdateTable call
+        client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=[
+                {"AttributeName": name, "AttributeType": "S"} for name in (partition_key, sort_key) if name
+            ],
+            GlobalSecondaryIndexUpdates=[{"Create": create}],
+        )
+        wait_for_index(client, table_name, index_name)
+
+
+def backfill(dry_run: bool):
+    appointments_table = get_table(APPOINTMENTS_TABLE)
+
+    # Email -> id maps so historical rows can be re-keyed without per-row lookups
+    doctor_ids_by_email = {
+        d["email"]: d["doctor_id"]
+        for d in scan_all(get_table(DOCTORS_TABLE), ProjectionExpression="doctor_id, email")
+        if d.get("email")
+    }
+    patient_ids_by_email = {
+        p["email"]: p["patient_id"]
+        for p in scan_all(get_table(PATIENTS_TABLE), ProjectionExpression="patient_id, email")
+        if p.get("email")
+    }
+
+    scanned = updated = unresolved = 0
+    for appt in scan_all(appointments_table):
+        scanned += 1
+        changes = {}
+
+        doctor_ref = appt.get("doctor_id") or appt.get("doctor_email")
+        if doctor_ref and "@" in doctor_ref and doctor_ref in doctor_ids_by_email:
+            changes["doctor_id"] = doctor_ids_by_email[doctor_ref]
+            changes["doctor_email"] = doctor_ref
+        elif not appt.get("doctor_id") and doctor_ref:
+            changes["doctor_id"] = doctor_ref
+
+        if not appt.get("patient_id"):
+            patient_id = patient_ids_by_email.get(appt.get("patient_email"))
+            if patient_id:
+                changes["patient_id"] = patient_id
+
+        final_doctor_id = changes.get("doctor_id") or appt.get("doctor_id") or ""
+        final_patient_id = changes.get("patient_id") or appt.get("patient_id")
+        if not appt.get("appointment_date") or "@" in final_doctor_id or not final_patient_id:
+            unresolved += 1
+            print(f"⚠️  {appt['appointment_id']} is still missing an index key; it won't appear in schedules")
+
+        if not changes:
+            continue
+        updated += 1
+        print(f"✏️  {appt['appointment_id']}: {changes}")
+        if dry_run:
+            continue
+
+        names = {f"#k{i}": k for i, k in enumerate(changes)}
+        values = {f":v{i}": v for i, v in enumerate(changes.values())}
+        appointments_table.update_item(
+            Key={"appointment_id": appt["appointment_id"]},
+            UpdateExpression="SET " + ", ".join(f"#k{i} = :v{i}" for i in range(len(changes))),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+    print(f"\n🎉 Scanned {scanned} appointments, updated {updated}, {unresolved} still unindexed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create appointment/notification indexes and backfill index keys.")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing anything.")
+    parser.add_argument("--skip-indexes", action="store_true", help="Only backfill items.")
+    args = parser.parse_args()
+
+    print("🚀 Starting appointment index migration...\n")
+    if not args.skip_indexes:
+        ensure_indexes(args.dry_run)
+    backfill(args.dry_run)
@@ -0,0 +1,158 @@
+"""
+Copies every care plan from the old DrDecideCarePlans table into
+DrDecideCarePlanHistory, writes each patient's LATEST pointer and builds the
+per-doctor "DOCTOR#<doctor_id>" pointers /my-patients pages through.
+
+  python migrate_care_plans.py                  # copy plans, then build pointers
+  python migrate_care_plans.py --pointers-only  # history already copied: only (re)build pointers
+  python migrate_care_plans.py --dry-run        # only print what would be written
+
+Create the history table first (setup_tables.py); this script adds the
+care_doctor_id-patient_id-index to a history table created before it existed.
+Safe to re-run: sort keys are derived from each plan's creation time and
+appointment, so a second run overwrites the same items. New plans go straight
+to the history table and move their pointers themselves.
+
+Old plans that only stored the doctor's email are matched to a doctor_id
+through the doctors table.
+"""
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+# 1. MUST BE AT THE VERY TOP: Load environment variables first!
+load_dotenv()
+
+from app.repository.base import CARE_PLAN_PREFIX, LATEST_CARE_PLAN, care_plan_sort_key, doctor_care_plan_key
+from app.repository.dynamo import CARE_PLAN_DOCTOR_INDEX
+from app.services.aws import get_client, get_table, CARE_PLANS_TABLE, CARE_PLAN_HISTORY_TABLE, DOCTORS_TABLE
+
+
+def scan_all(table, **kwargs):
+    """Yields every item in the table, following LastEvaluatedKey."""
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def ensure_doctor_index(dry_run: bool):
+    client = get_client("dynamodb")
+    table = client.describe_table(TableName=CARE_PLAN_HISTORY_TABLE)["Table"]
+    if any(i["IndexName"] == CARE_PLAN_DOCTOR_INDEX for i in table.get("GlobalSecondaryIndexes", [])):
+        print(f"✅ {CARE_PLAN_HISTORY_TABLE}.{CARE_PLAN_DOCTOR_INDEX} already exists")
+        return
+    print(f"🛠️  Creating {CARE_PLAN_HISTORY_TABLE}.{CARE_PLAN_DOCTOR_INDEX}")
+    if dry_run:
+        return
+
+    create = {
+        "IndexName": CARE_PLAN_DOCTOR_INDEX,
+        "KeySchema": [
+            {"AttributeName": "care_doctor_id", "KeyType": "HASH"},
+            {"AttributeName": "patient_id", "KeyType": "RANGE"},
+        ],
+        "Projection": {"ProjectionType": "KEYS_ONLY"},
+    }
+    if table.get("BillingModeSummary", {}).get("BillingMode", "PROVISIONED") == "PROVISIONED":
+        create["ProvisionedThroughput"] = {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5}
+    client.update_table(
+        TableName=CARE_PLAN_HISTORY_TABLE,
+        AttributeDefinitions=[
+            {"AttributeName": "care_doctor_id", "AttributeType": "S"},
+            {"AttributeName": "patient_id", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexUpdates=[{"Create": create}],
+    )
+    print(f"   -> Waiting for {CARE_PLAN_DOCTOR_INDEX} to become ACTIVE...")
+    while True:
+        table = client.describe_table(TableName=CARE_PLAN_HISTORY_TABLE)["Table"]
+        index = next((i for i in table.get("GlobalSecondaryIndexes", []) if i["IndexName"] == CARE_PLAN_DOCTOR_INDEX), None)
+        if index and index["IndexStatus"] == "ACTIVE":
+            return
+        time.sleep(10)
+
+
+def copy_plans(dry_run: bool):
+    copied = skipped = 0
+
+    table = get_table(CARE_PLAN_HISTORY_TABLE)
+    with table.batch_writer() as batch:
+        for plan in scan_all(get_table(CARE_PLANS_TABLE)):
+            patient_id = plan.get("patient_id")
+            created = str(plan.get("created_at") or plan.get("created_date") or "")
+            if not patient_id:
+                print(f"⚠️  Skipping plan without patient_id: {plan.get('appointment_id')}")
+                skipped += 1
+                continue
+
+            plan["plan_sk"] = care_plan_sort_key(created, plan.get("appointment_id", ""))
+            copied += 1
+            if not dry_run:
+                batch.put_item(Item=plan)
+
+    print(f"📋 {'Would copy' if dry_run else 'Copied'} {copied} plans ({skipped} skipped).\n")
+
+
+def build_pointers(dry_run: bool):
+    doctors_by_email = {
+        d["email"]: d["doctor_id"]
+        for d in scan_all(get_table(DOCTORS_TABLE), ProjectionExpression="doctor_id, email")
+        if d.get("email")
+    }
+
+    # Newest plan per patient, and per (patient, doctor)
+    latest, by_doctor = {}, {}
+    table = get_table(CARE_PLAN_HISTORY_TABLE)
+    for plan in scan_all(table):
+        if not str(plan.get("plan_sk", "")).startswith(CARE_PLAN_PREFIX):
+            continue  # An existing pointer
+        patient_id = plan["patient_id"]
+        if patient_id not in latest or plan["plan_sk"] > latest[patient_id]["plan_sk"]:
+            latest[patient_id] = plan
+        doctor_id = plan.get("doctor_id") or doctors_by_email.get(plan.get("doctor_email"))
+        if not doctor_id:
+            print(f"⚠️  No doctor for plan {plan['plan_sk']} of {patient_id}")
+            continue
+        key = (patient_id, doctor_id)
+        if key not in by_doctor or plan["plan_sk"] > by_doctor[key]["plan_sk"]:
+            by_doctor[key] = plan
+
+    # Write the pointers
+    with table.batch_writer() as batch:
+        for patient_id, plan in latest.items():
+            print(f"✏️  {patient_id}: latest {plan['plan_sk']}")
+            if not dry_run:
+                batch.put_item(Item={
+                    "patient_id": patient_id,
+                    "plan_sk": LATEST_CARE_PLAN,
+                    "latest_plan_sk": plan["plan_sk"],
+                    "plan": plan,
+                })
+        for (patient_id, doctor_id), plan in by_doctor.items():
+            if not dry_run:
+                batch.put_item(Item={
+                    "patient_id": patient_id,
+                    "plan_sk": doctor_care_plan_key(doctor_id),
+                    "care_doctor_id": doctor_id,
+                    "latest_plan_sk": plan["plan_sk"],
+                    "plan": plan,
+                })
+
+    print(f"\n🎉 {'Would write' if dry_run else 'Wrote'} {len(latest)} LATEST and {len(by_doctor)} DOCTOR# pointers.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy care plans into the history table and build its pointers.")
+    parser.add_argument("--dry-run", action="store_true", help="Print items without writing anything.")
+    parser.add_argument("--pointers-only", action="store_true", help="Skip the copy from the old table.")
+    args = parser.parse_args()
+
+    print("🚀 Migrating care plans...\n")
+    ensure_doctor_index(args.dry_run)
+    if not args.pointers_only:
+        copy_plans(args.dry_run)
+    build_pointers(args.dry_run)
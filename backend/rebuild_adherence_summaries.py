@@ -0,0 +1,56 @@
+"""
+Recomputes every appointment's adherence summary from the raw task logs.
+
+  python rebuild_adherence_summaries.py            # overwrite DrDecideAdherenceSummaries
+  python rebuild_adherence_summaries.py --dry-run  # only print what would be written
+
+Run once after creating the table (setup_tables.py) so the doctor's overview
+includes appointments logged before summaries existed, or any time to repair
+drift. /api/adherence/log keeps the items current from then on.
+"""
+import argparse
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+# 1. MUST BE AT THE VERY TOP: Load environment variables first!
+load_dotenv()
+
+from app.services.aws import get_table, ADHERENCE_LOGS_TABLE, ADHERENCE_SUMMARIES_TABLE
+from app.services.adherence_summary import summary_from_logs
+
+
+def scan_all(table, **kwargs):
+    """Yields every item in the table, following LastEvaluatedKey."""
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def rebuild(dry_run: bool):
+    logs = defaultdict(list)
+    for log in scan_all(get_table(ADHERENCE_LOGS_TABLE)):
+        if log.get("appointment_id"):
+            logs[log["appointment_id"]].append(log)
+
+    table = get_table(ADHERENCE_SUMMARIES_TABLE)
+    with table.batch_writer() as batch:
+        for appointment_id, appointment_logs in logs.items():
+            summary = summary_from_logs(appointment_id, appointment_logs)
+            print(f"✏️  {appointment_id}: {summary['total_completed']} tasks, last active {summary['last_active']}")
+            if not dry_run:
+                batch.put_item(Item=summary)
+
+    print(f"\n🎉 {'Would write' if dry_run else 'Wrote'} {len(logs)} adherence summaries.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild per-appointment adherence summaries.")
+    parser.add_argument("--dry-run", action="store_true", help="Print summaries without writing anything.")
+    args = parser.parse_args()
+
+    print("🚀 Rebuilding adherence summaries...\n")
+    rebuild(args.dry_run)
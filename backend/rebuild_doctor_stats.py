@@ -0,0 +1,87 @@
+"""
+Recomputes every doctor's dashboard counters from the source tables.
+
+  python rebuild_doctor_stats.py            # overwrite DrDecideDoctorStats
+  python rebuild_doctor_stats.py --dry-run  # only print what would be written
+
+Run once after creating the table (setup_tables.py) to seed counters for
+existing data, once more after upgrading from the old patient_ids set to
+PATIENT# markers, or any time to repair drift. The API keeps the items
+current from then on. critical_alerts is refreshed the next time the doctor
+opens the adherence overview.
+"""
+import argparse
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+# 1. MUST BE AT THE VERY TOP: Load environment variables first!
+load_dotenv()
+
+from app.services.aws import get_table, APPOINTMENTS_TABLE, CARE_PLAN_HISTORY_TABLE, DOCTOR_STATS_TABLE
+from app.services.doctor_stats import INACTIVE_STATUSES, TOTALS, day_key, hour_attribute, patient_marker_key
+from app.services.utils import appointment_local_time
+
+
+def scan_all(table, **kwargs):
+    """Yields every item in the table, following LastEvaluatedKey."""
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def rebuild(dry_run: bool):
+    stats = defaultdict(lambda: defaultdict(int))
+    patients = defaultdict(set)
+
+    for appt in scan_all(get_table(APPOINTMENTS_TABLE)):
+        doctor_id = appt.get("doctor_id")
+        if not doctor_id:
+            continue
+        stats[(doctor_id, TOTALS)]["total_appointments"] += 1
+        if appt.get("patient_id"):
+            patients[doctor_id].add(appt["patient_id"])
+
+        local = appointment_local_time(appt.get("appointment_date"))
+        if not local or appt.get("status") in INACTIVE_STATUSES:
+            continue
+        day = stats[(doctor_id, day_key(local.date()))]
+        day["booked"] += 1
+        day[hour_attribute(local.hour)] += 1
+        if appt.get("status") == "Completed":
+            day["completed"] += 1
+
+    # LATEST pointer items keep their copy nested under "plan", so only real plans carry doctor_id
+    for plan in scan_all(get_table(CARE_PLAN_HISTORY_TABLE), ProjectionExpression="doctor_id"):
+        if plan.get("doctor_id"):
+            stats[(plan["doctor_id"], TOTALS)]["care_plans_generated"] += 1
+
+    table = get_table(DOCTOR_STATS_TABLE)
+    with table.batch_writer() as batch:
+        for (doctor_id, stat_key), counters in stats.items():
+            item = {"doctor_id": doctor_id, "stat_key": stat_key, **counters}
+            if stat_key == TOTALS:
+                # Replaces the old patient_ids set, which put_item drops with the rest of the item
+                item["total_patients"] = len(patients[doctor_id])
+            print(f"✏️  {doctor_id} {stat_key}: {dict(counters)}")
+            if not dry_run:
+                batch.put_item(Item=item)
+        for doctor_id, patient_ids in patients.items():
+            if not dry_run:
+                for patient_id in patient_ids:
+                    batch.put_item(Item={"doctor_id": doctor_id, "stat_key": patient_marker_key(patient_id)})
+
+    markers = sum(len(p) for p in patients.values())
+    print(f"\n🎉 {'Would write' if dry_run else 'Wrote'} {len(stats)} stats items and {markers} patient markers.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild per-doctor dashboard counters.")
+    parser.add_argument("--dry-run", action="store_true", help="Print items without writing anything.")
+    args = parser.parse_args()
+
+    print("🚀 Rebuilding doctor stats...\n")
+    rebuild(args.dry_run)
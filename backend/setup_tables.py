@@ -0,0 +1,119 @@
+"""
+Creates the DynamoDB tables added on top of the original schema (safe to re-run).
+
+  python setup_tables.py
+
+DrDecideClinicQueue is partitioned by clinic and service day
+(queue_key = "<clinic>#<YYYY-MM-DD>") and sorted by token_number, so a board
+reads exactly one clinic's day with a single query.
+
+DrDecideQueueCounters holds one item per clinic per day (same key format, as
+counter_id) whose last_token is bumped atomically on every check-in.
+
+Both carry an expires_at epoch with TTL switched on, so finished days clean
+themselves up once compact_queue_days.py has written them to
+DrDecideQueueSummaries (clinic_id + service_date).
+
+DrDecideDoctorStats holds each doctor's pre-aggregated dashboard counters
+(doctor_id + stat_key: "TOTALS" or "DAY#<YYYY-MM-DD>"); fill it for existing
+data with rebuild_doctor_stats.py.
+
+DrDecideAdherenceSummaries holds one running aggregate per appointment
+(appointment_id), updated atomically by every task log, with a doctor_id-index
+GSI for the doctor's overview; fill it for existing logs with
+rebuild_adherence_summaries.py.
+
+DrDecideCarePlanHistory keeps every care plan under its patient (patient_id +
+plan_sk = "PLAN#<created>#<appointment>", so history sorts by time) plus one
+"LATEST" pointer item per patient for a single-read /my-plan, with an
+appointment_id-index GSI. Each patient also gets a "DOCTOR#<doctor_id>"
+pointer per doctor, found through the sparse care_doctor_id-patient_id-index
+GSI, so /my-patients pages through a doctor's patients. Copy the old
+DrDecideCarePlans table over (and build the pointers) with
+migrate_care_plans.py.
+"""
+from dotenv import load_dotenv
+
+# 1. MUST BE AT THE VERY TOP: Load environment variables first!
+load_dotenv()
+
+from app.services.aws import get_client, ADHERENCE_SUMMARIES_TABLE, CARE_PLAN_HISTORY_TABLE, CLINIC_QUEUE_TABLE, DOCTOR_STATS_TABLE, QUEUE_COUNTERS_TABLE, QUEUE_SUMMARIES_TABLE
+
+
+# (table, partition key, sort key or None, TTL attribute or None,
+#  GSIs as (partition key, sort key or None, projection type))
+TABLES = [
+    (CLINIC_QUEUE_TABLE, ("queue_key", "S"), ("token_number", "N"), "expires_at", []),
+    (QUEUE_COUNTERS_TABLE, ("counter_id", "S"), None, "expires_at", []),
+    (QUEUE_SUMMARIES_TABLE, ("clinic_id", "S"), ("service_date", "S"), None, []),
+    (DOCTOR_STATS_TABLE, ("doctor_id", "S"), ("stat_key", "S"), None, []),
+    (ADHERENCE_SUMMARIES_TABLE, ("appointment_id", "S"), None, None, [(("doctor_id", "S"), None, "ALL")]),
+    (CARE_PLAN_HISTORY_TABLE, ("patient_id", "S"), ("plan_sk", "S"), None, [
+        (("appointment_id", "S"), None, "ALL"),
+        (("care_doctor_id", "S"), ("patient_id", "S"), "KEYS_ONLY"),
+    ]),
+]
+
+
+def table_exists(client, table_name):
+    try:
+        client.describe_table(TableName=table_name)
+        return True
+    except client.exceptions.ResourceNotFoundException:
+        return False
+
+
+def index_name(partition_key, sort_key):
+    return f"{partition_key[0]}-{sort_key[0]}-index" if sort_key else f"{partition_key[0]}-index"
+
+
+def ensure_table(client, table_name, partition_key, sort_key, ttl_attribute, indexes):
+    if table_exists(client, table_name):
+        print(f"✅ {table_name} already exists")
+    else:
+        print(f"🛠️  Creating {table_name}...")
+        key_schema = [{"AttributeName": partition_key[0], "KeyType": "HASH"}]
+        attributes = [{"AttributeName": partition_key[0], "AttributeType": partition_key[1]}]
+        if sort_key:
+            key_schema.append({"AttributeName": sort_key[0], "KeyType": "RANGE"})
+            attributes.append({"AttributeName": sort_key[0], "AttributeType": sort_key[1]})
+        extra = {}
+        for index_partition, index_sort, projection in indexes:
+            index_schema = [{"AttributeName": index_partition[0], "KeyType": "HASH"}]
+            if index_sort:
+                index_schema.append({"AttributeName": index_sort[0], "KeyType": "RANGE"})
+            for key in (index_partition, index_sort):
+                if key and all(a["AttributeName"] != key[0] for a in attributes):
+                    attributes.append({"AttributeName": key[0], "AttributeType": key[1]})
+            extra.setdefault("GlobalSecondaryIndexes", []).append({
+                "IndexName": index_name(index_partition, index_sort),
+                "KeySchema": index_schema,
+                "Projection": {"ProjectionType": projection},
+            })
+        client.create_table(
+            TableName=table_name,
+            KeySchema=key_schema,
+            AttributeDefinitions=attributes,
+            BillingMode="PAY_PER_REQUEST",
+            **extra,
+        )
+        client.get_waiter("table_exists").wait(TableName=table_name)
+
+    if ttl_attribute:
+        ttl = client.describe_time_to_live(TableName=table_name)["TimeToLiveDescription"]
+        if ttl.get("TimeToLiveStatus") in ("ENABLED", "ENABLING"):
+            print(f"✅ TTL already on for {table_name}.{ttl_attribute}")
+        else:
+            client.update_time_to_live(
+                TableName=table_name,
+                TimeToLiveSpecification={"Enabled": True, "AttributeName": ttl_attribute},
+            )
+            print(f"⏳ TTL enabled on {table_name}.{ttl_attribute}")
+
+
+if __name__ == "__main__":
+    print("🚀 Setting up tables...\n")
+    dynamodb = get_client("dynamodb")
+    for table_name, partition_key, sort_key, ttl_attribute, indexes in TABLES:
+        ensure_table(dynamodb, table_name, partition_key, sort_key, ttl_attribute, indexes)
+    print("\n🎉 Tables ready.")
@@ -1,6 +1,7 @@
 "use client";
 
-import { useCallback, useEffect, useState } from "react";
+import { Suspense, useCallback, useEffect, useState } from "react";
+import { useSearchParams } from "next/navigation";
 import Card from "@/components/ui/Card";
 import Skeleton from "@/components/ui/Skeleton";
 import { hospitalQueue } from "@/lib/services";
@@ -8,7 +9,9 @@ import { useToast } from "@/context/ToastContext";
 import { firstPresent, formatNameWithId } from "@/lib/display";
 import { resolvePatientName } from "@/lib/identity";
 
-export default function HospitalQueuePage() {
+function HospitalQueueBoard() {
+  // A standalone TV opens /hospital/queue?clinic=<clinic name>; a signed-in receptionist gets their own clinic
+  const clinicId = useSearchParams().get("clinic") || undefined;
   const { pushToast } = useToast();
   const [rows, setRows] = useState<Array<Record<string, unknown>>>([]);
   const [loading, setLoading] = useState(false);
@@ -16,14 +19,14 @@ export default function HospitalQueuePage() {
   const load = useCallback(async () => {
     setLoading(true);
     try {
-      const res = await hospitalQueue();
+      const res = await hospitalQueue(clinicId);
       setRows(res.current_queue || []);
     } catch {
       pushToast("Failed to load queue status", "error");
     } finally {
       setLoading(false);
     }
-  }, [pushToast]);
+  }, [clinicId, pushToast]);
 
   useEffect(() => {
     load();
@@ -79,3 +82,15 @@ export default function HospitalQueuePage() {
     </Card>
   );
 }
+
+export default function HospitalQueuePage() {
+  return (
+    <Suspense fallback={
+      <Card title="Waiting Room Queue Status">
+        <p className="muted text-sm">Loading queue...</p>
+      </Card>
+    }>
+      <HospitalQueueBoard />
+    </Suspense>
+  );
+}
@@ -11,6 +11,28 @@ import {
   Role,
 } from "@/types";
 
+// Largest page the backend serves (MAX_PAGE_SIZE); keeps the number of round trips down
+const PAGE_SIZE = 200;
+
+// List endpoints return one page at a time; follow next_token until the list is complete
+async function getAllPages<T extends Record<string, unknown>>(
+  url: string,
+  listKey: string,
+  params?: Record<string, string>
+) {
+  let nextToken: string | undefined;
+  let items: unknown[] = [];
+  let data = {} as T;
+  do {
+    ({ data } = await api.get(url, {
+      params: { ...params, limit: PAGE_SIZE, ...(nextToken ? { next_token: nextToken } : {}) },
+    }));
+    items = items.concat((data[listKey] as unknown[]) || []);
+    nextToken = (data.next_token as string | null | undefined) || undefined;
+  } while (nextToken);
+  return { ...data, [listKey]: items, next_token: null } as T;
+}
+
 export async function signup(payload: {
   email: string;
   password: string;
@@ -83,8 +105,8 @@ export async function logTask(payload: { task_id: string; status: string }) {
 }
 
 export async function patientNotifications() {
-  const { data } = await api.get("/api/patient/notifications");
-  return data as NotificationsResponse;
+  const data = await getAllPages("/api/patient/notifications", "notifications");
+  return data as unknown as NotificationsResponse;
 }
 
 export async function doctorSetupProfile(payload: {
@@ -124,11 +146,11 @@ export async function doctorAppointments() {
   // 1. Fetch both API routes simultaneously for maximum speed
   const [appointmentsRes, patientsRes] = await Promise.all([
     api.get("/api/doctor/my-appointments"),
-    api.get("/api/doctor/my-patients")
+    getAllPages("/api/doctor/my-patients", "patients")
   ]);
 
   const apptData = appointmentsRes.data;
-  const patientData = patientsRes.data;
+  const patientData = patientsRes;
 
   // 2. Create a fast lookup map for patient names: { "123-abc": "John Doe" }
   const patientNameMap: Record<string, string> = {};
@@ -158,8 +180,8 @@ export async function doctorAppointments() {
 }
 
 export async function doctorPatients() {
-  const { data } = await api.get("/api/doctor/my-patients");
-  return data as { total_patients: number; patients: DoctorPatientsItem[] };
+  const data = await getAllPages("/api/doctor/my-patients", "patients");
+  return data as unknown as { total_patients: number; patients: DoctorPatientsItem[] };
 }
 
 export async function doctorConsultation(formDataPayload: FormData) {
@@ -182,9 +204,10 @@ export async function hospitalCheckIn(payload: {
   return data;
 }
 
-export async function hospitalQueue() {
-  const { data } = await api.get("/api/hospital/queue-status");
-  return data as { current_queue: Array<Record<string, unknown>> };
+// Without clinicId the backend shows the signed-in receptionist's (or doctor's) own clinic
+export async function hospitalQueue(clinicId?: string) {
+  const data = await getAllPages("/api/hospital/queue-status", "current_queue", clinicId ? { clinic_id: clinicId } : undefined);
+  return data as unknown as { clinic_id: string; current_queue: Array<Record<string, unknown>> };
 }
 export async function verifyEmail(email: string, code: string) {
   // We send the email and the 6-digit code to the FastAPI backend route we just built!
@@ -217,9 +240,8 @@ export async function searchPatient(fullName: string) {
 }
 
 // 4. GET Queue Status (For the TV / Manage Queue page)
-export async function fetchQueueStatus() {
-  const { data } = await api.get(`/api/hospital/queue-status`);
-  return data;
+export async function fetchQueueStatus(clinicId?: string) {
+  return getAllPages("/api/hospital/queue-status", "current_queue", clinicId ? { clinic_id: clinicId } : undefined);
 }
 
 export async function forceChangePassword(payload: { 